@@ -0,0 +1,5 @@
+"""Module containing the ASGI app instance (e.g. "uvicorn asgi:app")."""
+from department_app.aio import create_asgi_app
+
+
+app = create_asgi_app()
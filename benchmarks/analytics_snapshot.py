@@ -0,0 +1,87 @@
+"""
+Benchmark of the columnar employee snapshot aggregates on synthetic data.
+Every aggregate is timed warm (repeated on an unchanged snapshot), and after a
+write (the first call, which refreshes the changed row incrementally). The
+full load, which sorts the snapshot, is timed on its own, and the footprint
+counts every array of the snapshot.
+
+Usage, from the repository root:
+    python -m benchmarks.analytics_snapshot [ROWS]
+"""
+import sys
+import time
+from datetime import date
+
+import numpy as np
+
+from department_app.service.analytics import Columns, EmployeeSnapshot
+
+
+class SyntheticSnapshot(EmployeeSnapshot):
+    """Snapshot reading changed rows from a random generator instead of a database."""
+
+    def __init__(self, departments):
+        super().__init__(max_age=float('inf'))
+        self.departments = departments
+        self.rng = np.random.default_rng(42)
+
+    def random_columns(self, ids):
+        """Make columns of random employees with the given ids."""
+        count = len(ids)
+        return Columns(
+            np.asarray(ids, dtype=np.int32),
+            self.rng.integers(1, self.departments + 1, count, dtype=np.int32),
+            self.rng.integers(500, 10000, count, dtype=np.int32),
+            self.rng.integers(-20000, 15000, count, dtype=np.int32),
+        )
+
+    def _fetch(self, ids):
+        return self.random_columns(sorted(ids))
+
+
+def build_snapshot(rows, departments=50):
+    """Build a snapshot with random data without touching a database."""
+    snapshot = SyntheticSnapshot(departments)
+    snapshot.load(snapshot.random_columns(np.arange(1, rows + 1)))
+    return snapshot
+
+
+def best_of(func, prepare, repeat):
+    """Get the best wall time of a call in milliseconds, calling prepare before each."""
+    best = float('inf')
+    for _ in range(repeat):
+        prepare()
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def timed(name, snapshot, func, repeat=20):
+    """Print the wall times of a call warm and after a write."""
+    rows = len(snapshot.columns.ids)
+    warm = best_of(func, lambda: None, repeat)
+    after_write = best_of(
+        func, lambda: snapshot.mark_dirty(snapshot.rng.integers(1, rows + 1, 1).tolist()), repeat
+    )
+    print(f'{name:<36} {warm:10.2f} {after_write:12.2f}')
+
+
+def main():
+    """Run the benchmark."""
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    snapshot = build_snapshot(rows)
+    load = best_of(lambda: snapshot.load(snapshot.columns), lambda: None, 3)
+    print(f'rows: {rows}, bytes per employee: {snapshot.nbytes / rows:.1f}, '
+          f'full load: {load:.0f} ms')
+    print(f'{"milliseconds":<36} {"warm":>10} {"after write":>12}')
+    timed('headcount by department', snapshot, snapshot.headcount)
+    timed('org-wide salary stats (p50, p90)', snapshot,
+          lambda: snapshot.salary_stats(bucket_width=500))
+    timed('age bands', snapshot,
+          lambda: snapshot.age_bands(date(2024, 1, 1), [20, 30, 40, 50, 60]))
+    timed('department stats (avg, p50, p90)', snapshot, snapshot.department_stats)
+
+
+if __name__ == '__main__':
+    main()
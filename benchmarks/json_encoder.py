@@ -0,0 +1,57 @@
+"""
+Benchmark of the REST JSON encoders on a list of serialized employees.
+
+Usage, from the repository root:
+    python -m benchmarks.json_encoder [ROWS]
+"""
+import sys
+import time
+from datetime import date
+from json import dumps
+
+from config import TestConfig
+from department_app import create_app
+from department_app.rest import representations
+
+
+def build_items(rows, departments=50):
+    """Build dicts shaped like serialized employees with nested departments."""
+    deps = [{'id_': index, 'title': f'Department {index}'} for index in range(departments)]
+    return [
+        {
+            'department': deps[index % departments],
+            'salary': 500 + index % 9500,
+            'date_of_birth': date(1960 + index % 40, 1 + index % 12, 1 + index % 28).isoformat(),
+            'full_name': f'Name Surname{index}',
+            'id_': index,
+        }
+        for index in range(rows)
+    ]
+
+
+def timed(name, func, rows, repeat=5):
+    """Print the best wall time of a call and the throughput in rows per second."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    print(f'{name:<40} {best * 1000:8.1f} ms {rows / best:12,.0f} rows/s')
+
+
+def main():
+    """Run the benchmark."""
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    items = build_items(rows)
+    app = create_app(config_class=TestConfig)
+    with app.app_context():
+        timed('flask-restful default', lambda: (dumps(items) + '\n').encode(), rows)
+        for name in representations.ENCODERS:
+            if name == 'orjson' and representations.orjson is None:
+                continue
+            app.config['REST_JSON_ENCODER'] = name
+            timed(name, lambda: representations.encode_json(items), rows)
+
+
+if __name__ == '__main__':
+    main()
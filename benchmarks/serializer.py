@@ -0,0 +1,61 @@
+"""
+Benchmark of the compiled serializers against marshmallow dumps on synthetic,
+detached employee objects. The nested department leaves out "avg_salary",
+which queries the database.
+
+Usage, from the repository root:
+    python -m benchmarks.serializer [ROWS]
+"""
+import sys
+import time
+from datetime import date
+
+from config import TestConfig
+from department_app import create_app
+from department_app.models import Department, Employee
+from department_app.rest import serializers
+from department_app.rest.schemas import EmployeeSchema, sparse_schema
+
+
+def build_employees(rows, departments=50):
+    """Build employees of a few departments without touching a database."""
+    deps = [Department(id_=index, title=f'Department {index}') for index in range(departments)]
+    return [
+        Employee(
+            id_=index,
+            full_name=f'Name Surname{index}',
+            salary=500 + index % 9500,
+            date_of_birth=date(1960 + index % 40, 1 + index % 12, 1 + index % 28),
+            department=deps[index % departments],
+        )
+        for index in range(rows)
+    ]
+
+
+def timed(name, func, rows, repeat=3):
+    """Print the best wall time of a call and the throughput in rows per second."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    print(f'{name:<40} {best * 1000:8.1f} ms {rows / best:12,.0f} rows/s')
+
+
+def main():
+    """Run the benchmark."""
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    employees = build_employees(rows)
+    with create_app(config_class=TestConfig).app_context():
+        for name, schema in (
+                ('employees', sparse_schema(EmployeeSchema, None,
+                                            (('department', ('id_', 'title')),))),
+                ('employees (id_, full_name)', sparse_schema(EmployeeSchema, ('id_', 'full_name'))),
+        ):
+            timed(f'marshmallow {name}', lambda: schema.dump(employees, many=True), rows)
+            timed(f'compiled {name}',
+                  lambda: serializers.dump(schema, employees, many=True), rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""
+Benchmark of concurrent reads and writes on a SQLite file with the default and
+the "concurrent" SQLite profiles. Reader threads look employees up by id and
+count salaries while one writer thread updates salaries, one commit per update.
+
+Usage, from the repository root:
+    python -m benchmarks.sqlite_profile [SECONDS] [READERS]
+"""
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import date
+
+from sqlalchemy import create_engine, event, func, select, update
+from sqlalchemy.exc import OperationalError
+
+from department_app.models import Department, Employee
+from department_app.models.engine import SQLITE_PROFILES, sqlite_pragmas_listener
+
+ROWS = 20_000
+
+
+def build_engine(path, profile):
+    """Create an engine on a new populated database file with the given profile."""
+    engine = create_engine(f'sqlite:///{path}', connect_args={'check_same_thread': False})
+    if SQLITE_PROFILES[profile]:
+        event.listen(engine, 'connect', sqlite_pragmas_listener(SQLITE_PROFILES[profile]))
+    Department.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(Department.__table__.insert(), [{'title': 'Benchmark'}])
+        connection.execute(Employee.__table__.insert(), [
+            {'full_name': f'Name Surname{index}', 'date_of_birth': date(1990, 1, 1),
+             'salary': 1000 + index % 1000, 'department_id': 1}
+            for index in range(ROWS)
+        ])
+    return engine
+
+
+def run(engine, seconds, readers):
+    """Run readers and a writer for some seconds, return operation and error counts."""
+    counts = {'reads': 0, 'writes': 0, 'errors': 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def count(name):
+        with lock:
+            counts[name] += 1
+
+    def read():
+        rng = random.Random()
+        while time.perf_counter() < deadline:
+            try:
+                with engine.connect() as connection:
+                    connection.execute(select(Employee.__table__).where(
+                        Employee.id_ == rng.randint(1, ROWS))).fetchall()
+                    connection.execute(select(func.avg(Employee.salary)).where(
+                        Employee.salary > rng.randint(1000, 2000))).scalar()
+                count('reads')
+            except OperationalError:
+                count('errors')
+
+    def write():
+        rng = random.Random()
+        while time.perf_counter() < deadline:
+            try:
+                with engine.begin() as connection:
+                    connection.execute(update(Employee.__table__).where(
+                        Employee.id_ == rng.randint(1, ROWS)).values(salary=rng.randint(500, 5000)))
+                count('writes')
+            except OperationalError:
+                count('errors')
+
+    threads = [threading.Thread(target=read) for _ in range(readers)]
+    threads.append(threading.Thread(target=write))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return counts
+
+
+def main():
+    """Run the benchmark."""
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 5
+    readers = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    for profile in ('default', 'concurrent'):
+        handle, path = tempfile.mkstemp(suffix='.db')
+        os.close(handle)
+        try:
+            engine = build_engine(path, profile)
+            counts = run(engine, seconds, readers)
+            engine.dispose()
+        finally:
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+        print(f'{profile:<12} reads/s {counts["reads"] / seconds:9,.0f}   '
+              f'writes/s {counts["writes"] / seconds:7,.0f}   "database is locked" {counts["errors"]}')
+
+
+if __name__ == '__main__':
+    main()
@@ -14,7 +14,17 @@ from flask_bootstrap import Bootstrap
 from flask_migrate import Migrate
 
 from config import Config
+from department_app.commands import import_employees_command
+from department_app.compression import compress
 from department_app.models import db
+from department_app.models.engine import engine_profile
+from department_app.models.replicas import read_replicas
+from department_app.models.sharding import employee_shards
+from department_app.service.analytics import analytics
+from department_app.service.cache import entity_cache
+from department_app.service.cache_backends import cache_backends
+from department_app.service.group_commit import group_commit
+from department_app.service.jobs import background_jobs
 
 migrate = Migrate()
 bootstrap = Bootstrap()
@@ -30,11 +40,23 @@ def create_app(config_class=Config):
     app = Flask(__name__)
     app.config.from_object(config_class)
     db.init_app(app)
+    read_replicas.init_app(app)
+    employee_shards.init_app(app)
+    engine_profile.init_app(app)
     migrate.init_app(app, db)
     bootstrap.init_app(app)
+    analytics.init_app(app)
+    cache_backends.init_app(app)
+    entity_cache.init_app(app)
+    group_commit.init_app(app)
+    background_jobs.init_app(app)
+    compress.init_app(app)
+    app.cli.add_command(import_employees_command)
     with app.app_context():
         from .rest import api
+        from .rest.coalescing import request_coalescing
 
+        request_coalescing.init_app(app)
         api.init_app(app)
         from department_app.views import bp as views_bp
 
@@ -0,0 +1,9 @@
+"""
+Package contains the ASGI serving mode of the REST API: an asyncio database
+engine, async services and async handlers with the JSON contract of the
+Flask-RESTful resources.
+
+Functions:
+    create_asgi_app(config_class)
+"""
+from department_app.aio.app import create_asgi_app
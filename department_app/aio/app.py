@@ -0,0 +1,233 @@
+"""
+Module contains the ASGI application serving the REST API with async handlers.
+
+The ASGI application wraps a Flask application created by create_app(), for
+its configuration and extensions. Every HTTP request is handled in a task of
+the event loop, inside a request context of the Flask application built from
+the ASGI scope, so the request helpers of the REST API (query parameters,
+bodies, JSON representation) work unchanged. Handlers are classes with one
+async method per HTTP method, like Flask-RESTful resources, and return
+(data, status code) or (data, status code, headers) tuples.
+
+Functions:
+    create_asgi_app(config_class)
+"""
+import io
+import re
+
+from flask import request
+from werkzeug.exceptions import HTTPException, MethodNotAllowed, NotFound
+
+from config import Config
+from department_app.aio.database import AsyncDatabase, reset_session, set_session
+from department_app.rest.representations import output_json
+
+PATH_PARAMETER = re.compile(r'<(\w+)>')
+
+
+class Route:
+    """
+    Route of a path pattern (e.g. "/departments/<dep_id>") to a handler class.
+    """
+
+    def __init__(self, pattern, handler, methods):
+        self.pattern = re.compile(
+            PATH_PARAMETER.sub(r'(?P<\1>[^/]+)', pattern.rstrip('/')) + '/?'
+        )
+        self.handler = handler
+        self.methods = tuple(methods)
+
+    def match(self, path):
+        """
+        Match a path.
+        :param path: The request path without the prefix.
+        :return: A dict of path parameters, None if the path does not match.
+        """
+        match = self.pattern.fullmatch(path)
+        return None if match is None else match.groupdict()
+
+
+def _environ(scope, body):
+    """
+    Build the WSGI environ of an ASGI HTTP request.
+    :param scope: The ASGI connection scope.
+    :param body: The request body (bytes).
+    :return: A dict.
+    """
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', ''),
+        'PATH_INFO': scope['path'],
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f'HTTP/{scope.get("http_version", "1.1")}',
+        'REMOTE_ADDR': (scope.get('client') or ('', 0))[0],
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': io.StringIO(),
+        'wsgi.multithread': False,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope['headers']:
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            environ[name] = value
+        else:
+            key = f'HTTP_{name}'
+            environ[key] = f'{environ[key]},{value}' if key in environ else value
+    return environ
+
+
+async def _read_body(receive):
+    """
+    Read the whole body of a request.
+    :param receive: The ASGI receive callable.
+    :return: bytes
+    """
+    chunks = []
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            break
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body'):
+            break
+    return b''.join(chunks)
+
+
+class AsgiApp:
+    """
+    ASGI application dispatching requests to async handlers.
+    """
+
+    def __init__(self, flask_app, prefix='/api/v1'):
+        self.flask_app = flask_app
+        self.prefix = prefix
+        self.routes = []
+        self.database = AsyncDatabase(flask_app.config)
+
+    def add_route(self, handler, *patterns, methods):
+        """
+        Register a handler class for path patterns.
+        :param handler: Class with async methods named after the HTTP methods.
+        :param patterns: Path patterns, relative to the prefix.
+        :param methods: HTTP methods allowed.
+        :return: None
+        """
+        for pattern in patterns:
+            self.routes.append(Route(pattern, handler, methods))
+
+    def resolve(self, method, path):
+        """
+        Find the handler of a request.
+        :param method: The HTTP method.
+        :param path: The request path.
+        :return: A tuple (bound handler method, dict of path parameters).
+        :raise NotFound: if no route matches the path.
+        :raise MethodNotAllowed: if the routes of the path don't allow the method.
+        """
+        if not path.startswith(self.prefix):
+            raise NotFound()
+        path = path[len(self.prefix):]
+        allowed = set()
+        for route in self.routes:
+            parameters = route.match(path)
+            if parameters is None:
+                continue
+            if method in route.methods:
+                return getattr(route.handler(), method.lower()), parameters
+            allowed.update(route.methods)
+        if allowed:
+            raise MethodNotAllowed(valid_methods=sorted(allowed))
+        raise NotFound()
+
+    async def dispatch(self):
+        """
+        Run the handler of the current request with a session of its own. The
+        route is resolved first, so routing errors don't touch the database.
+        :return: A tuple (data, status code, headers).
+        """
+        try:
+            handler, parameters = self.resolve(request.method, request.path)
+            async with self.database.session() as session:
+                token = set_session(session)
+                try:
+                    result = await handler(**parameters)
+                finally:
+                    reset_session(token)
+            return result if len(result) == 3 else (*result, {})
+        except HTTPException as exception:
+            headers = dict(exception.get_headers())
+            headers.pop('Content-Type', None)
+            return {'message': exception.description}, exception.code, headers
+        except Exception:  # pylint: disable=W0703
+            self.flask_app.logger.exception('Exception on %s [%s]', request.path, request.method)
+            return {'message': 'Internal Server Error'}, 500, {}
+
+    async def handle(self, scope, receive, send):
+        """
+        Handle an HTTP request.
+        :param scope: The ASGI connection scope.
+        :param receive: The ASGI receive callable.
+        :param send: The ASGI send callable.
+        :return: None
+        """
+        environ = _environ(scope, await _read_body(receive))
+        with self.flask_app.request_context(environ):
+            data, status, headers = await self.dispatch()
+            response = output_json(data, status, headers)
+            body = b'' if status == 204 else response.get_data()
+            headers = [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                       for name, value in response.headers.items() if name != 'Content-Length']
+        headers.append((b'content-length', str(len(body)).encode('latin-1')))
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': body})
+
+    async def lifespan(self, receive, send):
+        """
+        Handle the startup and shutdown of the server: the engine is closed on shutdown.
+        :param receive: The ASGI receive callable.
+        :param send: The ASGI send callable.
+        :return: None
+        """
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.database.dispose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self.handle(scope, receive, send)
+        else:
+            raise ValueError(f'Unsupported ASGI scope type: {scope["type"]}')
+
+
+def create_asgi_app(config_class=Config):
+    """
+    Create an ASGI application serving the department and employee REST API
+    with async handlers.
+    :param config_class: Configuration class of the wrapped Flask application.
+    :return: AsgiApp instance.
+    :raise ValueError: if employees are sharded, which the async services don't support.
+    """
+    from department_app import create_app  # pylint: disable=C0415
+    from department_app.aio.rest import register  # pylint: disable=C0415
+
+    flask_app = create_app(config_class=config_class)
+    if flask_app.config.get('EMPLOYEE_SHARD_URIS'):
+        raise ValueError('The ASGI application does not support EMPLOYEE_SHARD_URIS')
+    app = AsgiApp(flask_app)
+    register(app)
+    return app
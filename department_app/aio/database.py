@@ -0,0 +1,133 @@
+"""
+Module contains the asyncio database engine of the ASGI application.
+
+The database URI of the app is turned into the URI of the matching asyncio
+driver ("sqlite" => aiosqlite, "mysql" => aiomysql) and the engine is created
+on first use, so the driver is imported only when the database is queried.
+Every request gets its own AsyncSession, which the async services find with
+get_session(); its commits write the change log if "CHANGE_LOG" is set.
+
+Functions:
+    async_uri(uri)
+    get_session()
+"""
+import contextvars
+
+from sqlalchemy import event
+from sqlalchemy.engine.url import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from department_app.models.changelog import ENABLED_KEY
+from department_app.models.engine import SQLITE_PROFILES, sqlite_pragmas_listener
+
+# Backend name => asyncio driver
+ASYNC_DRIVERS = {
+    'sqlite': 'aiosqlite',
+    'mysql': 'aiomysql',
+}
+
+_session = contextvars.ContextVar('async_session', default=None)
+
+
+def async_uri(uri):
+    """
+    Get the URI of a database for its asyncio driver.
+    :param uri: Database URI (str), e.g. "mysql+mysqlconnector://user@host/db".
+    :return: The URI with the asyncio driver, e.g. "mysql+aiomysql://user@host/db".
+    :raise ValueError: if there is no asyncio driver for the database.
+    """
+    url = make_url(uri)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f'No asyncio driver for {backend} databases')
+    return str(url.set(drivername=f'{backend}+{ASYNC_DRIVERS[backend]}'))
+
+
+class AsyncDatabase:
+    """
+    Asyncio engine and session factory of an application, created on first use.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self._engine = None
+        self._sessionmaker = None
+
+    def _engine_options(self):
+        """Build the options of the engine from the "DB_POOL_*" configuration options."""
+        url = make_url(self.config['SQLALCHEMY_DATABASE_URI'])
+        if url.get_backend_name() == 'sqlite':
+            return {}
+        return {
+            'pool_size': self.config['DB_POOL_SIZE'],
+            'max_overflow': self.config['DB_POOL_MAX_OVERFLOW'],
+            'pool_recycle': self.config['DB_POOL_RECYCLE'],
+            'pool_pre_ping': self.config['DB_POOL_PRE_PING'],
+            'pool_timeout': self.config['DB_POOL_TIMEOUT'],
+        }
+
+    @property
+    def engine(self):
+        """The AsyncEngine, created with the SQLite pragmas of "SQLITE_PROFILE"."""
+        if self._engine is None:
+            engine = create_async_engine(
+                async_uri(self.config['SQLALCHEMY_DATABASE_URI']), **self._engine_options()
+            )
+            pragmas = SQLITE_PROFILES[self.config.get('SQLITE_PROFILE', 'default')]
+            if engine.dialect.name == 'sqlite' and pragmas:
+                event.listen(engine.sync_engine, 'connect', sqlite_pragmas_listener(pragmas))
+            self._engine = engine
+            self._sessionmaker = sessionmaker(
+                engine, class_=AsyncSession, expire_on_commit=False,
+                info={ENABLED_KEY: self.config.get('CHANGE_LOG', False)}
+            )
+        return self._engine
+
+    def session(self):
+        """
+        Make a new session.
+        :return: An AsyncSession.
+        """
+        if self._sessionmaker is None:
+            self.engine  # pylint: disable=W0104
+        return self._sessionmaker()
+
+    async def dispose(self):
+        """
+        Close the connections of the engine.
+        :return: None
+        """
+        if self._engine is not None:
+            await self._engine.dispose()
+            self._engine = self._sessionmaker = None
+
+
+def get_session():
+    """
+    Get the session of the current request.
+    :return: An AsyncSession.
+    :raise RuntimeError: outside of a request.
+    """
+    session = _session.get()
+    if session is None:
+        raise RuntimeError('No async session outside of a request')
+    return session
+
+
+def set_session(session):
+    """
+    Make a session the session of the current request.
+    :param session: An AsyncSession, None to unset it.
+    :return: The token to reset the previous session with.
+    """
+    return _session.set(session)
+
+
+def reset_session(token):
+    """
+    Restore the session of before set_session().
+    :param token: The token returned by set_session().
+    :return: None
+    """
+    _session.reset(token)
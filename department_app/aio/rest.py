@@ -0,0 +1,382 @@
+"""
+Module contains the async handlers of the department and employee REST API
+served by the ASGI application.
+
+The handlers keep the JSON contract of the Flask-RESTful resources: same
+URLs, bodies, validation messages, status codes and version ETags, with
+the "If-Match" header honoured by updates and deletes. Departments are dumped
+with their employees and average salary, employees with their department,
+all loaded with a fixed number of queries per response.
+
+Functions:
+    dump_departments(departments)
+    dump_employees(employees)
+    register(app)
+"""
+from marshmallow import ValidationError
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.exc import StaleDataError
+
+from department_app.aio.services import AsyncDepartmentServices, AsyncEmployeeServices
+from department_app.rest.params import (
+    page, parse_body, parse_if_match, parse_page, version_headers
+)
+from department_app.rest.schemas import DepartmentSchema, EmployeeSchema
+
+# Schemas of the columns; relations and computed fields are added by the dump functions
+_department_columns = DepartmentSchema(only=('id_', 'title'))
+_employee_columns = EmployeeSchema(exclude=('department',))
+
+
+def _to_id(value):
+    """
+    Convert an id of the URL to int.
+    :param value: The path parameter (str).
+    :return: int, None if the value is not a number.
+    """
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+async def _get_department(dep_id):
+    """Get a department by the id of the URL, None if there is no such department."""
+    dep_id = _to_id(dep_id)
+    return None if dep_id is None else await AsyncDepartmentServices.get_by_id(dep_id)
+
+
+async def _get_employee(emp_id):
+    """Get an employee by the id of the URL, None if there is no such employee."""
+    emp_id = _to_id(emp_id)
+    return None if emp_id is None else await AsyncEmployeeServices.get_by_id(emp_id)
+
+
+async def dump_departments(departments):
+    """
+    Serialize departments with their employees and average salaries.
+    :param departments: A list of Department objects.
+    :return: A list of dicts.
+    """
+    dep_ids = [department.id_ for department in departments]
+    employees = await AsyncDepartmentServices.get_employees(dep_ids)
+    averages = await AsyncDepartmentServices.get_avg_salaries(dep_ids)
+    return [{
+        **_department_columns.dump(department),
+        'avg_salary': averages[department.id_],
+        'employees': _employee_columns.dump(employees[department.id_], many=True),
+    } for department in departments]
+
+
+async def dump_employees(employees):
+    """
+    Serialize employees with their departments.
+    :param employees: A list of Employee objects.
+    :return: A list of dicts.
+    """
+    dep_ids = {employee.department_id for employee in employees}
+    departments = await AsyncDepartmentServices.get_by_ids(dep_ids)
+    averages = await AsyncDepartmentServices.get_avg_salaries(departments)
+    dumped = {
+        dep_id: {**_department_columns.dump(department), 'avg_salary': averages[dep_id]}
+        for dep_id, department in departments.items()
+    }
+    return [{
+        **_employee_columns.dump(employee), 'department': dumped.get(employee.department_id)
+    } for employee in employees]
+
+
+class AsyncDepartmentApi:
+    """
+    Async handler of the "/api/v1/departments/[<int:id>]" url
+    """
+    dep_schema = DepartmentSchema()
+
+    async def get(self, dep_id=None):
+        """
+        This method is called when GET request is sent to "/api/v1/departments/[<int:id>]" url
+        :return:
+        if "id" not specified => the list of all departments in json format, status code 200.
+        If "id" specified =>  the department with the specified "id" serialized to json
+        and its ETag, status code 200.
+        If invalid "id" => error message, status code 404.
+        """
+        if dep_id is None:
+            return await dump_departments(await AsyncDepartmentServices.get_all()), 200
+        department = await _get_department(dep_id)
+        if department is None:
+            return {'message': f'Department with id = {dep_id} was not found'}, 404
+        return (await dump_departments([department]))[0], 200, version_headers(department.version)
+
+    async def post(self):
+        """
+        This method is called when POST request is sent to "/api/v1/departments" url with json data.
+        Creates a new department entry in database.
+        :return:
+        if valid data provided => returns the created entry serialized to json and its
+        ETag, status code 201
+        if invalid data => returns the error message in json format, status code 400.
+        """
+        json_data = parse_body()
+        try:
+            data = self.dep_schema.load(json_data)
+        except ValidationError as exception:
+            return exception.messages, 400
+        try:
+            new_department = await AsyncDepartmentServices.create(data)
+        except IntegrityError:
+            return {'message': 'Department names should be unique'}, 400
+        return (await dump_departments([new_department]))[0], 201, \
+            version_headers(new_department.version)
+
+    async def put(self, dep_id):
+        """
+        This method is called when PUT request is sent to "/api/v1/departments/id" url
+        with json data. Changes name of specified department in database. With the
+        "If-Match" header (the ETag of the department), the department is only changed
+        if it was not changed since.
+        :return:
+        if valid data provided => returns the changed entry serialized to json and its
+        new ETag, status code 200
+        if invalid data => returns the error message in json format, status code 400.
+        If invalid "id" => error message, status code 404.
+        If the department was changed since the "If-Match" ETag or by a concurrent
+        request => the current entry serialized to json and its ETag, status code 409.
+        """
+        json_data = parse_body()
+        try:
+            version = parse_if_match()
+        except ValueError:
+            return {'message': 'If-Match should be the ETag of the department'}, 400
+        department = await _get_department(dep_id)
+        if department is None:
+            return {'message': f'Department with id = {dep_id} was not found'}, 404
+        try:
+            data = self.dep_schema.load(json_data)
+        except ValidationError as exception:
+            return exception.messages, 400
+        try:
+            updated_department = await AsyncDepartmentServices.update(department, data, version)
+        except IntegrityError:
+            return {'message': 'Department names should be unique'}, 400
+        except StaleDataError:
+            return await self._conflict(dep_id)
+        return (await dump_departments([updated_department]))[0], 200, \
+            version_headers(updated_department.version)
+
+    async def delete(self, dep_id):
+        """
+        This method is called when DELETE request is sent to url "/api/v1/departments/id"
+        deletes the department entry with specified id from database. With the "If-Match"
+        header (the ETag of the department), the department is only deleted if it was not
+        changed since.
+        :return:
+        if valid "id" => returns an empty response body and status code 204 specified.
+        If invalid "id" specified => returns error message and status code 404.
+        If the department was changed since the "If-Match" ETag or by a concurrent
+        request => the current entry serialized to json and its ETag, status code 409.
+        """
+        try:
+            version = parse_if_match()
+        except ValueError:
+            return {'message': 'If-Match should be the ETag of the department'}, 400
+        department = await _get_department(dep_id)
+        if department is None:
+            return {'message': f'Department with id = {dep_id} was not found'}, 404
+        try:
+            await AsyncDepartmentServices.delete(department, version)
+        except StaleDataError:
+            return await self._conflict(dep_id)
+        return '', 204
+
+    async def _conflict(self, dep_id):
+        """
+        Build the response of a write to a stale version of a department.
+        :return: The current department serialized to json and its ETag, status code 409.
+        If the department was deleted since => error message, status code 404.
+        """
+        department = await _get_department(dep_id)
+        if department is None:
+            return {'message': f'Department with id = {dep_id} was not found'}, 404
+        return (await dump_departments([department]))[0], 409, version_headers(department.version)
+
+
+class AsyncDepartmentsEmployeesApi:
+    """
+    Async handler of the "/api/v1/departments/[<int:id>]/employees" url
+    """
+    emp_schema = EmployeeSchema()
+
+    async def get(self, dep_id):
+        """
+        This method is called when GET request is sent to "/api/v1/departments/[<int:id>]/employees"
+        :return:
+        If "id" is valid => list of employees from department with specified "id" serialized
+        to json, status code 200.
+        If invalid "id" => error message, status code 404.
+        """
+        department = await _get_department(dep_id)
+        if department is None:
+            return {'message': f'Department with id = {dep_id} was not found'}, 404
+        employees = await AsyncEmployeeServices.get_all_from_department(department.id_)
+        return await dump_employees(employees), 200
+
+    async def post(self, dep_id):
+        """
+        This method is called when POST request is sent to
+        "/api/v1/departments/[<int:id>]/employees" with json data.
+        Creates a new employee in specified department in database.
+        :return:
+        if valid data provided => returns the created entry serialized to json and its
+        ETag, status code 201
+        if invalid data => returns the error message in json format, status code 400.
+        if invalid "id" => returns the error message in json format, status code 404.
+        """
+        json_data = parse_body()
+        department = await _get_department(dep_id)
+        if department is None:
+            return {'message': f'Department with id = {dep_id} was not found'}, 404
+        try:
+            data = self.emp_schema.load(json_data, partial=["department_id"])
+        except ValidationError as exception:
+            return exception.messages, 400
+        data['department_id'] = department.id_
+        new_employee = await AsyncEmployeeServices.create(data)
+        return (await dump_employees([new_employee]))[0], 201, \
+            version_headers(new_employee.version)
+
+
+class AsyncEmployeeApi:
+    """
+    Async handler of the "/api/v1/employees/[<int:id>]" url
+    """
+    emp_schema = EmployeeSchema()
+
+    async def get(self, emp_id=None):
+        """
+        This method is called when GET request is sent to "/api/v1/employees/[<int:id>]" url
+        :return:
+        if "id" not specified => the list of all employees in json format, status code 200.
+        If "id" specified =>  the employee with the specified "id" serialized to json
+        and its ETag, status code 200.
+        If invalid "id" => error message, status code 404.
+        The "limit" and "after" query parameters (e.g. ?limit=100&after=200) return a page
+        of the list ordered by id and the "after" value of the next page
+        ({"items": [...], "next": id or null}), invalid values => error message, status code 400.
+        """
+        if emp_id is None:
+            try:
+                after, limit = parse_page()
+            except ValueError:
+                return {'message': 'limit and after should be positive numbers'}, 400
+            employees = await AsyncEmployeeServices.get_all(after, limit)
+            items = await dump_employees(employees)
+            return (items if limit is None else page(items, employees, limit)), 200
+        employee = await _get_employee(emp_id)
+        if employee is None:
+            return {'message': f'Employee with id = {emp_id} was not found'}, 404
+        return (await dump_employees([employee]))[0], 200, version_headers(employee.version)
+
+    async def post(self):
+        """
+        This method is called when POST request is sent to "/api/v1/employees" url with json data.
+        Creates a new employee entry in database.
+        :return:
+        if valid data provided => returns the created entry serialized to json and its
+        ETag, status code 201
+        if invalid data => returns the error message in json format, status code 400.
+        """
+        json_data = parse_body()
+        try:
+            data = self.emp_schema.load(json_data)
+        except ValidationError:
+            return 'Bad data', 400
+        try:
+            new_employee = await AsyncEmployeeServices.create(data)
+        except IntegrityError:
+            return {'message': 'Not valid department id'}, 400
+        return (await dump_employees([new_employee]))[0], 201, \
+            version_headers(new_employee.version)
+
+    async def put(self, emp_id):
+        """
+        This method is called when PUT request is sent to "/api/v1/employees/id" url with json data.
+        Changes specified data of selected employee in database. With the "If-Match" header
+        (the ETag of the employee), the employee is only changed if it was not changed since.
+        :return:
+        if valid data provided => returns the changed entry serialized to json and its
+        new ETag, status code 200
+        if invalid data => error message in json format, status code 400.
+        If invalid "id" => error message, status code 404.
+        If the employee was changed since the "If-Match" ETag or by a concurrent request
+        => the current entry serialized to json and its ETag, status code 409.
+        """
+        json_data = parse_body()
+        try:
+            version = parse_if_match()
+        except ValueError:
+            return {'message': 'If-Match should be the ETag of the employee'}, 400
+        employee = await _get_employee(emp_id)
+        if employee is None:
+            return {'message': f"Employee with id {emp_id} not found"}, 404
+        try:
+            data = self.emp_schema.load(json_data, partial=True)
+        except ValidationError as exception:
+            return exception.messages, 400
+        try:
+            updated_employee = await AsyncEmployeeServices.update(employee, data, version)
+        except IntegrityError:
+            return {'message': 'Not valid department id'}, 400
+        except StaleDataError:
+            return await self._conflict(emp_id)
+        return (await dump_employees([updated_employee]))[0], 200, \
+            version_headers(updated_employee.version)
+
+    async def delete(self, emp_id):
+        """
+        This method is called when DELETE request is sent to url "/api/v1/employees/id"
+        deletes employee with specified "id" from database. With the "If-Match" header
+        (the ETag of the employee), the employee is only deleted if it was not changed since.
+        :return:
+        if valid "id" => returns an empty response body and status code 204 specified.
+        If invalid "id" specified => returns error message and status code 404.
+        If the employee was changed since the "If-Match" ETag or by a concurrent request
+        => the current entry serialized to json and its ETag, status code 409.
+        """
+        try:
+            version = parse_if_match()
+        except ValueError:
+            return {'message': 'If-Match should be the ETag of the employee'}, 400
+        employee = await _get_employee(emp_id)
+        if employee is None:
+            return {'message': f'Employee with id = {emp_id} was not found'}, 404
+        try:
+            await AsyncEmployeeServices.delete(employee, version)
+        except StaleDataError:
+            return await self._conflict(emp_id)
+        return '', 204
+
+    async def _conflict(self, emp_id):
+        """
+        Build the response of a write to a stale version of an employee.
+        :return: The current employee serialized to json and its ETag, status code 409.
+        If the employee was deleted since => error message, status code 404.
+        """
+        employee = await _get_employee(emp_id)
+        if employee is None:
+            return {'message': f'Employee with id = {emp_id} was not found'}, 404
+        return (await dump_employees([employee]))[0], 409, version_headers(employee.version)
+
+
+def register(app):
+    """
+    Register the handlers with the ASGI application.
+    :param app: AsgiApp instance.
+    :return: None
+    """
+    app.add_route(AsyncDepartmentApi, '/departments', methods=['GET', 'POST'])
+    app.add_route(AsyncDepartmentApi, '/departments/<dep_id>', methods=['GET', 'PUT', 'DELETE'])
+    app.add_route(AsyncDepartmentsEmployeesApi, '/departments/<dep_id>/employees',
+                  methods=['GET', 'POST'])
+    app.add_route(AsyncEmployeeApi, '/employees', methods=['GET', 'POST'])
+    app.add_route(AsyncEmployeeApi, '/employees/<emp_id>', methods=['GET', 'PUT', 'DELETE'])
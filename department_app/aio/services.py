@@ -0,0 +1,253 @@
+# pylint: disable=E1101
+"""
+Module contains async Service classes with methods for DB CRUD operations on
+departments and employees, for the ASGI application.
+
+The methods are the async counterparts of DepartmentServices and
+EmployeeServices: they run on the session of the current request (see
+department_app.aio.database) and await the database instead of blocking a
+thread. Relations are never lazy loaded; the employees and average salaries
+of departments are fetched with one query per list.
+"""
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.exc import StaleDataError
+
+from department_app.aio.database import get_session
+from department_app.models import Department, Employee
+
+
+def _check_version(instance, version):
+    """
+    Check a department or employee is at the version a client expects.
+    :param instance: A Department or Employee instance.
+    :param version: The expected version, None for any version.
+    :return: None
+    :raise StaleDataError: if the instance is at another version.
+    """
+    if version is not None and instance.version != version:
+        raise StaleDataError(
+            f'{type(instance).__name__} {instance.id_} is at version {instance.version}, '
+            f'not {version}'
+        )
+
+
+async def _commit():
+    """
+    Commit the session of the current request, rolling it back if the commit fails
+    on a constraint or a concurrent change, so the current rows can be loaded again.
+    :return: None
+    :raise IntegrityError: if a constraint is violated.
+    :raise StaleDataError: if a changed or deleted row was changed since it was loaded.
+    """
+    session = get_session()
+    try:
+        await session.commit()
+    except (IntegrityError, StaleDataError):
+        await session.rollback()
+        raise
+
+
+class AsyncDepartmentServices:
+    """Class with async methods for DB CRUD operation on departments."""
+
+    @staticmethod
+    async def get_all():
+        """
+        Get all departments.
+        :return: A list of Department objects ordered by id.
+        """
+        result = await get_session().execute(select(Department).order_by(Department.id_))
+        return result.scalars().all()
+
+    @staticmethod
+    async def get_by_id(dep_id):
+        """
+        Get a specific department by id.
+        :param dep_id: Id of the department to fetch (int)
+        :return: Department with id=dep_id, None if no such department.
+        """
+        return await get_session().get(Department, dep_id)
+
+    @staticmethod
+    async def get_by_ids(dep_ids):
+        """
+        Get many departments by ids with one IN query.
+        :param dep_ids: Iterable of department ids (int).
+        :return: A dict {id: Department} of the found departments.
+        """
+        dep_ids = set(dep_ids)
+        if not dep_ids:
+            return {}
+        result = await get_session().execute(
+            select(Department).where(Department.id_.in_(dep_ids))
+        )
+        return {department.id_: department for department in result.scalars()}
+
+    @staticmethod
+    async def get_employees(dep_ids):
+        """
+        Get the employees of departments with one IN query.
+        :param dep_ids: Iterable of department ids (int).
+        :return: A dict {department id: list of its employees ordered by id}.
+        """
+        employees = {dep_id: [] for dep_id in dep_ids}
+        if not employees:
+            return employees
+        result = await get_session().execute(
+            select(Employee).where(Employee.department_id.in_(employees)).order_by(Employee.id_)
+        )
+        for employee in result.scalars():
+            employees[employee.department_id].append(employee)
+        return employees
+
+    @staticmethod
+    async def get_avg_salaries(dep_ids):
+        """
+        Calculate the average salaries of departments with one grouped query.
+        :param dep_ids: Iterable of department ids (int).
+        :return: A dict {department id: average salary rounded to an integer,
+        0 if no employees in the department}.
+        """
+        averages = {dep_id: 0 for dep_id in dep_ids}
+        if not averages:
+            return averages
+        result = await get_session().execute(
+            select(Employee.department_id, func.avg(Employee.salary))
+            .where(Employee.department_id.in_(averages))
+            .group_by(Employee.department_id)
+        )
+        for dep_id, average in result:
+            averages[dep_id] = 0 if average is None else round(average)
+        return averages
+
+    @staticmethod
+    async def create(data):
+        """
+        Create a new Department instance from dict and save new entry to DB
+        :param data: A dict with data to create a department from.
+        :return: the created instance
+        """
+        session = get_session()
+        department = Department(**data)
+        session.add(department)
+        await session.commit()
+        return department
+
+    @staticmethod
+    async def update(department, data, version=None):
+        """
+        Update a Department object and related DB entry with data from dict.
+        :param department: A Department instance.
+        :param data: A dict with data to update the department with.
+        :param version: The version of the department to update, None for any version.
+        :return: The updated instance.
+        :raise IntegrityError: if the new title is not unique.
+        :raise StaleDataError: if the department is not at the given version or was
+        changed since it was loaded.
+        """
+        _check_version(department, version)
+        for key in data:
+            if key in department.__dict__.keys():
+                setattr(department, key, data[key])
+        await _commit()
+        return department
+
+    @staticmethod
+    async def delete(department, version=None):
+        """
+        Delete a Department instance and its employees from DB
+        :param department: The department to be deleted.
+        :param version: The version of the department to delete, None for any version.
+        :return: None
+        :raise StaleDataError: if the department is not at the given version or was
+        changed since it was loaded.
+        """
+        _check_version(department, version)
+        await get_session().delete(department)
+        await _commit()
+
+
+class AsyncEmployeeServices:
+    """Class with async methods for DB CRUD operation on employees."""
+
+    @staticmethod
+    async def get_all(after=None, limit=None):
+        """
+        Get all employees, or one page of them.
+        :param after: Id of the last employee of the previous page, None for the first page.
+        :param limit: Maximal number of employees, None for all.
+        :return: A list of Employee objects ordered by id.
+        """
+        statement = select(Employee).order_by(Employee.id_)
+        if after is not None:
+            statement = statement.where(Employee.id_ > after)
+        if limit is not None:
+            statement = statement.limit(limit)
+        result = await get_session().execute(statement)
+        return result.scalars().all()
+
+    @staticmethod
+    async def get_all_from_department(dep_id):
+        """
+        Get the employees of a department.
+        :param dep_id: Id of the department (int).
+        :return: A list of Employee objects ordered by id.
+        """
+        return (await AsyncDepartmentServices.get_employees([dep_id]))[dep_id]
+
+    @staticmethod
+    async def get_by_id(emp_id):
+        """
+        Get a specific employee by id.
+        :param emp_id: Id of the employee to fetch (int)
+        :return: Employee with id=emp_id, None if no such employee.
+        """
+        return await get_session().get(Employee, emp_id)
+
+    @staticmethod
+    async def create(data):
+        """
+        Create a new Employee instance from dict and save new entry to DB
+        :param data: A dict with data to create an employee from.
+        :return: the created instance
+        :raise IntegrityError: if the department does not exist.
+        """
+        session = get_session()
+        employee = Employee(**data)
+        session.add(employee)
+        await session.commit()
+        return employee
+
+    @staticmethod
+    async def update(employee, data, version=None):
+        """
+        Update an Employee object and related DB entry with data from dict.
+        :param employee: An Employee instance.
+        :param data: A dict with data to update the employee with.
+        :param version: The version of the employee to update, None for any version.
+        :return: The updated instance.
+        :raise IntegrityError: if the new department does not exist.
+        :raise StaleDataError: if the employee is not at the given version or was
+        changed since it was loaded.
+        """
+        _check_version(employee, version)
+        for key in data:
+            if key in employee.__dict__.keys():
+                setattr(employee, key, data[key])
+        await _commit()
+        return employee
+
+    @staticmethod
+    async def delete(employee, version=None):
+        """
+        Delete an Employee instance from DB
+        :param employee: The employee to be deleted.
+        :param version: The version of the employee to delete, None for any version.
+        :return: None
+        :raise StaleDataError: if the employee is not at the given version or was
+        changed since it was loaded.
+        """
+        _check_version(employee, version)
+        await get_session().delete(employee)
+        await _commit()
@@ -0,0 +1,87 @@
+"""
+Module contains the command line commands of the application, run with
+"flask <command>".
+
+Functions:
+    import_employees_command(path, file_format, chunk_size, checkpoint)
+"""
+import os
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+from department_app.service.imports import (
+    READERS, ImportInterrupted, import_employees, read_records
+)
+
+
+def _read_checkpoint(path):
+    """
+    Read the checkpoint of an interrupted import.
+    :param path: Path of the checkpoint file, or None.
+    :return: The last committed row (int), 0 if there is no checkpoint.
+    """
+    if path is None or not os.path.exists(path):
+        return 0
+    with open(path, encoding='utf-8') as file:
+        return int(file.read().strip() or 0)
+
+
+def _write_checkpoint(path, row):
+    """Replace the checkpoint file atomically."""
+    temporary = f'{path}.tmp'
+    with open(temporary, 'w', encoding='utf-8') as file:
+        file.write(str(row))
+    os.replace(temporary, path)
+
+
+@click.command('import-employees')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'file_format', type=click.Choice(sorted(READERS)),
+              help='Format of the file, by default its extension.')
+@click.option('--chunk-size', type=click.IntRange(min=1),
+              help='Rows per transaction, IMPORT_CHUNK_SIZE by default.')
+@click.option('--checkpoint', type=click.Path(dir_okay=False),
+              help='File keeping the last committed row: an interrupted import run '
+                   'again with it resumes after that row.')
+@with_appcontext
+def import_employees_command(path, file_format, chunk_size, checkpoint):
+    """
+    Import employees from a CSV (with a header row) or JSON Lines file.
+    """
+    file_format = file_format or os.path.splitext(path)[1].lstrip('.').lower()
+    if file_format not in READERS:
+        raise click.BadParameter('use --format for files without a .csv or .jsonl extension')
+    start = _read_checkpoint(checkpoint)
+    if start:
+        click.echo(f'Resuming after row {start}')
+
+    def progress(report):
+        if checkpoint is not None:
+            _write_checkpoint(checkpoint, report['checkpoint'])
+        click.echo(f'Row {report["checkpoint"]}: {report["imported"]} imported, '
+                   f'{report["failed"]} failed, {report["rows_per_second"]} rows/s')
+
+    with open(path, encoding='utf-8', newline='') as file:
+        try:
+            report = import_employees(
+                read_records(file, file_format), start,
+                chunk_size or current_app.config['IMPORT_CHUNK_SIZE'],
+                current_app.config['IMPORT_MAX_ERRORS'], progress
+            )
+        except ValueError as exception:
+            raise click.ClickException(str(exception)) from exception
+        except ImportInterrupted as exception:
+            hint = 'the same --checkpoint' if checkpoint else \
+                f'--checkpoint naming a file containing {exception.report["checkpoint"]}'
+            raise click.ClickException(
+                f'{exception}. Run the command again with {hint} to resume.'
+            ) from exception
+    for error in report['errors']:
+        click.echo(f'Row {error["row"]}: {error["errors"]}', err=True)
+    if checkpoint is not None and os.path.exists(checkpoint):
+        os.remove(checkpoint)
+    click.echo(f'Imported {report["imported"]} of {report["rows"]} rows in '
+               f'{report["seconds"]} s ({report["rows_per_second"]} rows/s), '
+               f'{report["failed"]} failed')
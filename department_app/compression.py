@@ -0,0 +1,234 @@
+"""
+Module contains a Flask extension compressing responses with the best encoding
+accepted by the client: brotli or zstd when their packages are installed, gzip
+otherwise.
+
+Buffered responses are compressed when they reach "COMPRESS_MIN_SIZE" bytes,
+and recently compressed bodies are kept in a cache backend, keyed by the digest
+of the body, so hot responses are hashed instead of being compressed again.
+Streamed responses are compressed chunk by chunk, every chunk is flushed to
+the client as soon as it is produced. Responses which already have a
+"Content-Encoding", are sent as files or ask for "no-transform" are left as is.
+
+Classes:
+    Compress
+"""
+import hashlib
+import zlib
+
+from flask import current_app, request
+
+from department_app.service.cache_backends import ABSENT, create_backend
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+
+class _GzipCodec:
+    """gzip codec on top of zlib, with a fixed header so equal bodies compress equally."""
+
+    def __init__(self, level):
+        self.level = level
+
+    def compressor(self):
+        """Make a stream compressor."""
+        return zlib.compressobj(self.level, zlib.DEFLATED, 31)
+
+    def compress(self, body):
+        """Compress a whole body."""
+        compressor = self.compressor()
+        return compressor.compress(body) + compressor.flush()
+
+    @staticmethod
+    def flush(compressor):
+        """Flush the data compressed so far, keeping the stream open."""
+        return compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    @staticmethod
+    def finish(compressor):
+        """End the stream."""
+        return compressor.flush()
+
+
+class _BrotliCodec:
+    """brotli codec."""
+
+    def __init__(self, level):
+        self.level = level
+
+    def compressor(self):
+        """Make a stream compressor."""
+        return brotli.Compressor(quality=self.level)
+
+    def compress(self, body):
+        """Compress a whole body."""
+        return brotli.compress(body, quality=self.level)
+
+    @staticmethod
+    def flush(compressor):
+        """Flush the data compressed so far, keeping the stream open."""
+        return compressor.flush()
+
+    @staticmethod
+    def finish(compressor):
+        """End the stream."""
+        return compressor.finish()
+
+
+class _ZstdCodec:
+    """zstd codec."""
+
+    def __init__(self, level):
+        self.level = level
+
+    def compressor(self):
+        """Make a stream compressor."""
+        return zstandard.ZstdCompressor(level=self.level).compressobj()
+
+    def compress(self, body):
+        """Compress a whole body."""
+        return zstandard.ZstdCompressor(level=self.level).compress(body)
+
+    @staticmethod
+    def flush(compressor):
+        """Flush the data compressed so far, keeping the stream open."""
+        return compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    @staticmethod
+    def finish(compressor):
+        """End the stream."""
+        return compressor.flush()
+
+
+# Encoding => (codec class, compression level, True if the codec is available)
+CODECS = {
+    'br': (_BrotliCodec, 5, brotli is not None),
+    'zstd': (_ZstdCodec, 3, zstandard is not None),
+    'gzip': (_GzipCodec, 6, True),
+}
+
+
+class Compress:
+    """
+    Flask extension compressing responses of an application.
+    """
+
+    def init_app(self, app):
+        """
+        Register the compression of responses if "COMPRESS_ENABLED" is set.
+        :param app: Flask application instance.
+        :return: None
+        """
+        if not app.config.get('COMPRESS_ENABLED'):
+            return
+        app.extensions['compress'] = {
+            'codecs': {
+                name: codec_class(level)
+                for name, (codec_class, level, available) in CODECS.items()
+                if available and name in app.config['COMPRESS_ENCODINGS']
+            },
+            'encodings': [
+                name for name in app.config['COMPRESS_ENCODINGS']
+                if name in CODECS and CODECS[name][2]
+            ],
+            'mimetypes': set(app.config['COMPRESS_MIMETYPES']),
+            'min_size': app.config['COMPRESS_MIN_SIZE'],
+            'cache': create_backend(app, 'compressed', app.config['COMPRESS_CACHE_SIZE'])
+            if app.config['COMPRESS_CACHE_SIZE'] > 0 else None,
+        }
+        app.after_request(self._after_request)
+
+    @staticmethod
+    def _choose_encoding(settings):
+        """
+        Choose the preferred encoding accepted by the client.
+        :param settings: Compression settings of the app.
+        :return: The encoding name or None if the client accepts none of them.
+        """
+        accepted = request.accept_encodings
+        for name in settings['encodings']:
+            if accepted.quality(name) > 0:
+                return name
+        return None
+
+    @staticmethod
+    def _compress_body(settings, name, body):
+        """
+        Compress a body, reusing the result of a previous compression of the same body.
+        :param settings: Compression settings of the app.
+        :param name: The encoding name.
+        :param body: The body bytes.
+        :return: The compressed bytes.
+        """
+        cache = settings['cache']
+        if cache is None:
+            return settings['codecs'][name].compress(body)
+        key = f'{name}:{hashlib.blake2b(body, digest_size=16).hexdigest()}'
+        compressed = cache.get(key)
+        if compressed is ABSENT:
+            compressed = settings['codecs'][name].compress(body)
+            cache.set(key, compressed)
+        return compressed
+
+    @staticmethod
+    def _compress_stream(codec, chunks):
+        """
+        Compress a streamed body chunk by chunk.
+        :param codec: The codec of the encoding.
+        :param chunks: Iterable of body chunks.
+        :return: Generator of compressed chunks.
+        """
+        compressor = codec.compressor()
+        try:
+            for chunk in chunks:
+                if isinstance(chunk, str):
+                    chunk = chunk.encode()
+                data = compressor.compress(chunk) + codec.flush(compressor)
+                if data:
+                    yield data
+            yield codec.finish(compressor)
+        finally:
+            if hasattr(chunks, 'close'):
+                chunks.close()
+
+    def _after_request(self, response):
+        """
+        Compress the response if it is compressible and the client accepts it.
+        :param response: Response object.
+        :return: The response object.
+        """
+        settings = current_app.extensions['compress']
+        if response.mimetype not in settings['mimetypes'] \
+                or not 200 <= response.status_code < 300 or response.status_code == 204:
+            return response
+        response.vary.add('Accept-Encoding')
+        if 'Content-Encoding' in response.headers or response.direct_passthrough \
+                or response.cache_control.no_transform:
+            return response
+        name = self._choose_encoding(settings)
+        if name is None:
+            return response
+        if response.is_streamed:
+            response.response = self._compress_stream(settings['codecs'][name], response.response)
+            response.headers.pop('Content-Length', None)
+        else:
+            body = response.get_data()
+            if len(body) < settings['min_size']:
+                return response
+            response.set_data(self._compress_body(settings, name, body))
+        response.headers['Content-Encoding'] = name
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            # The compressed body is another representation, keep the tag as a weak one
+            response.set_etag(etag, weak=True)
+        return response
+
+
+compress = Compress()
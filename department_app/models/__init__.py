@@ -1,11 +1,15 @@
 # pylint: disable=E1101
 # pylint: disable=R0903
 """
-Module defines department and employee models using class Model from SQLAlchemy
+Module defines department, employee, job and change log models using class Model from SQLAlchemy
 """
-from flask_sqlalchemy import SQLAlchemy
+from datetime import datetime
 
-db = SQLAlchemy()
+from sqlalchemy import DDL, event
+
+from department_app.models.replicas import RoutingSQLAlchemy
+
+db = RoutingSQLAlchemy()
 
 
 class Department(db.Model):
@@ -14,6 +18,8 @@ class Department(db.Model):
     __tablename__ = 'departments'
     id_: int = db.Column(db.Integer, primary_key=True)
     title: str = db.Column(db.String(128), unique=True, nullable=False)
+    # Incremented by every update, updates of a stale version fail (optimistic locking)
+    version: int = db.Column(db.Integer, nullable=False, server_default='1')
     employees = db.relationship(
         'Employee',
         backref=db.backref('department'),
@@ -21,6 +27,8 @@ class Department(db.Model):
         lazy='dynamic'
     )
 
+    __mapper_args__ = {'version_id_col': version}
+
 
 class Employee(db.Model):
     """Employee class defines a database table for employees"""
@@ -35,3 +43,54 @@ class Employee(db.Model):
         db.ForeignKey('departments.id_'),
         nullable=False
     )
+    # Incremented by every update, updates of a stale version fail (optimistic locking)
+    version: int = db.Column(db.Integer, nullable=False, server_default='1')
+
+    __mapper_args__ = {'version_id_col': version}
+
+
+class Job(db.Model):
+    """Job class defines a database table for background jobs and their progress"""
+
+    __tablename__ = 'jobs'
+    id_: int = db.Column(db.Integer, primary_key=True)
+    kind: str = db.Column(db.String(64), nullable=False)
+    params = db.Column(db.JSON, nullable=False, default=dict)
+    # "pending", "running", "done" or "failed"
+    status: str = db.Column(db.String(16), nullable=False, default='pending')
+    rows_done: int = db.Column(db.Integer, nullable=False, default=0)
+    rows_total: int = db.Column(db.Integer)
+    result = db.Column(db.JSON)
+    error: str = db.Column(db.String(512))
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+
+class Change(db.Model):
+    """Change class defines a database table logging changes of departments and employees"""
+
+    __tablename__ = 'changes'
+    # The cursor of the change feed, taken from the change cursor row by the
+    # committing transaction, so it increases in commit order
+    id_: int = db.Column(db.Integer, primary_key=True)
+    # "department" or "employee"
+    entity: str = db.Column(db.String(16), nullable=False)
+    entity_id: int = db.Column(db.Integer, nullable=False)
+    # "insert", "update" or "delete"
+    operation: str = db.Column(db.String(8), nullable=False)
+    changed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+
+class ChangeCursor(db.Model):
+    """ChangeCursor class defines a one row table holding the last cursor of the change feed"""
+
+    __tablename__ = 'change_cursor'
+    id_: int = db.Column(db.Integer, primary_key=True)
+    # Id of the last logged change, the transaction writing the log locks
+    # the row until it commits
+    value: int = db.Column(db.Integer, nullable=False, default=0)
+
+
+event.listen(ChangeCursor.__table__, 'after_create',
+             DDL('INSERT INTO change_cursor (id_, value) VALUES (1, 0)'))
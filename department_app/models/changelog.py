@@ -0,0 +1,60 @@
+"""
+Module writes the change log of departments and employees.
+
+Before a transaction commits, the session is flushed and the operations the
+tracking module recorded for departments and employees (by the unit of work
+and by the bulk statements of the writes module) are inserted into the
+changes table in the same transaction, so the log holds exactly the
+committed changes. A row changed several times by a transaction gets one
+entry with the net operation.
+
+The ids of the entries are taken by incrementing the one row of the
+change_cursor table, which the transaction then holds locked until it
+commits. Transactions writing the log commit one after another, in the order
+of their ids, so a client never reads a change after one committed later
+(with auto-increment ids a transaction could commit after one with greater
+ids, and clients past those would skip its changes).
+
+The log is written for the sessions of apps with "CHANGE_LOG" set, and for
+sessions created with the info {"change_log": True} (the asyncio sessions).
+The entries of sharded employees are written to the primary database, in a
+transaction of their own committed with the shard's.
+"""
+from sqlalchemy import event, insert, select, update
+from sqlalchemy.orm import Session
+
+from department_app.models import Change, ChangeCursor, Department, Employee
+from department_app.models.tracking import pop_operations
+
+# Session info key enabling the change log
+ENABLED_KEY = 'change_log'
+
+# Names of the logged models in the log
+ENTITIES = {Department: 'department', Employee: 'employee'}
+
+
+def _enabled(session):
+    """Check if the change log is written for a session."""
+    if session.info.get(ENABLED_KEY):
+        return True
+    app = getattr(session, 'app', None)
+    return app is not None and app.config.get('CHANGE_LOG', False)
+
+
+@event.listens_for(Session, 'before_commit')
+def _write_log(session):
+    """Insert the changes of the committing transaction into the log."""
+    if not _enabled(session):
+        return
+    session.flush()
+    entries = [
+        {'entity': ENTITIES[model], 'entity_id': primary_key, 'operation': operation}
+        for (model, primary_key), operation in pop_operations(session).items()
+        if model in ENTITIES
+    ]
+    if entries:
+        session.execute(update(ChangeCursor).values(value=ChangeCursor.value + len(entries)))
+        last = session.execute(select(ChangeCursor.value)).scalar()
+        for id_, entry in enumerate(entries, last - len(entries) + 1):
+            entry['id_'] = id_
+        session.execute(insert(Change), entries)
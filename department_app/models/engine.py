@@ -0,0 +1,265 @@
+"""
+Module configures the database engine of an application.
+
+SQLite connections get the pragmas of the profile selected with the
+"SQLITE_PROFILE" configuration option when they are opened. The "concurrent"
+profile puts the database in WAL mode, so readers are not blocked by a writer,
+and waits "busy_timeout" milliseconds for locks instead of failing with
+"database is locked".
+
+Databases other than in-memory SQLite use a TimedQueuePool sized with the
+"DB_POOL_*" configuration options, which records how long checkouts wait for
+a connection. The engine is safe to create before a pre-forking server forks
+its workers: a forked worker replaces the pool of the parent with an empty
+one without closing the parent's connections, and connections opened by
+another process are never checked out. With "DB_POOL_WARMUP" every worker
+opens that many connections on its first request.
+
+Functions:
+    sqlite_pragmas_listener(pragmas)
+    pool_options(config)
+    warm_up(engine, connections)
+    get_pool_stats()
+"""
+import os
+import threading
+import time
+import weakref
+
+from flask import current_app
+from sqlalchemy import event, exc
+from sqlalchemy.engine.url import make_url
+from sqlalchemy.pool import QueuePool
+
+from department_app.models import db
+
+# Profile name => pragmas applied to every new SQLite connection, in order
+SQLITE_PROFILES = {
+    'default': {},
+    'concurrent': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': 5000,
+        'foreign_keys': 'ON',
+        'temp_store': 'MEMORY',
+        # 256 MB of the file mapped in memory, 64 MB page cache (negative => KiB)
+        'mmap_size': 268435456,
+        'cache_size': -65536,
+    },
+}
+
+
+def sqlite_pragmas_listener(pragmas):
+    """
+    Make a "connect" event listener applying pragmas to SQLite connections.
+    :param pragmas: A dict {pragma name: value}.
+    :return: The listener function.
+    """
+    statements = [f'PRAGMA {name}={value}' for name, value in pragmas.items()]
+
+    def apply_pragmas(dbapi_connection, connection_record):  # pylint: disable=W0613
+        cursor = dbapi_connection.cursor()
+        try:
+            for statement in statements:
+                cursor.execute(statement)
+        finally:
+            cursor.close()
+    return apply_pragmas
+
+
+class TimedQueuePool(QueuePool):
+    """
+    QueuePool recording the time checkouts wait for a connection, including the
+    time to open a new one when the pool is not full.
+    """
+    # Upper bounds of the wait time histogram buckets in seconds
+    BUCKETS = (0.001, 0.01, 0.1, 1)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.waits = {'count': 0, 'total': 0.0, 'max': 0.0,
+                      'buckets': [0] * (len(self.BUCKETS) + 1)}
+
+    def _do_get(self):
+        if getattr(self._local, 'timing', False):
+            return super()._do_get()
+        self._local.timing = True
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            self._local.timing = False
+            self._record_wait(time.perf_counter() - start)
+
+    def _record_wait(self, wait):
+        """Add a checkout wait time to the statistics."""
+        bucket = next((index for index, bound in enumerate(self.BUCKETS) if wait < bound),
+                      len(self.BUCKETS))
+        with self._lock:
+            self.waits['count'] += 1
+            self.waits['total'] += wait
+            self.waits['max'] = max(self.waits['max'], wait)
+            self.waits['buckets'][bucket] += 1
+
+    def stats(self):
+        """
+        Get the pool state and checkout wait statistics.
+        :return: A dict.
+        """
+        with self._lock:
+            waits = dict(self.waits, buckets=list(self.waits['buckets']))
+        count = waits['count']
+        return {
+            'size': self.size(),
+            'checked_in': self.checkedin(),
+            'checked_out': self.checkedout(),
+            'overflow': self.overflow(),
+            'wait': {
+                'count': count,
+                'mean_ms': round(waits['total'] / count * 1000, 3) if count else None,
+                'max_ms': round(waits['max'] * 1000, 3),
+                'buckets': [
+                    {'max_ms': bound * 1000 if bound is not None else None, 'count': number}
+                    for bound, number in zip((*self.BUCKETS, None), waits['buckets'])
+                ],
+            },
+        }
+
+
+def pool_options(config):
+    """
+    Build the pool options of the engine from the "DB_POOL_*" configuration options.
+    :param config: The app config.
+    :return: A dict of create_engine options, empty for in-memory SQLite databases,
+    which keep one static connection.
+    """
+    url = make_url(config['SQLALCHEMY_DATABASE_URI'])
+    options = {}
+    if url.get_backend_name() == 'sqlite':
+        if url.database in (None, '', ':memory:'):
+            return options
+        # Pooled connections are used by the threads of the server in turn
+        options['connect_args'] = {'check_same_thread': False}
+    return {
+        **options,
+        'poolclass': TimedQueuePool,
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_POOL_MAX_OVERFLOW'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+        'pool_pre_ping': config['DB_POOL_PRE_PING'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+    }
+
+
+def warm_up(engine, connections):
+    """
+    Open connections up front so the first requests don't wait for them.
+    :param engine: The engine.
+    :param connections: Number of connections to open.
+    :return: None
+    """
+    opened = []
+    try:
+        for _ in range(connections):
+            opened.append(engine.connect())
+    finally:
+        for connection in opened:
+            connection.close()
+
+
+def _guard_process(engine):
+    """
+    Make the connections of an engine usable only by the process which opened them.
+    :param engine: The engine.
+    :return: None
+    """
+    @event.listens_for(engine, 'connect')
+    def remember_pid(dbapi_connection, connection_record):  # pylint: disable=W0613
+        connection_record.info['pid'] = os.getpid()
+
+    @event.listens_for(engine, 'checkout')
+    def check_pid(dbapi_connection, connection_record, connection_proxy):  # pylint: disable=W0613
+        if connection_record.info.get('pid') != os.getpid():
+            # Forget the connection of the parent process without closing it
+            connection_record.dbapi_connection = connection_proxy.dbapi_connection = None
+            raise exc.DisconnectionError(
+                f'Connection opened by process {connection_record.info.get("pid")} '
+                f'used by process {os.getpid()}'
+            )
+
+
+# Engines created in this process, their pools are replaced in forked children
+_engines = weakref.WeakSet()
+# Pools of the parent process, kept alive so their connections are not closed
+# by the garbage collector of a forked child
+_parent_pools = []
+
+
+def _after_fork():
+    """Give every engine a new empty pool in a forked child process."""
+    for engine in list(_engines):
+        _parent_pools.append(engine.pool)
+        engine.pool = engine.pool.recreate()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork)
+
+
+class EngineProfile:
+    """
+    Flask extension configuring the database engine of an application.
+    """
+
+    def init_app(self, app):
+        """
+        Set the pool options, create the engines of the app and its binds and
+        register the pragmas of "SQLITE_PROFILE" on the SQLite ones.
+        :param app: Flask application instance.
+        :return: None
+        :raise ValueError: if "SQLITE_PROFILE" is unknown.
+        """
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+            **pool_options(app.config), **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})
+        }
+        profile = app.config.get('SQLITE_PROFILE', 'default')
+        if profile not in SQLITE_PROFILES:
+            raise ValueError(f'Unknown SQLITE_PROFILE: {profile}')
+        for bind in (None, *(app.config.get('SQLALCHEMY_BINDS') or ())):
+            engine = db.get_engine(app, bind=bind)
+            _guard_process(engine)
+            _engines.add(engine)
+            if engine.dialect.name == 'sqlite' and SQLITE_PROFILES[profile]:
+                event.listen(engine, 'connect', sqlite_pragmas_listener(SQLITE_PROFILES[profile]))
+        if app.config.get('DB_POOL_WARMUP'):
+            app.extensions['engine_warmup'] = {'pid': None, 'lock': threading.Lock()}
+            app.before_request(_warm_up_once)
+
+
+def _warm_up_once():
+    """Warm the pool up on the first request of the current process."""
+    state = current_app.extensions['engine_warmup']
+    if state['pid'] == os.getpid():
+        return
+    with state['lock']:
+        if state['pid'] != os.getpid():
+            warm_up(db.engine, current_app.config['DB_POOL_WARMUP'])
+            state['pid'] = os.getpid()
+
+
+def get_pool_stats():
+    """
+    Get the connection pool statistics of the current app.
+    :return: A dict with the pool class and, for a TimedQueuePool, its state and
+    checkout wait statistics.
+    """
+    pool = db.engine.pool
+    stats = {'pool': type(pool).__name__}
+    if isinstance(pool, TimedQueuePool):
+        stats.update(pool.stats())
+    return stats
+
+
+engine_profile = EngineProfile()
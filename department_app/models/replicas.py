@@ -0,0 +1,276 @@
+"""
+Module routes the reads of read-only service methods to replica databases.
+
+Replicas are listed with the "DB_REPLICA_URIS" configuration option and added
+to the app as the binds "replica0", "replica1"... Queries run inside a
+method decorated with read_only() use a replica, picked round robin, unless:
+    - the request is not a GET/HEAD request, or has the "X-Read-Your-Writes"
+      header, so it must see the latest data;
+    - the session flushed changes or ran an UPDATE/DELETE statement during the
+      current request (sticky primary after a write), or has pending changes;
+    - the model is bound to another database.
+Everything else, including all writes, uses the primary database.
+
+The session also sends the statements on the employees table to their shard
+when employees are sharded (see department_app.models.sharding); shards have
+no replicas.
+
+For local testing with SQLite files, "DB_REPLICA_COPY_INTERVAL" starts a
+thread copying the primary file into every replica file periodically, so the
+replicas lag behind the primary like asynchronous replicas do.
+
+Functions:
+    read_only(function)
+    primary()
+    get_replica_stats()
+"""
+import contextvars
+import itertools
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from flask import current_app, has_request_context, request
+from flask_sqlalchemy import SignallingSession, SQLAlchemy, get_state
+from sqlalchemy import event, orm
+from sqlalchemy.engine.url import make_url
+
+REPLICA_BIND_PREFIX = 'replica'
+READ_YOUR_WRITES_HEADER = 'X-Read-Your-Writes'
+# Key of the session info set once the session flushed changes
+_WROTE_KEY = 'replicas_wrote'
+
+# "replica" while a read-only service method runs, "primary" inside primary()
+_route = contextvars.ContextVar('route', default=None)
+
+
+def read_only(function):
+    """
+    Decorate a service method whose queries may be sent to a replica.
+    :param function: The method.
+    :return: The decorated method.
+    """
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        if _route.get() is not None:
+            return function(*args, **kwargs)
+        token = _route.set('replica')
+        try:
+            return function(*args, **kwargs)
+        finally:
+            _route.reset(token)
+    return wrapper
+
+
+@contextmanager
+def primary():
+    """
+    Context manager sending the queries run inside it to the primary database,
+    even from read-only methods.
+    """
+    token = _route.set('primary')
+    try:
+        yield
+    finally:
+        _route.reset(token)
+
+
+class RoutingSession(SignallingSession):
+    """
+    Session sending the queries of read-only methods to a replica of the app,
+    and the statements on the sharded table to their shard.
+    """
+
+    def __init__(self, db, **options):
+        super().__init__(db, **options)
+        if 'employee_shards' in self.app.extensions:
+            # Flushes ask for the connection of every instance
+            self.connection_callable = self._instance_connection
+
+    def _instance_connection(self, mapper=None, instance=None):
+        """Get the connection of the transaction to the database of a flushed instance."""
+        return self.get_transaction().connection(mapper, instance=instance)
+
+    def _reads_from_replica(self):
+        """
+        Check if a read may be sent to a replica.
+        :return: bool
+        """
+        if _route.get() != 'replica' or self._flushing or self.info.get(_WROTE_KEY):
+            return False
+        if self.new or self.dirty or self.deleted:
+            return False
+        if has_request_context():
+            return (request.method in ('GET', 'HEAD')
+                    and not request.headers.get(READ_YOUR_WRITES_HEADER))
+        return True
+
+    def get_bind(self, mapper=None, clause=None, instance=None, shard=None):
+        """
+        Return the engine of the shard for the sharded table, the engine of a
+        replica for reads allowed to use one, the engine of the model bind otherwise.
+        """
+        router = self.app.extensions.get('employee_shards')
+        if router is not None and mapper is not None and mapper.persist_selectable is router.table:
+            return router.engine(shard if shard is not None else router.choose(self, instance, clause))
+        state = self.app.extensions.get('read_replicas')
+        if state is None or (mapper is None and clause is None):
+            return super().get_bind(mapper, clause)
+        if mapper is not None and mapper.persist_selectable.info.get('bind_key') is not None:
+            return super().get_bind(mapper, clause)
+        if not self._reads_from_replica():
+            return super().get_bind(mapper, clause)
+        bind = state['binds'][next(state['counter']) % len(state['binds'])]
+        return get_state(self.app).db.get_engine(self.app, bind=bind)
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+    """
+    SQLAlchemy extension whose sessions route reads to replicas.
+    """
+
+    def create_session(self, options):
+        """Create the session factory making RoutingSession instances."""
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _stick_to_primary(session, flush_context):  # pylint: disable=W0613
+    """Send the next reads of a session which wrote to the primary."""
+    session.info[_WROTE_KEY] = True
+
+
+@event.listens_for(RoutingSession, 'do_orm_execute')
+def _stick_after_statement(orm_execute_state):
+    """Send the next reads of a session which ran an UPDATE or DELETE statement to the primary."""
+    if orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info[_WROTE_KEY] = True
+
+
+def _sqlite_path(uri):
+    """
+    Get the file of a SQLite database URI.
+    :param uri: Database URI (str).
+    :return: The path, None for other databases and in-memory SQLite.
+    """
+    url = make_url(uri)
+    if url.get_backend_name() != 'sqlite' or url.database in (None, '', ':memory:'):
+        return None
+    return url.database
+
+
+class ReplicaCopier:
+    """
+    Thread copying a SQLite primary into SQLite replicas with the backup API.
+    """
+
+    def __init__(self, source, targets, interval):
+        self.source = source
+        self.targets = targets
+        self.interval = interval
+        self.copies = 0
+        self.last_copy = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def copy(self):
+        """
+        Copy the primary into every replica once.
+        :return: None
+        """
+        source = sqlite3.connect(self.source)
+        try:
+            for target_path in self.targets:
+                target = sqlite3.connect(target_path)
+                try:
+                    source.backup(target)
+                finally:
+                    target.close()
+        finally:
+            source.close()
+        self.copies += 1
+        self.last_copy = time.time()
+
+    def _run(self):
+        """Copy every interval seconds until stopped."""
+        while not self._stop.wait(self.interval):
+            try:
+                self.copy()
+            except sqlite3.Error:
+                # The primary is busy, the replicas stay behind until the next copy
+                continue
+
+    def start(self):
+        """
+        Start the copying thread.
+        :return: None
+        """
+        self._thread = threading.Thread(target=self._run, name='replica-copier', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stop the copying thread.
+        :return: None
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+
+class ReadReplicas:
+    """
+    Flask extension adding the replica binds of an application.
+    """
+
+    def init_app(self, app):
+        """
+        Add a bind for every URI of "DB_REPLICA_URIS" and start the copier if
+        "DB_REPLICA_COPY_INTERVAL" is set. Must run before the engines are created.
+        :param app: Flask application instance.
+        :return: None
+        :raise ValueError: if the copier is enabled for databases which are not SQLite files.
+        """
+        uris = app.config.get('DB_REPLICA_URIS') or ()
+        if not uris:
+            return
+        binds = {f'{REPLICA_BIND_PREFIX}{index}': uri for index, uri in enumerate(uris)}
+        app.config['SQLALCHEMY_BINDS'] = {**(app.config.get('SQLALCHEMY_BINDS') or {}), **binds}
+        state = app.extensions['read_replicas'] = {
+            'binds': list(binds), 'counter': itertools.count(), 'copier': None
+        }
+        app.before_request(_forget_writes)
+        interval = app.config.get('DB_REPLICA_COPY_INTERVAL')
+        if interval:
+            paths = [_sqlite_path(uri) for uri in (app.config['SQLALCHEMY_DATABASE_URI'], *uris)]
+            if None in paths:
+                raise ValueError('DB_REPLICA_COPY_INTERVAL requires SQLite file databases')
+            state['copier'] = ReplicaCopier(paths[0], paths[1:], interval)
+            state['copier'].start()
+
+
+def _forget_writes():
+    """Let the reads of a new request use the replicas again."""
+    get_state(current_app).db.session.info.pop(_WROTE_KEY, None)
+
+
+def get_replica_stats():
+    """
+    Get the replicas of the current app.
+    :return: A dict with the replica binds and, if the copier runs, the number of
+    copies and the seconds since the last one.
+    """
+    state = current_app.extensions.get('read_replicas')
+    if state is None:
+        return {'replicas': []}
+    stats = {'replicas': state['binds']}
+    copier = state['copier']
+    if copier is not None:
+        stats['copies'] = copier.copies
+        stats['lag'] = None if copier.last_copy is None else round(time.time() - copier.last_copy, 3)
+    return stats
+
+
+read_replicas = ReadReplicas()
@@ -0,0 +1,429 @@
+"""
+Module partitions the employees table by department across several databases.
+
+Shards are listed with the "EMPLOYEE_SHARD_URIS" configuration option and
+added to the app as the binds "shard0", "shard1"... An employee is stored in
+the shard number department_id % number of shards, departments stay in the
+primary database. The session of the app picks the shard of a statement on
+the employees table from:
+    - the employee being flushed (its department before any change);
+    - the shard selected by scatter(), which runs a function on every shard;
+    - a "department_id = ?" criterion of the statement;
+    - an "id_ = ?" criterion (e.g. the refresh of an expired employee), looked
+      up among the rows the session flushed, then in every shard.
+Statements matching none of them, i.e. queries across departments, must go
+through scatter() or gather().
+
+Shard tables have no foreign key to the departments table, which lives in
+another database, and ids of new employees are allocated in blocks of
+"EMPLOYEE_SHARD_ID_BLOCK" from a sequence table of the primary, so they are
+unique across shards. Tables are created in the shards on first use.
+
+Functions:
+    get_router()
+    current_shard()
+    scatter(load)
+    gather(load, key, limit)
+    stream(load, key)
+    find(load)
+"""
+import contextvars
+import heapq
+import itertools
+import os
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app, has_app_context
+from flask_sqlalchemy import get_state
+from sqlalchemy import Column, Index, Integer, MetaData, String, Table, event, inspect, select
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import operators, visitors
+from sqlalchemy.sql.elements import BinaryExpression, BindParameter
+
+SHARD_BIND_PREFIX = 'shard'
+
+# Shard selected for the statements of the current thread by scatter()
+_shard = contextvars.ContextVar('shard', default=None)
+
+_sequences = Table(
+    'shard_sequences', MetaData(),
+    Column('name', String(64), primary_key=True),
+    Column('value', Integer, nullable=False),
+)
+
+
+# Key of the session info mapping ids of rows flushed or located by the session to shards
+_KNOWN_KEY = 'shard_of_id'
+
+
+class ShardNotSelected(RuntimeError):
+    """Raised for statements on a sharded table which don't tell their shard."""
+
+
+def _copy_without_foreign_keys(table):
+    """
+    Copy a table for a shard, without its foreign keys.
+    :param table: The Table of the model.
+    :return: A Table of a new MetaData.
+    """
+    columns = [
+        Column(column.name, column.type, primary_key=column.primary_key,
+               nullable=column.nullable, autoincrement=False)
+        for column in table.columns
+    ]
+    copy = Table(table.name, MetaData(), *columns)
+    for index in table.indexes:
+        Index(index.name, *(copy.c[column.name] for column in index.columns), unique=index.unique)
+    return copy
+
+
+def _criterion_value(clause, column, parameters=None):
+    """
+    Find the value of a "column = value" criterion in a statement.
+    :param clause: The statement.
+    :param column: The column.
+    :param parameters: A dict of parameters the statement is executed with.
+    :return: The value, None if there is no such criterion.
+    """
+    if clause is None:
+        return None
+    for element in visitors.iterate(clause):
+        if not isinstance(element, BinaryExpression) or element.operator is not operators.eq:
+            continue
+        for side, other in ((element.left, element.right), (element.right, element.left)):
+            if isinstance(other, BindParameter) and column.shares_lineage(side):
+                if parameters and other.key in parameters:
+                    return parameters[other.key]
+                return other.effective_value
+    return None
+
+
+class ShardRouter:
+    """
+    Routes the statements on the sharded table of an app and runs functions
+    on every shard in parallel.
+    """
+
+    def __init__(self, app, binds, table, id_block):
+        self.app = app
+        self.binds = binds
+        self.table = table
+        self.id_block = id_block
+        self._shard_table = _copy_without_foreign_keys(table)
+        self._lock = threading.Lock()
+        self._ready = False
+        self._next_id = self._id_limit = 0
+        self._executor = None
+
+    def shard_of(self, department_id):
+        """
+        Get the shard of a department.
+        :param department_id: Id of the department (int).
+        :return: Index of the shard.
+        """
+        return int(department_id) % len(self.binds)
+
+    def engine(self, index):
+        """
+        Get the engine of a shard, creating the shard tables on first use.
+        :param index: Index of the shard.
+        :return: The engine.
+        """
+        if not self._ready:
+            self.create_tables()
+        return get_state(self.app).db.get_engine(self.app, bind=self.binds[index])
+
+    def create_tables(self):
+        """
+        Create the missing shard tables and the id sequence of the primary.
+        :return: None
+        """
+        with self._lock:
+            if self._ready:
+                return
+            db = get_state(self.app).db
+            for bind in self.binds:
+                self._shard_table.metadata.create_all(db.get_engine(self.app, bind=bind))
+            primary = db.get_engine(self.app)
+            _sequences.metadata.create_all(primary)
+            with primary.begin() as connection:
+                name = self.table.name
+                if connection.execute(
+                        select(_sequences.c.value).where(_sequences.c.name == name)
+                ).first() is None:
+                    connection.execute(_sequences.insert().values(name=name, value=0))
+            self._ready = True
+
+    def choose(self, session, instance=None, clause=None, parameters=None):
+        """
+        Choose the shard of a statement on the sharded table.
+        :param session: The session executing the statement.
+        :param instance: The instance being flushed, if any.
+        :param clause: The statement, if any.
+        :param parameters: A dict of parameters the statement is executed with.
+        :return: Index of the shard.
+        :raise ShardNotSelected: if the shard can't be chosen.
+        """
+        if instance is not None:
+            history = inspect(instance).attrs.department_id.history
+            return self.shard_of(history.deleted[0] if history.deleted else instance.department_id)
+        if _shard.get() is not None:
+            return _shard.get()
+        department_id = _criterion_value(clause, self.table.c.department_id, parameters)
+        if department_id is not None:
+            return self.shard_of(department_id)
+        primary_key = _criterion_value(clause, self.table.c.id_, parameters)
+        if primary_key is not None:
+            known = session.info.setdefault(_KNOWN_KEY, {})
+            if primary_key not in known:
+                known[primary_key] = self.locate(primary_key)
+            return known[primary_key]
+        raise ShardNotSelected(
+            f'Query on "{self.table.name}" across departments, use scatter() or gather()'
+        )
+
+    def locate(self, primary_key):
+        """
+        Find the shard holding a row, querying the shards one after the other.
+        :param primary_key: Id of the row.
+        :return: Index of the shard, 0 if no shard has the row.
+        """
+        statement = select(self._shard_table.c.id_).where(self._shard_table.c.id_ == primary_key)
+        for index in range(len(self.binds)):
+            with self.engine(index).connect() as connection:
+                if connection.execute(statement).first() is not None:
+                    return index
+        return 0
+
+    def next_id(self):
+        """
+        Allocate the id of a new row.
+        :return: int
+        """
+        if not self._ready:
+            self.create_tables()
+        with self._lock:
+            if self._next_id >= self._id_limit:
+                self._allocate_ids()
+            value = self._next_id
+            self._next_id += 1
+            return value
+
+    def _allocate_ids(self):
+        """Take the next block of ids from the sequence of the primary."""
+        primary = get_state(self.app).db.get_engine(self.app)
+        condition = _sequences.c.name == self.table.name
+        with primary.begin() as connection:
+            connection.execute(
+                _sequences.update().where(condition).values(value=_sequences.c.value + self.id_block)
+            )
+            limit = connection.execute(select(_sequences.c.value).where(condition)).scalar()
+        self._next_id, self._id_limit = limit - self.id_block + 1, limit + 1
+
+    def _run_on_shard(self, index, load):
+        """Run a function in an app context of its own, with a shard selected."""
+        with self.app.app_context():
+            token = _shard.set(index)
+            try:
+                return load()
+            finally:
+                _shard.reset(token)
+
+    def scatter(self, load):
+        """
+        Run a function on every shard in parallel.
+        :param load: Callable without arguments. It runs in another thread with its
+        own session, so it must build its queries itself.
+        :return: A list of the results, one per shard.
+        """
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(len(self.binds), 'shard')
+        if not self._ready:
+            self.create_tables()
+        futures = [self._executor.submit(self._run_on_shard, index, load)
+                   for index in range(len(self.binds))]
+        return [future.result() for future in futures]
+
+    def reset(self):
+        """Forget the ids and threads of the parent in a forked child process."""
+        self._lock = threading.Lock()
+        self._next_id = self._id_limit = 0
+        self._executor = None
+
+
+class EmployeeShards:
+    """
+    Flask extension adding the shard binds of an application.
+    """
+
+    def init_app(self, app):
+        """
+        Add a bind for every URI of "EMPLOYEE_SHARD_URIS". Must run before the
+        engines are created.
+        :param app: Flask application instance.
+        :return: None
+        """
+        uris = app.config.get('EMPLOYEE_SHARD_URIS') or ()
+        if not uris:
+            return
+        from department_app.models import Employee  # pylint: disable=C0415
+        binds = {f'{SHARD_BIND_PREFIX}{index}': uri for index, uri in enumerate(uris)}
+        app.config['SQLALCHEMY_BINDS'] = {**(app.config.get('SQLALCHEMY_BINDS') or {}), **binds}
+        router = app.extensions['employee_shards'] = ShardRouter(
+            app, list(binds), Employee.__table__, app.config.get('EMPLOYEE_SHARD_ID_BLOCK', 100)
+        )
+        _routers.add(router)
+
+
+def get_router():
+    """
+    Get the shard router of the current app.
+    :return: A ShardRouter, None if employees are not sharded.
+    """
+    if not has_app_context():
+        return None
+    return current_app.extensions.get('employee_shards')
+
+
+def current_shard():
+    """
+    Get the shard selected for the current thread, e.g. by scatter().
+    :return: Index of the shard, None if no shard is selected.
+    """
+    return _shard.get()
+
+
+def _adopt(items):
+    """Merge instances loaded by the sessions of other threads into the current session."""
+    session = get_state(current_app).db.session
+    return [session.merge(item, load=False) if hasattr(item, '_sa_instance_state') else item
+            for item in items]
+
+
+def scatter(load):
+    """
+    Run a function on every shard, or once if employees are not sharded.
+    :param load: Callable without arguments building and running its queries.
+    :return: A list of the results, one per shard.
+    """
+    router = get_router()
+    if router is None:
+        return [load()]
+    return router.scatter(load)
+
+
+def gather(load, key=None, limit=None):
+    """
+    Load rows from every shard and combine them into one list.
+    :param load: Callable without arguments returning a list of rows or instances.
+    :param key: Callable giving the sort key of a row, the lists returned by load
+    must be sorted by it. The lists are merge-sorted if given, concatenated otherwise.
+    :param limit: Maximal number of rows to return, None for all.
+    :return: A list of rows, instances belong to the current session.
+    """
+    router = get_router()
+    if router is None:
+        return load()
+    results = router.scatter(load)
+    rows = heapq.merge(*results, key=key) if key is not None else itertools.chain(*results)
+    return _adopt(itertools.islice(rows, limit))
+
+
+def stream(load, key=None):
+    """
+    Run a query returning a streamed result on every shard, in the current thread,
+    and iterate over the rows of all shards without loading them all.
+    :param load: Callable without arguments executing a query and returning its result.
+    :param key: Callable giving the sort key of a row, the results must be sorted by it.
+    The results are merged lazily if given, chained otherwise.
+    :return: An iterator of rows.
+    """
+    router = get_router()
+    if router is None:
+        return iter(load())
+    results = []
+    for index in range(len(router.binds)):
+        token = _shard.set(index)
+        try:
+            results.append(load())
+        finally:
+            _shard.reset(token)
+    return heapq.merge(*results, key=key) if key is not None else itertools.chain(*results)
+
+
+def find(load):
+    """
+    Load a row which is in one shard at most.
+    :param load: Callable without arguments returning a row or None.
+    :return: The row, None if no shard has it.
+    """
+    router = get_router()
+    if router is None:
+        return load()
+    found = [row for row in router.scatter(load) if row is not None]
+    return _adopt(found)[0] if found else None
+
+
+@event.listens_for(Session, 'before_flush')
+def _assign_ids(session, flush_context, instances):  # pylint: disable=W0613
+    """Give new instances of the sharded table an id from the sequence before they're flushed."""
+    router = getattr(session, 'app', None) and session.app.extensions.get('employee_shards')
+    if router is None:
+        return
+    for instance in session.new:
+        if inspect(instance).mapper.persist_selectable is router.table and instance.id_ is None:
+            instance.id_ = router.next_id()
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _route_statement(orm_execute_state):
+    """
+    Choose the shard of an ORM statement on the sharded table while its
+    parameters are known, e.g. the id of an expired instance being refreshed.
+    """
+    session = orm_execute_state.session
+    router = getattr(session, 'app', None) and session.app.extensions.get('employee_shards')
+    mapper = orm_execute_state.bind_arguments.get('mapper')
+    if router is None or mapper is None or mapper.persist_selectable is not router.table:
+        return
+    parameters = orm_execute_state.parameters
+    orm_execute_state.bind_arguments['shard'] = router.choose(
+        session, clause=orm_execute_state.statement,
+        parameters=parameters if isinstance(parameters, dict) else None
+    )
+
+
+@event.listens_for(Session, 'after_flush')
+def _remember_shards(session, flush_context):  # pylint: disable=W0613
+    """Remember the shards of the rows of the sharded table written by a flush."""
+    router = getattr(session, 'app', None) and session.app.extensions.get('employee_shards')
+    if router is None:
+        return
+    known = session.info.setdefault(_KNOWN_KEY, {})
+    for instance in (*session.new, *session.dirty):
+        if inspect(instance).mapper.persist_selectable is router.table:
+            known[instance.id_] = router.shard_of(instance.department_id)
+    for instance in session.deleted:
+        if inspect(instance).mapper.persist_selectable is router.table:
+            known.pop(instance.id_, None)
+
+
+# Routers of this process, reset in forked children
+_routers = weakref.WeakSet()
+
+
+def _after_fork():
+    """Reset the routers in a forked child process."""
+    for router in list(_routers):
+        router.reset()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork)
+
+
+employee_shards = EmployeeShards()
@@ -0,0 +1,105 @@
+"""
+Module tracks primary keys of rows changed by ORM transactions and notifies
+subscribers once the transaction is committed.
+
+The operation (insert, update or delete) of every changed row is recorded as
+well, several operations on a row in a transaction merged into one, for the
+change log to take with pop_operations() before the transaction commits.
+
+Functions:
+    subscribe(callback)
+    mark_changed(session, model, primary_key, operation)
+    pop_operations(session)
+"""
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+_PENDING_KEY = 'tracking_changes'
+_OPERATIONS_KEY = 'tracking_operations'
+_subscribers = []
+
+
+def subscribe(callback):
+    """
+    Register a callback to be called after every commit that changed rows.
+    :param callback: Callable accepting a dict {model class: set of primary keys}.
+    :return: the callback, so the function can be used as a decorator.
+    """
+    if callback not in _subscribers:
+        _subscribers.append(callback)
+    return callback
+
+
+def _merge(previous, operation):
+    """
+    Merge an operation on a row with the previous one of the transaction.
+    :return: The net operation, None if the row was inserted and deleted again.
+    """
+    if previous == 'insert':
+        return None if operation == 'delete' else 'insert'
+    if previous is not None and operation == 'insert':
+        return 'update'
+    return operation
+
+
+def mark_changed(session, model, primary_key, operation='update'):
+    """
+    Record a changed row for statements which bypass the unit of work
+    (bulk UPDATE/DELETE, core INSERT). Subscribers are notified on commit.
+    :param session: The session executing the statement.
+    :param model: The model class of the changed row.
+    :param primary_key: Primary key of the changed row.
+    :param operation: "insert", "update" or "delete", None to notify subscribers only.
+    :return: None
+    """
+    session.info.setdefault(_PENDING_KEY, {}).setdefault(model, set()).add(primary_key)
+    if operation is None:
+        return
+    operations = session.info.setdefault(_OPERATIONS_KEY, {})
+    key = (model, primary_key)
+    operations[key] = _merge(operations.get(key), operation)
+
+
+def pop_operations(session):
+    """
+    Take the operations recorded in the current transaction of a session.
+    :param session: The session.
+    :return: A dict {(model class, primary key): "insert", "update" or "delete"}
+    in the order the rows were first changed.
+    """
+    operations = session.info.pop(_OPERATIONS_KEY, {})
+    return {key: operation for key, operation in operations.items() if operation is not None}
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_flushed(session, flush_context):  # pylint: disable=W0613
+    """Collect primary keys of new, changed and deleted instances of the flush."""
+    for operation, instances in (('insert', session.new), ('update', session.dirty),
+                                 ('delete', session.deleted)):
+        for instance in instances:
+            primary_key = getattr(instance, 'id_', None)
+            if primary_key is None:
+                continue
+            # Changes of collections only (e.g. the employees of a department) are
+            # not changes of the row
+            modified = operation != 'update' or session.is_modified(
+                instance, include_collections=False
+            )
+            mark_changed(session, type(instance), primary_key, operation if modified else None)
+
+
+@event.listens_for(Session, 'after_commit')
+def _notify_committed(session):
+    """Pass the collected changes of the committed transaction to subscribers."""
+    session.info.pop(_OPERATIONS_KEY, None)
+    changes = session.info.pop(_PENDING_KEY, None)
+    if changes:
+        for callback in _subscribers:
+            callback(changes)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_rolled_back(session):
+    """Forget the changes of a rolled back transaction."""
+    session.info.pop(_PENDING_KEY, None)
+    session.info.pop(_OPERATIONS_KEY, None)
@@ -2,10 +2,20 @@
 """Module defines department and employee REST API."""
 from flask_restful import Api
 
+import department_app.rest.change_rest
+import department_app.rest.coalescing
 import department_app.rest.department_rest
 import department_app.rest.employee_rest
+import department_app.rest.job_rest
+import department_app.rest.representations
+import department_app.rest.stats_rest
+import department_app.rest.system_rest
 
-api = Api(prefix='/api/v1')
+api = Api(prefix='/api/v1', decorators=[coalescing.coalesce])
+api.representation('application/json')(representations.output_json)
+if representations.msgpack is not None:
+    for mediatype in representations.MSGPACK_MEDIATYPES:
+        api.representation(mediatype)(representations.output_msgpack)
 
 """Functions register the routes with the framework using the given endpoints."""
 
@@ -52,6 +62,32 @@ api.add_resource(
     strict_slashes=False
 )
 
+api.add_resource(
+    employee_rest.EmployeeTopApi,
+    '/employees/top',
+    methods=['GET'],
+    strict_slashes=False
+)
+
+# Export resource
+
+api.add_resource(
+    employee_rest.EmployeeExportApi,
+    '/employees/export.csv',
+    '/departments/<dep_id>/employees/export.csv',
+    methods=['GET'],
+    strict_slashes=False
+)
+
+# Import resource
+
+api.add_resource(
+    employee_rest.EmployeeImportApi,
+    '/employees/import',
+    methods=['POST'],
+    strict_slashes=False
+)
+
 # Search resource
 
 api.add_resource(
@@ -61,3 +97,77 @@ api.add_resource(
     methods=['GET'],
     strict_slashes=False
 )
+
+# Statistics resources
+
+api.add_resource(
+    stats_rest.DepartmentStatsApi,
+    '/departments/stats',
+    methods=['GET'],
+    strict_slashes=False
+)
+
+api.add_resource(
+    stats_rest.DepartmentAgeStatsApi,
+    '/departments/age-stats',
+    methods=['GET'],
+    strict_slashes=False
+)
+
+api.add_resource(
+    stats_rest.SalaryStatsApi,
+    '/salary-stats',
+    '/departments/<dep_id>/salary-stats',
+    methods=['GET'],
+    strict_slashes=False
+)
+
+# Change feed resources
+
+api.add_resource(
+    change_rest.ChangesApi,
+    '/changes',
+    methods=['GET'],
+    strict_slashes=False
+)
+
+# Job resources
+
+api.add_resource(
+    job_rest.JobApi,
+    '/jobs',
+    methods=['POST'],
+    endpoint='jobs',
+    strict_slashes=False
+)
+
+api.add_resource(
+    job_rest.JobApi,
+    '/jobs/<job_id>',
+    methods=['GET'],
+    endpoint='job',
+    strict_slashes=False
+)
+
+# System resources
+
+api.add_resource(
+    system_rest.CacheStatsApi,
+    '/system/cache',
+    methods=['GET'],
+    strict_slashes=False
+)
+
+api.add_resource(
+    system_rest.PoolStatsApi,
+    '/system/pool',
+    methods=['GET'],
+    strict_slashes=False
+)
+
+api.add_resource(
+    system_rest.ReplicaStatsApi,
+    '/system/replicas',
+    methods=['GET'],
+    strict_slashes=False
+)
@@ -0,0 +1,41 @@
+"""
+Module contains Flask-Restful Resources for the change feed.
+"""
+from flask import current_app, request
+from flask_restful import Resource
+
+from department_app.rest.schemas import ChangeSchema
+from department_app.service.changes import get_changes
+
+
+class ChangesApi(Resource):
+    """
+    This class defines the ChangesApi Resource, available at the
+    "/api/v1/changes" url
+    """
+    change_schema = ChangeSchema(many=True)
+
+    def get(self):
+        """
+        This method is called when GET request is sent to "/api/v1/changes" url,
+        with the optional "since" (cursor, id of the last change read, 0 by default)
+        and "limit" (at most "CHANGES_MAX_LIMIT", "CHANGES_PAGE_SIZE" by default)
+        query parameters.
+        :return:
+        {"changes": [...], "next": cursor, "more": bool, "resync": bool} in json format,
+        status code 200: the changes after the cursor, oldest first (id_, entity,
+        entity_id, operation of "insert", "update" or "delete", changed_at), the cursor
+        of the next request, whether more changes follow, and whether the client has
+        to fetch the full lists because changes after its cursor were pruned.
+        If invalid "since" or "limit" => error message, status code 400.
+        """
+        try:
+            since = int(request.args.get('since', 0))
+            limit = int(request.args.get('limit', current_app.config['CHANGES_PAGE_SIZE']))
+        except ValueError:
+            return {'message': 'since and limit should be integers'}, 400
+        if since < 0 or limit <= 0 or limit > current_app.config['CHANGES_MAX_LIMIT']:
+            return {'message': 'Invalid since or limit'}, 400
+        feed = get_changes(since, limit)
+        feed['changes'] = self.change_schema.dump(feed['changes'])
+        return feed, 200
@@ -0,0 +1,121 @@
+"""
+Module contains single-flight coalescing of identical concurrent GET requests
+to the REST API.
+
+Only the resources with "coalesce_gets" set are coalesced: the collections
+and statistics hit by dashboards. Polling resources (jobs, change feed,
+system stats) always run, as do requests with the "X-Read-Your-Writes"
+header, which must read the primary database and not get a body another
+request read from a lagging replica.
+
+The first request for a key (path, query string, Accept header and data
+version) computes the response; identical requests arriving while it is in
+flight wait for it and get a copy of its status, headers and body instead
+of running the resource themselves. Followers wait at most
+"COALESCE_TIMEOUT" seconds, then compute their own response, as they do when
+the leader fails or streams its body.
+
+Functions:
+    coalesce(view)
+"""
+import threading
+from functools import wraps
+
+from flask import current_app, request
+
+from department_app.models.replicas import READ_YOUR_WRITES_HEADER
+from department_app.service.cache_backends import get_data_version
+
+
+class _Flight:
+    """A response being computed by a leader request."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.response = None
+
+
+class RequestCoalescing:
+    """
+    Flask extension holding the in-flight GET requests of an application.
+    """
+
+    def init_app(self, app):
+        """
+        Enable coalescing for the app if "COALESCE_GETS" is set.
+        :param app: Flask application instance.
+        :return: None
+        """
+        if not app.config.get('COALESCE_GETS'):
+            return
+        app.extensions['coalescing'] = {
+            'flights': {},
+            'lock': threading.Lock(),
+            'timeout': app.config.get('COALESCE_TIMEOUT', 5),
+            'counters': {'leaders': 0, 'followers': 0, 'timeouts': 0},
+        }
+
+
+def _freeze(response):
+    """
+    Copy what followers need from a response.
+    :param response: Response object.
+    :return: A tuple (body bytes, status code, list of headers), None for streamed responses.
+    """
+    if response.is_streamed:
+        return None
+    return response.get_data(), response.status_code, list(response.headers)
+
+
+def _run_leader(state, key, flight, view, args, kwargs):
+    """
+    Compute the response of a flight and hand a copy of it to the followers.
+    :return: The response.
+    """
+    try:
+        response = view(*args, **kwargs)
+        flight.response = _freeze(response)
+        return response
+    finally:
+        with state['lock']:
+            del state['flights'][key]
+        flight.done.set()
+
+
+def coalesce(view):
+    """
+    Decorate a REST view so identical concurrent GET requests share one response,
+    if its resource has "coalesce_gets" set.
+    :param view: The view function.
+    :return: The decorated view function, the view itself for other resources.
+    """
+    if not getattr(getattr(view, 'view_class', None), 'coalesce_gets', False):
+        return view
+
+    @wraps(view)
+    def coalesced(*args, **kwargs):
+        state = current_app.extensions.get('coalescing')
+        if state is None or request.method != 'GET' or request.headers.get(READ_YOUR_WRITES_HEADER):
+            return view(*args, **kwargs)
+        key = (request.path, request.query_string, request.headers.get('Accept'),
+               get_data_version())
+        with state['lock']:
+            flight = state['flights'].get(key)
+            leader = flight is None
+            if leader:
+                flight = state['flights'][key] = _Flight()
+            state['counters']['leaders' if leader else 'followers'] += 1
+        if leader:
+            return _run_leader(state, key, flight, view, args, kwargs)
+        if not flight.done.wait(state['timeout']):
+            with state['lock']:
+                state['counters']['timeouts'] += 1
+            return view(*args, **kwargs)
+        if flight.response is None:
+            return view(*args, **kwargs)
+        body, status, headers = flight.response
+        return current_app.response_class(body, status=status, headers=headers)
+    return coalesced
+
+
+request_coalescing = RequestCoalescing()
@@ -1,13 +1,19 @@
 """
 Module contains Flask-Restful Resources for Departments.
 """
-from flask import request
 from flask_restful import Resource
 from marshmallow import ValidationError
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.exc import StaleDataError
 
 from department_app.service import DepartmentServices, EmployeeServices
+from department_app.rest import serializers
+from department_app.rest.job_rest import accepted
+from department_app.rest.params import (
+    parse_body, parse_fieldset, parse_ids, parse_if_match, prefers_async, version_headers
+)
 from department_app.rest.schemas import DepartmentSchema, EmployeeSchema
+from department_app.service.jobs import get_job_runner
 
 
 class DepartmentApi(Resource):
@@ -15,6 +21,7 @@ class DepartmentApi(Resource):
     This class defines the DepartmentsAPI Resource, available at the
     "/api/v1/departments/[<int:id>]" url
     """
+    coalesce_gets = True
     dep_schema = DepartmentSchema()
 
     def get(self, dep_id=None):
@@ -22,27 +29,48 @@ class DepartmentApi(Resource):
         This method is called when GET request is sent to "/api/v1/departments/[<int:id>]" url
         :return:
         if "id" not specified => the list of all departments in json format, status code 200.
+        If "ids" query parameter specified (e.g. ?ids=1,5,9) => the found departments in the
+        order of ids and the list of missing ids in json format, status code 200.
+        If invalid "ids" => error message, status code 400.
         If "id" specified =>  the department with the specified "id" serialized to json,
         status code 200.
         If invalid "id" => error message, status code 404.
+        The department is sent with its version as the ETag header.
+        The "fields" and "fields[employees]" query parameters (e.g. ?fields=id_,title)
+        restrict the dumped fields, unknown fields => error message, status code 400.
         """
+        try:
+            schema, fields = parse_fieldset(DepartmentSchema)
+        except ValueError as exception:
+            return {'message': str(exception)}, 400
         if dep_id is None:
-            departments = DepartmentServices.get_all()
-            return self.dep_schema.dump(departments, many=True), 200
-        department = DepartmentServices.get_by_id(dep_id)
+            try:
+                dep_ids = parse_ids()
+            except ValueError:
+                return {'message': 'ids should be a comma separated list of numbers'}, 400
+            if dep_ids is not None:
+                departments, missing = DepartmentServices.get_by_ids(dep_ids, fields)
+                return {
+                    'items': serializers.dump(schema, departments, many=True),
+                    'missing': missing
+                }, 200
+            departments = DepartmentServices.get_all(fields)
+            return serializers.dump(schema, departments, many=True), 200
+        department = DepartmentServices.get_cached(dep_id)
         if department is None:
             return {'message': f'Department with id = {dep_id} was not found'}, 404
-        return self.dep_schema.dump(department), 200
+        return serializers.dump(schema, department), 200, version_headers(department.version)
 
     def post(self):
         """
         This method is called when POST request is sent to "/api/v1/departments" url with json data.
         Creates a new department entry in database.
         :return:
-        if valid data provided => returns the created entry serialized to json, status code 201
+        if valid data provided => returns the created entry serialized to json and its
+        ETag, status code 201
         if invalid data => returns the error message in json format, status code 400.
         """
-        json_data = request.get_json(force=True)
+        json_data = parse_body()
         try:
             data = self.dep_schema.load(json_data)
         except ValidationError as exception:
@@ -51,45 +79,89 @@ class DepartmentApi(Resource):
             new_department = DepartmentServices.create(data)
         except IntegrityError:
             return {'message': 'Department names should be unique'}, 400
-        return self.dep_schema.dump(new_department), 201
+        return self.dep_schema.dump(new_department), 201, version_headers(new_department.version)
 
     def put(self, dep_id):
         """
-        This method is called when GET request is sent to "/api/v1/departments/id" url
-        with json data. Changes name of specified department in database.
+        This method is called when PUT request is sent to "/api/v1/departments/id" url
+        with json data. Changes name of specified department in database with one
+        UPDATE statement. With the "If-Match" header (the ETag of the department), the
+        department is only changed if it was not changed since.
         :return:
-        if valid data provided => returns the changed entry serialized to json, status code 200
+        if valid data provided => returns the changed entry serialized to json and its
+        new ETag, status code 200
         if invalid data => returns the error message in json format, status code 400.
         If invalid "id" => error message, status code 404.
+        If the department was changed since the "If-Match" ETag => the current entry
+        serialized to json and its ETag, status code 409.
         """
-        json_data = request.get_json(force=True)
-        department = DepartmentServices.get_by_id(dep_id)
-        if department is None:
-            return {'message': f'Department with id = {dep_id} was not found'}, 404
+        json_data = parse_body()
+        try:
+            version = parse_if_match()
+        except ValueError:
+            return {'message': 'If-Match should be the ETag of the department'}, 400
         try:
             data = self.dep_schema.load(json_data)
         except ValidationError as exception:
             return exception.messages, 400
         try:
-            updated_department = DepartmentServices.update(department, data)
+            updated_department = DepartmentServices.update_by_id(dep_id, data, version)
         except IntegrityError:
             return {'message': 'Department names should be unique'}, 400
-        return self.dep_schema.dump(updated_department), 200
+        except StaleDataError:
+            return self._conflict(dep_id)
+        if updated_department is None:
+            return {'message': f'Department with id = {dep_id} was not found'}, 404
+        return self.dep_schema.dump(updated_department), 200, \
+            version_headers(updated_department.version)
 
-    @staticmethod
-    def delete(dep_id):
+    def delete(self, dep_id):
         """
         This method is called when DELETE request is sent to url "/api/v1/departments/id"
-        deletes the department entry with specified id from database.
+        deletes the department entry with specified id and its employees from database
+        with one DELETE statement per table. With the "If-Match" header (the ETag of the
+        department), the department is only deleted if it was not changed since.
+        With the "Prefer: respond-async" header, the department is deleted by a
+        background job, a chunk of employees per transaction.
         :return:
         if valid "id" => returns an empty response body and status code 204 specified.
+        If "Prefer: respond-async" => the job serialized to json and its url in the
+        Location header, status code 202.
         If invalid "id" specified => returns error message and status code 404.
+        If the department was changed since the "If-Match" ETag => the current entry
+        serialized to json and its ETag, status code 409.
+        """
+        try:
+            version = parse_if_match()
+        except ValueError:
+            return {'message': 'If-Match should be the ETag of the department'}, 400
+        if prefers_async():
+            department = DepartmentServices.get_by_id(dep_id)
+            if department is None:
+                return {'message': f'Department with id = {dep_id} was not found'}, 404
+            if version is not None and department.version != version:
+                return self._conflict(dep_id)
+            return accepted(get_job_runner().submit(
+                'delete-department', {'dep_id': department.id_, 'version': version}
+            ))
+        try:
+            deleted = DepartmentServices.delete_by_id(dep_id, version)
+        except StaleDataError:
+            return self._conflict(dep_id)
+        if not deleted:
+            return {'message': f'Department with id = {dep_id} was not found'}, 404
+        return '', 204
+
+    def _conflict(self, dep_id):
+        """
+        Build the response of a write to a stale version of a department.
+        :return: The current department serialized to json and its ETag, status code 409.
+        If the department was deleted since => error message, status code 404.
         """
         department = DepartmentServices.get_by_id(dep_id)
         if department is None:
             return {'message': f'Department with id = {dep_id} was not found'}, 404
-        DepartmentServices.delete(department)
-        return '', 204
+        return self.dep_schema.dump(department), 409, version_headers(department.version)
 
 
 class DepartmentsEmployeesApi(Resource):
@@ -97,6 +169,7 @@ class DepartmentsEmployeesApi(Resource):
     This class defines the DepartmentsEmployeesAPI Resource, available at the
     "/api/v1/departments/[<int:id>]/employees" url
     """
+    coalesce_gets = True
     emp_schema = EmployeeSchema()
 
     def get(self, dep_id):
@@ -106,12 +179,17 @@ class DepartmentsEmployeesApi(Resource):
         If "id" is valid => list of employees from department with specified "id" serialized
         to json, status code 200.
         If invalid "id" => error message, status code 404.
+        The "fields" and "fields[department]" query parameters (e.g. ?fields=id_,full_name)
+        restrict the dumped fields, unknown fields => error message, status code 400.
         """
-        department = DepartmentServices.get_by_id(dep_id)
-        if department is None:
+        try:
+            schema, fields = parse_fieldset(EmployeeSchema)
+        except ValueError as exception:
+            return {'message': str(exception)}, 400
+        if not DepartmentServices.exists(dep_id):
             return {'message': f'Department with id = {dep_id} was not found'}, 404
-        employees = EmployeeServices.get_all_from_department(dep_id)
-        return self.emp_schema.dump(employees, many=True), 200
+        employees = EmployeeServices.get_all_from_department(dep_id, fields)
+        return serializers.dump(schema, employees, many=True), 200
 
     def post(self, dep_id):
         """
@@ -119,18 +197,25 @@ class DepartmentsEmployeesApi(Resource):
         "/api/v1/departments/[<int:id>]/employees" with json data.
         Creates a new employee in specified department in database.
         :return:
-        if valid data provided => returns the created entry serialized to json, status code 201
-        if invalid data => returns the error message in json format, status code 400.
+        if valid data provided => returns the created entry serialized to json and its
+        ETag, status code 201
+        if invalid data, or the department was deleted meanwhile => returns the error
+        message in json format, status code 400.
         if invalid "id" => returns the error message in json format, status code 404.
+        If the group commit timed out => error message, status code 503.
         """
-        json_data = request.get_json(force=True)
-        department = DepartmentServices.get_by_id(dep_id)
-        if department is None:
+        json_data = parse_body()
+        if not DepartmentServices.exists(dep_id):
             return {'message': f'Department with id = {dep_id} was not found'}, 404
         try:
             data = self.emp_schema.load(json_data, partial=["department_id"])
         except ValidationError as exception:
             return exception.messages, 400
         data['department_id'] = dep_id
-        new_employee = EmployeeServices.create(data)
-        return self.emp_schema.dump(new_employee), 201
+        try:
+            new_employee = EmployeeServices.create(data)
+        except IntegrityError:
+            return {'message': 'Not valid department id'}, 400
+        except TimeoutError as exception:
+            return {'message': str(exception)}, 503
+        return self.emp_schema.dump(new_employee), 201, version_headers(new_employee.version)
@@ -1,16 +1,27 @@
 """
-Module contains Flask-Restful Resources for Employees
-and for EmployeesSearch.
+Module contains Flask-Restful Resources for Employees,
+for EmployeesSearch, EmployeesExport and EmployeesImport.
 """
+import io
 from datetime import datetime
 
-from flask import request
+from flask import current_app, request
 from flask_restful import Resource
 from marshmallow import ValidationError
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.exc import StaleDataError
 
+from department_app.rest import serializers
+from department_app.rest.params import (
+    page, parse_body, parse_fieldset, parse_ids, parse_if_match, parse_page, version_headers
+)
+from department_app.rest.representations import output_csv_stream
 from department_app.rest.schemas import EmployeeSchema
 from department_app.service import EmployeeServices, DepartmentServices
+from department_app.service.employee_service import RANKINGS
+from department_app.service.imports import (
+    IMPORT_MEDIATYPES, ImportInterrupted, import_employees, read_records
+)
 
 
 class EmployeeApi(Resource):
@@ -18,6 +29,7 @@ class EmployeeApi(Resource):
     This class defines the EmployeeApi Resource, available at the
     "/api/v1/employees/[<int:id>]" url
     """
+    coalesce_gets = True
     emp_schema = EmployeeSchema()
 
     def get(self, emp_id=None):
@@ -25,27 +37,57 @@ class EmployeeApi(Resource):
         This method is called when GET request is sent to "/api/v1/employees/[<int:id>]" url
         :return:
         if "id" not specified => the list of all employees in json format, status code 200.
+        If "ids" query parameter specified (e.g. ?ids=1,5,9) => the found employees in the
+        order of ids and the list of missing ids in json format, status code 200.
+        If invalid "ids" => error message, status code 400.
         If "id" specified =>  the list of employees from specified department serialized to json,
         status code 200.
         If invalid "id" => error message, status code 404.
+        The employee is sent with its version as the ETag header.
+        The "fields" and "fields[department]" query parameters (e.g. ?fields=id_,full_name)
+        restrict the dumped fields, unknown fields => error message, status code 400.
+        The "limit" and "after" query parameters (e.g. ?limit=100&after=200) return a page
+        of the list ordered by id and the "after" value of the next page
+        ({"items": [...], "next": id or null}), invalid values => error message, status code 400.
         """
+        try:
+            schema, fields = parse_fieldset(EmployeeSchema)
+        except ValueError as exception:
+            return {'message': str(exception)}, 400
+        try:
+            after, limit = parse_page()
+        except ValueError:
+            return {'message': 'limit and after should be positive numbers'}, 400
         if emp_id is None:
-            employees = EmployeeServices.get_all()
-            return self.emp_schema.dump(employees, many=True), 200
-        employee = EmployeeServices.get_by_id(emp_id)
+            try:
+                emp_ids = parse_ids()
+            except ValueError:
+                return {'message': 'ids should be a comma separated list of numbers'}, 400
+            if emp_ids is not None:
+                employees, missing = EmployeeServices.get_by_ids(emp_ids, fields)
+                return {
+                    'items': serializers.dump(schema, employees, many=True),
+                    'missing': missing
+                }, 200
+            employees = EmployeeServices.get_all(fields, after, limit)
+            items = serializers.dump(schema, employees, many=True)
+            return (items if limit is None else page(items, employees, limit)), 200
+        employee = EmployeeServices.get_cached(emp_id)
         if employee is None:
             return {'message': f'Employee with id = {emp_id} was not found'}, 404
-        return self.emp_schema.dump(employee), 200
+        return serializers.dump(schema, employee), 200, version_headers(employee.version)
 
     def post(self):
         """
         This method is called when POST request is sent to "/api/v1/employees" url with json data.
         Creates a new employee entry in database.
         :return:
-        if valid data provided => returns the created entry serialized to json, status code 201
+        if valid data provided => returns the created entry serialized to json and its
+        ETag, status code 201
         if invalid data => returns the error message in json format, status code 400.
+        If the group commit timed out => error message, status code 503.
         """
-        json_data = request.get_json(force=True)
+        json_data = parse_body()
         try:
             data = self.emp_schema.load(json_data)
         except ValidationError as exception:
@@ -54,45 +96,81 @@ class EmployeeApi(Resource):
             new_employee = EmployeeServices.create(data)
         except IntegrityError:
             return {'message': 'Not valid department id'}, 400
-        return self.emp_schema.dump(new_employee), 201
+        except TimeoutError as exception:
+            return {'message': str(exception)}, 503
+        return self.emp_schema.dump(new_employee), 201, version_headers(new_employee.version)
 
     def put(self, emp_id):
         """
-        This method is called when GET request is sent to "/api/v1/employees/id" url with json data.
-        Changes specified data of selected employee in database.
+        This method is called when PUT request is sent to "/api/v1/employees/id" url with json data.
+        Changes specified data of selected employee in database with one UPDATE statement.
+        With the "If-Match" header (the ETag of the employee), the employee is only changed
+        if it was not changed since.
         :return:
-        if valid data provided => returns the changed entry serialized to json, status code 200
+        if valid data provided => returns the changed entry serialized to json and its
+        new ETag, status code 200
         if invalid data => error message in json format, status code 400.
         If invalid "id" => error message, status code 404.
+        If the employee was changed since the "If-Match" ETag => the current entry serialized
+        to json and its ETag, status code 409.
+        If the group commit timed out => error message, status code 503.
         """
-        json_data = request.get_json(force=True)
-        employee = EmployeeServices.get_by_id(emp_id)
-        if employee is None:
-            return {'message': f"Employee with id {emp_id} not found"}, 404
+        json_data = parse_body()
+        try:
+            version = parse_if_match()
+        except ValueError:
+            return {'message': 'If-Match should be the ETag of the employee'}, 400
         try:
             data = self.emp_schema.load(json_data, partial=True)
         except ValidationError as exception:
             return exception.messages, 400
         try:
-            updated_employee = EmployeeServices.update(employee, data)
+            updated_employee = EmployeeServices.update_by_id(emp_id, data, version)
         except IntegrityError:
             return {'message': 'Not valid department id'}, 400
-        return self.emp_schema.dump(updated_employee), 200
+        except StaleDataError:
+            return self._conflict(emp_id)
+        except TimeoutError as exception:
+            return {'message': str(exception)}, 503
+        if updated_employee is None:
+            return {'message': f"Employee with id {emp_id} not found"}, 404
+        return self.emp_schema.dump(updated_employee), 200, \
+            version_headers(updated_employee.version)
 
-    @staticmethod
-    def delete(emp_id):
+    def delete(self, emp_id):
         """
         This method is called when DELETE request is sent to url "/api/v1/employees/id"
-        deletes employee with specified "id" from database.
+        deletes employee with specified "id" from database with one DELETE statement.
+        With the "If-Match" header (the ETag of the employee), the employee is only deleted
+        if it was not changed since.
         :return:
         if valid "id" => returns an empty response body and status code 204 specified.
         If invalid "id" specified => returns error message and status code 404.
+        If the employee was changed since the "If-Match" ETag => the current entry serialized
+        to json and its ETag, status code 409.
+        """
+        try:
+            version = parse_if_match()
+        except ValueError:
+            return {'message': 'If-Match should be the ETag of the employee'}, 400
+        try:
+            deleted = EmployeeServices.delete_by_id(emp_id, version)
+        except StaleDataError:
+            return self._conflict(emp_id)
+        if not deleted:
+            return {'message': f'Employee with id = {emp_id} was not found'}, 404
+        return '', 204
+
+    def _conflict(self, emp_id):
+        """
+        Build the response of a write to a stale version of an employee.
+        :return: The current employee serialized to json and its ETag, status code 409.
+        If the employee was deleted since => error message, status code 404.
         """
         employee = EmployeeServices.get_by_id(emp_id)
         if employee is None:
             return {'message': f'Employee with id = {emp_id} was not found'}, 404
-        EmployeeServices.delete(employee)
-        return '', 204
+        return self.emp_schema.dump(employee), 409, version_headers(employee.version)
 
 
 class EmployeeSearchApi(Resource):
@@ -100,9 +178,10 @@ class EmployeeSearchApi(Resource):
     This class defines the EmployeeSearchApi Resource, available at the
     "/api/v1/employees/search" url
     """
-    search_schema = EmployeeSchema()
+    coalesce_gets = True
 
-    def get(self, dep_id=None):
+    @staticmethod
+    def get(dep_id=None):
         """
         This method is called when GET request is sent to:
         "/api/v1/employees/search" or
@@ -120,7 +199,20 @@ class EmployeeSearchApi(Resource):
         if "date_for_interval" not specified => the list of all employees who were born in interval
         from specified department in json format, status code 200.
         If invalid "dep_id" => error message, status code 404.
+        The "fields" and "fields[department]" query parameters (e.g. ?fields=id_,full_name)
+        restrict the dumped fields, unknown fields => error message, status code 400.
+        The "limit" and "after" query parameters (e.g. ?limit=100&after=200) return a page
+        of the list ordered by id and the "after" value of the next page
+        ({"items": [...], "next": id or null}), invalid values => error message, status code 400.
         """
+        try:
+            schema, fields = parse_fieldset(EmployeeSchema)
+        except ValueError as exception:
+            return {'message': str(exception)}, 400
+        try:
+            after, limit = parse_page()
+        except ValueError:
+            return {'message': 'limit and after should be positive numbers'}, 400
         date_of_birth = request.args.get('date_of_birth')
         if date_of_birth is None:
             return {'message': 'Enter search data'}, 400
@@ -129,15 +221,141 @@ class EmployeeSearchApi(Resource):
         if date_for_interval:
             date_for_interval = datetime.strptime(date_for_interval, "%Y-%m-%d").date()
         if dep_id is None:
-            employees = EmployeeServices.get_by_date_of_birth(date_of_birth, date_for_interval)
+            employees = EmployeeServices.get_by_date_of_birth(
+                date_of_birth, date_for_interval, fields, after, limit
+            )
         else:
-            department = DepartmentServices.get_by_id(dep_id)
-            if department is None:
+            if not DepartmentServices.exists(dep_id):
                 return {"message": f"Department with id {dep_id} not found"}, 404
             employees = EmployeeServices.get_by_date_of_birth_from_department(
                 dep_id,
                 date_of_birth,
-                date_for_interval
+                date_for_interval,
+                fields,
+                after,
+                limit
             )
+        items = serializers.dump(schema, employees, many=True)
+        return (items if limit is None else page(items, employees, limit)), 200
 
-        return self.search_schema.dump(employees, many=True), 200
+
+class EmployeeExportApi(Resource):
+    """
+    This class defines the EmployeeExportApi Resource, available at the
+    "/api/v1/employees/export.csv" and "/api/v1/departments/<int:id>/employees/export.csv" urls
+    """
+    header = ('id', 'full_name', 'date_of_birth', 'salary', 'department_id', 'department')
+
+    def get(self, dep_id=None):
+        """
+        This method is called when GET request is sent to "/api/v1/employees/export.csv" or
+        "/api/v1/departments/<int:id>/employees/export.csv" url. Accepts the optional
+        "date_of_birth" and "date_for_interval" query parameters of the search.
+        :return:
+        All employees, or those of the department with the specified "id", born on
+        "date_of_birth" or in the interval if specified, ordered by id, with the titles
+        of their departments as a CSV attachment streamed while it's read, status code 200.
+        If invalid dates => error message, status code 400.
+        If invalid "id" => error message, status code 404.
+        """
+        try:
+            date_of_birth, date_for_interval = (
+                datetime.strptime(value, '%Y-%m-%d').date() if value else None
+                for value in (request.args.get('date_of_birth'),
+                              request.args.get('date_for_interval'))
+            )
+        except ValueError:
+            return {'message': 'Dates should be in YYYY-MM-DD format'}, 400
+        if date_for_interval is not None and date_of_birth is None:
+            return {'message': 'date_for_interval needs date_of_birth'}, 400
+        filename = 'employees.csv'
+        if dep_id is not None:
+            if not DepartmentServices.exists(dep_id):
+                return {'message': f'Department with id = {dep_id} was not found'}, 404
+            filename = f'department-{dep_id}-employees.csv'
+        chunk_size = current_app.config['EXPORT_CHUNK_SIZE']
+        rows = EmployeeServices.export(dep_id, date_of_birth, date_for_interval, chunk_size)
+        return output_csv_stream(self.header, rows, filename, chunk_size)
+
+
+class EmployeeImportApi(Resource):
+    """
+    This class defines the EmployeeImportApi Resource, available at the
+    "/api/v1/employees/import" url
+    """
+
+    @staticmethod
+    def post():
+        """
+        This method is called when POST request is sent to "/api/v1/employees/import" url
+        with a CSV ("text/csv", with a header row) or JSON Lines ("application/x-ndjson")
+        body of employees, read while it's uploaded. The department of an employee is given
+        by "department_id" or by title in "department". The "start" query parameter skips
+        the rows up to the checkpoint of an interrupted import.
+        :return:
+        The import report (rows, imported, failed, errors of the first failed rows,
+        checkpoint, seconds, rows_per_second) in json format, status code 200.
+        If invalid "start" or CSV header => error message, status code 400.
+        If the body is neither CSV nor JSON Lines => error message, status code 415.
+        If a database error stops the import => error message and the report of the
+        rows committed before, status code 500.
+        """
+        file_format = IMPORT_MEDIATYPES.get(request.mimetype)
+        if file_format is None:
+            return {'message': 'Employees should be sent as text/csv or application/x-ndjson'}, 415
+        try:
+            start = int(request.args.get('start', 0))
+        except ValueError:
+            start = -1
+        if start < 0:
+            return {'message': 'start should be a positive number'}, 400
+        stream = io.TextIOWrapper(request.stream, encoding='utf-8', errors='replace', newline='')
+        try:
+            records = read_records(stream, file_format)
+        except ValueError as exception:
+            return {'message': str(exception)}, 400
+        try:
+            report = import_employees(
+                records, start, current_app.config['IMPORT_CHUNK_SIZE'],
+                current_app.config['IMPORT_MAX_ERRORS']
+            )
+        except ImportInterrupted as exception:
+            return {'message': str(exception), **exception.report}, 500
+        return report, 200
+
+
+class EmployeeTopApi(Resource):
+    """
+    This class defines the EmployeeTopApi Resource, available at the
+    "/api/v1/employees/top" url
+    """
+    coalesce_gets = True
+
+    @staticmethod
+    def get():
+        """
+        This method is called when GET request is sent to "/api/v1/employees/top" url.
+        Accepts optional query parameters "by" (ranking: "salary" or "newest", "salary"
+        by default) and "per_department" (number of employees per department, 10 by default).
+        :return:
+        The list of the first employees of every department by the ranking in json format,
+        ordered by department and rank, status code 200.
+        If invalid query parameters => error message, status code 400.
+        The "fields" and "fields[department]" query parameters (e.g. ?fields=id_,full_name)
+        restrict the dumped fields, unknown fields => error message, status code 400.
+        """
+        try:
+            schema, fields = parse_fieldset(EmployeeSchema)
+        except ValueError as exception:
+            return {'message': str(exception)}, 400
+        by = request.args.get('by', 'salary')
+        if by not in RANKINGS:
+            return {'message': f'Ranking should be one of: {", ".join(RANKINGS)}'}, 400
+        try:
+            per_department = int(request.args.get('per_department', 10))
+        except ValueError:
+            per_department = 0
+        if per_department <= 0:
+            return {'message': 'per_department should be a positive number'}, 400
+        employees = EmployeeServices.get_top_by_department(by, per_department, fields)
+        return serializers.dump(schema, employees, many=True), 200
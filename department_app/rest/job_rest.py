@@ -0,0 +1,62 @@
+"""
+Module contains Flask-Restful Resources for background jobs.
+"""
+from flask import url_for
+from flask_restful import Resource
+
+from department_app.rest.params import parse_body
+from department_app.rest.schemas import JobSchema
+from department_app.service.jobs import get_job, get_job_runner
+
+
+def accepted(job):
+    """
+    Build the response of a request run as a background job.
+    :param job: The submitted Job.
+    :return: The job serialized to json, status code 202 and the url of the job
+    in the Location header.
+    """
+    return JobApi.job_schema.dump(job), 202, {'Location': url_for('job', job_id=job.id_)}
+
+
+class JobApi(Resource):
+    """
+    This class defines the JobApi Resource, available at the
+    "/api/v1/jobs/[<int:id>]" url
+    """
+    job_schema = JobSchema()
+
+    def get(self, job_id):
+        """
+        This method is called when GET request is sent to "/api/v1/jobs/<int:id>" url
+        :return:
+        The job with the specified "id" (kind, params, status, rows_done, rows_total,
+        progress, result, error and timestamps) serialized to json, status code 200.
+        If invalid "id" => error message, status code 404.
+        """
+        job = get_job(job_id)
+        if job is None:
+            return {'message': f'Job with id = {job_id} was not found'}, 404
+        return self.job_schema.dump(job), 200
+
+    @staticmethod
+    def post():
+        """
+        This method is called when POST request is sent to "/api/v1/jobs" url with json data
+        ({"kind": "refresh-analytics", "params": {...}}). Submits a background job.
+        :return:
+        if valid data provided => the created job serialized to json and its url in the
+        Location header, status code 202.
+        if unknown kind or parameters => error message in json format, status code 400.
+        """
+        json_data = parse_body()
+        if not isinstance(json_data, dict):
+            return {'message': 'kind should be a string and params an object'}, 400
+        kind, params = json_data.get('kind'), json_data.get('params') or {}
+        if not isinstance(kind, str) or not isinstance(params, dict):
+            return {'message': 'kind should be a string and params an object'}, 400
+        try:
+            job = get_job_runner().submit(kind, params)
+        except ValueError as exception:
+            return {'message': str(exception)}, 400
+        return accepted(job)
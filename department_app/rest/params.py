@@ -0,0 +1,157 @@
+"""
+Module contains helpers to parse query parameters, bodies and conditional
+headers of REST requests.
+
+Functions:
+    parse_number_list(value, cast)
+    parse_ids()
+    parse_page()
+    page(items, rows, limit)
+    parse_fieldset(schema_class)
+    parse_body()
+    version_headers(version)
+    parse_if_match()
+    prefers_async()
+"""
+import re
+
+from flask import request, current_app
+from werkzeug.exceptions import BadRequest, UnsupportedMediaType
+
+from department_app.rest.representations import MSGPACK_MEDIATYPES, msgpack
+from department_app.rest.schemas import sparse_schema
+
+NESTED_FIELDS_PARAMETER = re.compile(r'fields\[(\w+)\]')
+
+
+def parse_number_list(value, cast=float):
+    """
+    Parse a comma separated query parameter into a list of numbers.
+    :param value: The raw parameter value, e.g. "50,90,99".
+    :param cast: Callable to convert every item with (int or float).
+    :return: A list of numbers.
+    :raise ValueError: if any of the items is not a number.
+    """
+    return [cast(item) for item in value.split(',') if item.strip()]
+
+
+def parse_ids():
+    """
+    Parse the "ids" query parameter of a batch fetch request.
+    :return: A list of ids, None if the parameter is not given.
+    :raise ValueError: if ids are not integers or there are more than "BATCH_MAX_IDS".
+    """
+    if 'ids' not in request.args:
+        return None
+    ids = parse_number_list(request.args['ids'], int)
+    if len(ids) > current_app.config['BATCH_MAX_IDS']:
+        raise ValueError('Too many ids')
+    return ids
+
+
+def parse_page():
+    """
+    Parse the cursor pagination query parameters: "limit" (maximal number of items)
+    and "after" (id of the last item of the previous page).
+    :return: A tuple (after, limit), limit is None if the request is not paginated
+    and after is None for the first page.
+    :raise ValueError: if they are not positive integers or limit is above "PAGE_MAX_LIMIT".
+    """
+    if 'limit' not in request.args:
+        return None, None
+    limit = int(request.args['limit'])
+    after = int(request.args['after']) if 'after' in request.args else None
+    if limit <= 0 or limit > current_app.config['PAGE_MAX_LIMIT'] or (after is not None and after < 0):
+        raise ValueError('Invalid page')
+    return after, limit
+
+
+def page(items, rows, limit):
+    """
+    Wrap a page of items with the cursor of the next page.
+    :param items: A list of dumped items.
+    :param rows: The rows the items were dumped from, ordered by id.
+    :param limit: The requested limit.
+    :return: A dict with items and next, the "after" value of the next page
+    or None for the last page.
+    """
+    return {'items': items, 'next': rows[-1].id_ if len(rows) == limit else None}
+
+
+def parse_fieldset(schema_class):
+    """
+    Parse sparse fieldset query parameters: "fields" (e.g. ?fields=id_,full_name) for
+    the fields of the requested resource and "fields[<nested field>]" (e.g.
+    ?fields[department]=title) for the fields of its nested objects.
+    :param schema_class: Schema class of the requested resource.
+    :return: A tuple (schema dumping only the requested fields, tuple of requested
+    top-level field names or None if all fields are requested).
+    :raise ValueError: if any of the field names is unknown.
+    """
+    only = None
+    if 'fields' in request.args:
+        only = tuple(name.strip() for name in request.args['fields'].split(',') if name.strip())
+    nested = []
+    for key, value in request.args.items():
+        match = NESTED_FIELDS_PARAMETER.fullmatch(key)
+        if match:
+            nested.append((
+                match.group(1),
+                tuple(name.strip() for name in value.split(',') if name.strip())
+            ))
+    return sparse_schema(schema_class, only, tuple(sorted(nested))), only
+
+
+def parse_body():
+    """
+    Decode the request body by its content type: MessagePack for
+    "application/msgpack", JSON for any other type.
+    :return: The decoded data.
+    :raise BadRequest: if the body can't be decoded.
+    :raise UnsupportedMediaType: if the body is MessagePack and msgpack is not installed.
+    """
+    if request.mimetype not in MSGPACK_MEDIATYPES:
+        return request.get_json(force=True)
+    if msgpack is None:
+        raise UnsupportedMediaType('MessagePack is not supported')
+    try:
+        return msgpack.unpackb(request.get_data(), raw=False)
+    except ValueError as exception:
+        raise BadRequest('Failed to decode MessagePack object') from exception
+
+
+def version_headers(version):
+    """
+    Build the headers sending the version of a department or employee as its ETag.
+    :param version: The version (int).
+    :return: A dict of headers.
+    """
+    return {'ETag': f'"{version}"'}
+
+
+def parse_if_match():
+    """
+    Parse the "If-Match" header of a conditional update or delete. Weak tags are
+    accepted too since compressed responses carry weak tags.
+    :return: The version the client expects, None if the header is absent or "*".
+    :raise ValueError: if the header is not one ETag sent by version_headers().
+    """
+    if_match = request.if_match
+    if not if_match or if_match.star_tag:
+        return None
+    tags = if_match.as_set(include_weak=True)
+    if len(tags) != 1:
+        raise ValueError('One ETag expected')
+    return int(tags.pop())
+
+
+def prefers_async():
+    """
+    Check if the client asked to run the request as a background job with the
+    "Prefer: respond-async" header (RFC 7240).
+    :return: bool
+    """
+    return any(
+        preference.split('=')[0].strip().lower() == 'respond-async'
+        for value in request.headers.getlist('Prefer') for preference in value.split(',')
+    )
@@ -0,0 +1,245 @@
+"""
+Module contains the JSON and MessagePack representations of the REST API responses.
+
+Bodies are encoded to bytes in one call, with orjson when it is installed and
+the stdlib encoder otherwise; the encoder is chosen with the "REST_JSON_ENCODER"
+configuration option ("auto", "orjson" or "json"). Both write the same bytes:
+compact JSON with non-ASCII characters escaped like the flask-restful encoder
+did, indented by 2 spaces in debug mode, so the encoder never changes a
+response. The "RESTFUL_JSON" settings of flask-restful are still honoured by
+the stdlib encoder.
+
+MessagePack ("application/msgpack") is available when msgpack is installed.
+With the "layout=table" query parameter, lists of objects are sent in either
+format as a table of column names and row arrays instead of repeating the keys
+in every object.
+
+CSV exports are streamed: rows are written and sent a chunk at a time.
+
+Functions:
+    to_table(data)
+    encode_json(data)
+    output_json(data, code, headers)
+    output_msgpack(data, code, headers)
+    csv_chunks(header, rows, chunk_size)
+    output_csv_stream(header, rows, filename, chunk_size)
+"""
+import csv
+import io
+import json
+import re
+from datetime import date, datetime
+from functools import lru_cache
+
+from flask import current_app, make_response, request, stream_with_context
+from flask_restful.representations.json import output_json as restful_output_json
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
+
+MSGPACK_MEDIATYPES = ('application/msgpack', 'application/x-msgpack')
+
+# Dates of a response repeat a lot (birthdays, "as_of"), their strings are cached
+_date_string = lru_cache(maxsize=4096)(date.isoformat)
+
+
+def _default(value):
+    """
+    Encode values the stdlib encoder does not support.
+    :param value: The value to encode.
+    :return: A JSON serializable value.
+    :raise TypeError: if the value is not supported.
+    """
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, date):
+        return _date_string(value)
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+_compact_encoder = json.JSONEncoder(separators=(',', ':'), default=_default)
+# orjson only indents by 2 spaces
+_debug_encoder = json.JSONEncoder(indent=2, separators=(',', ': '), default=_default)
+
+_NON_ASCII = re.compile('[^\x00-\x7f]')
+
+
+def _escape_character(match):
+    """Escape a non-ASCII character like the stdlib encoder, with surrogate pairs."""
+    code = ord(match.group())
+    if code > 0xFFFF:
+        code -= 0x10000
+        return f'\\u{0xD800 | (code >> 10):04x}\\u{0xDC00 | (code & 0x3FF):04x}'
+    return f'\\u{code:04x}'
+
+
+def _escape_non_ascii(encoded):
+    """
+    Escape the non-ASCII characters of UTF-8 encoded JSON.
+    :param encoded: bytes
+    :return: ASCII bytes.
+    """
+    if encoded.isascii():
+        return encoded
+    return _NON_ASCII.sub(_escape_character, encoded.decode()).encode()
+
+
+def _encode_orjson(data, debug):
+    """
+    Encode data with orjson.
+    :param data: The data to encode.
+    :param debug: True to pretty-print.
+    :return: bytes ending with a new line.
+    """
+    option = orjson.OPT_APPEND_NEWLINE | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+    if debug:
+        option |= orjson.OPT_INDENT_2
+    return _escape_non_ascii(orjson.dumps(data, option=option))
+
+
+def _encode_json(data, debug):
+    """
+    Encode data with the stdlib encoder.
+    :param data: The data to encode.
+    :param debug: True to pretty-print.
+    :return: bytes ending with a new line.
+    """
+    encoder = _debug_encoder if debug else _compact_encoder
+    return (encoder.encode(data) + '\n').encode()
+
+
+def _table(items):
+    """
+    Convert a list of dicts to the table layout.
+    :param items: A list of dicts.
+    :return: A dict with "columns" (names in order of first appearance) and
+    "rows" (lists of values in the order of columns, None for absent keys).
+    """
+    columns = {}
+    for item in items:
+        for name in item:
+            columns.setdefault(name, len(columns))
+    return {
+        'columns': list(columns),
+        'rows': [[item.get(name) for name in columns] for item in items],
+    }
+
+
+def to_table(data):
+    """
+    Apply the table layout to response data: a list of dicts, or the "items"
+    list of a batch response, is replaced with its table.
+    :param data: The data returned by the resource.
+    :return: The data in the table layout, or unchanged if it holds no list of dicts.
+    """
+    if isinstance(data, list) and all(isinstance(item, dict) for item in data):
+        return _table(data)
+    if isinstance(data, dict) and isinstance(data.get('items'), list):
+        return {**data, 'items': to_table(data['items'])}
+    return data
+
+
+def _apply_layout(data):
+    """
+    Apply the layout requested with the "layout" query parameter.
+    :param data: The data returned by the resource.
+    :return: The data in the requested layout.
+    """
+    if request.args.get('layout') == 'table':
+        return to_table(data)
+    return data
+
+
+ENCODERS = {
+    'orjson': _encode_orjson,
+    'json': _encode_json,
+}
+
+
+def encode_json(data):
+    """
+    Encode data with the configured encoder.
+    :param data: The data to encode.
+    :return: bytes ending with a new line.
+    :raise ValueError: if orjson is configured but not installed.
+    """
+    name = current_app.config['REST_JSON_ENCODER']
+    if name == 'auto':
+        name = 'json' if orjson is None else 'orjson'
+    if name == 'orjson' and orjson is None:
+        raise ValueError('REST_JSON_ENCODER is "orjson" but orjson is not installed')
+    return ENCODERS[name](data, current_app.debug)
+
+
+def output_json(data, code, headers=None):
+    """
+    Make a Flask response with a JSON encoded body.
+    :param data: The data returned by the resource.
+    :param code: The status code.
+    :param headers: Optional dict of response headers.
+    :return: Response object.
+    """
+    data = _apply_layout(data)
+    if current_app.config.get('RESTFUL_JSON'):
+        return restful_output_json(data, code, headers)
+    response = make_response(encode_json(data), code)
+    response.headers.extend(headers or {})
+    return response
+
+
+def output_msgpack(data, code, headers=None):
+    """
+    Make a Flask response with a MessagePack encoded body. Dates are sent as
+    ISO strings, like in JSON.
+    :param data: The data returned by the resource.
+    :param code: The status code.
+    :param headers: Optional dict of response headers.
+    :return: Response object.
+    """
+    response = make_response(msgpack.packb(_apply_layout(data), default=_default), code)
+    response.headers.extend(headers or {})
+    return response
+
+
+def csv_chunks(header, rows, chunk_size=1000):
+    """
+    Write rows as CSV, a chunk of rows at a time.
+    :param header: A sequence of column names.
+    :param rows: An iterable of row sequences, dates are written as ISO strings.
+    :param chunk_size: Number of rows per chunk.
+    :return: A generator of CSV strings.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    for count, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if count % chunk_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def output_csv_stream(header, rows, filename, chunk_size=1000):
+    """
+    Make a Flask response streaming rows as a CSV attachment, in the request
+    context, so the rows may come from a query still being read.
+    :param header: A sequence of column names.
+    :param rows: An iterable of row sequences.
+    :param filename: Name of the attachment.
+    :param chunk_size: Number of rows per chunk of the body.
+    :return: Response object.
+    """
+    return current_app.response_class(
+        stream_with_context(csv_chunks(header, rows, chunk_size)),
+        mimetype='text/csv',
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
@@ -1,5 +1,7 @@
 # pylint: disable=R0903
-"""Module contains serializer schemas for Department and Employee classes."""
+"""Module contains serializer schemas for Department, Employee, Job and Change classes."""
+from functools import lru_cache
+
 from marshmallow import fields, validate, ValidationError, validates
 from marshmallow_sqlalchemy import SQLAlchemyAutoSchema
 
@@ -25,6 +27,8 @@ class DepartmentSchema(SQLAlchemyAutoSchema):
     class Meta:
         """Meta class"""
         model = model.Department
+        # Sent as the ETag header, not in the body
+        exclude = ('version',)
 
 
 class EmployeeSchema(SQLAlchemyAutoSchema):
@@ -53,3 +57,68 @@ class EmployeeSchema(SQLAlchemyAutoSchema):
     class Meta:
         """Meta class"""
         model = model.Employee
+        # Sent as the ETag header, not in the body
+        exclude = ('version',)
+
+
+class JobSchema(SQLAlchemyAutoSchema):
+    """
+    Marshmallow-SQLAlchemy schema for serializing background jobs with their progress.
+    """
+    @staticmethod
+    def get_progress(obj):
+        """Method to serialize the share of rows done, None while the total is unknown."""
+        if not obj.rows_total:
+            return None
+        return round(obj.rows_done / obj.rows_total, 4)
+
+    progress = fields.Method('get_progress')
+
+    class Meta:
+        """Meta class"""
+        model = model.Job
+
+
+class ChangeSchema(SQLAlchemyAutoSchema):
+    """
+    Marshmallow-SQLAlchemy schema for serializing entries of the change log.
+    """
+
+    class Meta:
+        """Meta class"""
+        model = model.Change
+
+
+@lru_cache(maxsize=256)
+def sparse_schema(schema_class, only=None, nested=()):
+    """
+    Get a (cached) schema instance dumping only the requested fields.
+    Fields left out are never read from the dumped objects, so nested objects
+    and computed fields like "avg_salary" are skipped entirely.
+    :param schema_class: The schema class.
+    :param only: Tuple of top-level field names, None for all fields.
+    :param nested: Tuple of pairs (nested field name, tuple of its field names).
+    :return: A schema instance.
+    :raise ValueError: if any of the field names is unknown.
+    """
+    schema = schema_class()
+    if only is None and not nested:
+        return schema
+    names = list(schema.dump_fields) if only is None else list(only)
+    unknown = [name for name in names if name not in schema.dump_fields]
+    unknown += [name for name, _ in nested if name not in names]
+    if unknown:
+        raise ValueError(f'Unknown fields: {", ".join(unknown)}')
+    for name, nested_names in nested:
+        field = schema.fields[name]
+        nested_schema = getattr(getattr(field, 'inner', field), 'schema', None)
+        unknown += [
+            f'{name}.{nested_name}' for nested_name in nested_names
+            if nested_schema is None or nested_name not in nested_schema.dump_fields
+        ]
+    if unknown:
+        raise ValueError(f'Unknown fields: {", ".join(unknown)}')
+    nested = dict(nested)
+    return schema_class(only=[
+        f'{name}.{nested_name}' for name in names for nested_name in nested.get(name, ())
+    ] + [name for name in names if name not in nested])
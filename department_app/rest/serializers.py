@@ -0,0 +1,191 @@
+"""
+Module contains a serializer compiler producing the same output as marshmallow
+schema dumps at a fraction of the cost.
+
+For every schema instance the compiler generates once the source of a plain
+Python function building the output dict, with the fields of the schema in the
+same order. Loaded values of mapped attributes are read from the instance dict
+and Integer, String and Date fields of common values are converted inline; any
+other value or field type goes through the marshmallow field itself.
+Nested objects met several times in one dump (e.g. the department of every
+employee in a list) are serialized once; every other occurrence gets a copy
+of that output, so the dumped dicts can be changed independently.
+
+Functions:
+    compile_schema(schema)
+    dump(schema, data, many)
+"""
+import datetime
+import itertools
+from functools import lru_cache
+
+from flask import current_app
+from marshmallow import fields, missing
+from marshmallow.decorators import POST_DUMP, PRE_DUMP
+from sqlalchemy import inspect
+from sqlalchemy.exc import NoInspectionAvailable
+
+_nested_ids = itertools.count()
+
+# Inline conversions: field class => (class of the values it handles, expression)
+INLINE_CONVERSIONS = {
+    fields.Integer: (int, '{value}'),
+    fields.String: (str, '{value}'),
+    fields.Date: (datetime.date, '{value}.isoformat()'),
+}
+
+
+def _inline_conversion(field):
+    """
+    Get the inline conversion for a field if its type and options allow it.
+    :param field: A marshmallow field.
+    :return: A tuple (value class, expression template) or None.
+    """
+    conversion = INLINE_CONVERSIONS.get(type(field))
+    if conversion is None or getattr(field, 'as_string', False):
+        return None
+    if isinstance(field, fields.Date) and field.format not in (None, 'iso'):
+        return None
+    return conversion
+
+
+def _nested_schema(field):
+    """
+    Get the schema of a Nested field or of a List of Nested field.
+    :param field: A marshmallow field.
+    :return: A tuple (schema, is a list of objects) or (None, False).
+    """
+    if type(field) is fields.Nested:  # pylint: disable=C0123
+        return field.schema, bool(field.schema.many or field.many)
+    if type(field) is fields.List and type(field.inner) is fields.Nested:  # pylint: disable=C0123
+        if not field.inner.schema.many and not field.inner.many:
+            return field.inner.schema, True
+    return None, False
+
+
+def _mapped_attributes(schema):
+    """
+    Get the names of the mapped attributes of the schema model. Loaded values of
+    these attributes are read from the instance dict, skipping the descriptor.
+    :param schema: A marshmallow schema instance.
+    :return: A set of attribute names, empty if the schema has no mapped model.
+    """
+    try:
+        return set(inspect(schema.opts.model).attrs.keys())
+    except (AttributeError, NoInspectionAvailable):
+        return set()
+
+
+def _getter(attribute, mapped):
+    """
+    Build the expression reading an attribute of "obj" in the generated code.
+    :param attribute: Name of the attribute.
+    :param mapped: Names of the mapped attributes of the schema model.
+    :return: Python source of the expression.
+    """
+    if attribute in mapped:
+        return f'state[{attribute!r}] if {attribute!r} in state else obj.{attribute}'
+    return f'obj.{attribute}'
+
+
+def _copy(value):
+    """
+    Copy the dicts and lists of a serialized value, other values are immutable.
+    :param value: A serialized value.
+    :return: The copy.
+    """
+    if value.__class__ is dict:
+        return {key: _copy(item) for key, item in value.items()}
+    if value.__class__ is list:
+        return [_copy(item) for item in value]
+    return value
+
+
+def _memoized(serialize):
+    """
+    Wrap a nested object serializer to serialize every object once per dump,
+    repeated objects get a copy of the first output.
+    :param serialize: The nested serializer.
+    :return: A serializer accepting the object and the memo dict of the dump.
+    """
+    nested_id = next(_nested_ids)
+
+    def serialize_once(value, memo):
+        key = (nested_id, id(value))
+        if key not in memo:
+            # The object is kept with its output, so its id is not reused during the
+            # dump by another object (e.g. rows of a dynamic relationship)
+            output = serialize(value, memo)
+            memo[key] = (value, output)
+            return output
+        return _copy(memo[key][1])
+    return serialize_once
+
+
+@lru_cache(maxsize=256)
+def compile_schema(schema):
+    """
+    Generate a serializer function equivalent to schema.dump for one object.
+    :param schema: A marshmallow schema instance.
+    :return: A function accepting the object and a memo dict, returning the
+    serialized dict. None if the schema has dump processors and must be used as is.
+    """
+    if schema._has_processors(PRE_DUMP) or schema._has_processors(POST_DUMP):  # pylint: disable=W0212
+        return None
+    namespace = {'missing': missing}
+    lines = ['def serialize(obj, memo):', '    result = {}']
+    mapped = _mapped_attributes(schema)
+    if mapped:
+        lines.append('    state = obj.__dict__')
+    for index, (name, field) in enumerate(schema.dump_fields.items()):
+        key = repr(field.data_key if field.data_key is not None else name)
+        attribute = field.attribute or name
+        namespace[f'_field{index}'] = field
+        conversion = _inline_conversion(field)
+        nested_schema, many = _nested_schema(field)
+        if attribute.isidentifier() and conversion is not None:
+            namespace[f'_class{index}'] = conversion[0]
+            lines += [
+                f'    value = {_getter(attribute, mapped)}',
+                f'    result[{key}] = ' + conversion[1].format(value='value')
+                + f' if value.__class__ is _class{index} else '
+                f'(None if value is None else _field{index}._serialize(value, {key}, obj))',
+            ]
+        elif attribute.isidentifier() and nested_schema is not None \
+                and compile_schema(nested_schema) is not None:
+            namespace[f'_nested{index}'] = _memoized(compile_schema(nested_schema))
+            call = f'_nested{index}(item, memo) for item in value' if many else \
+                f'_nested{index}(value, memo)'
+            lines += [
+                f'    value = {_getter(attribute, mapped)}',
+                f'    result[{key}] = None if value is None else '
+                + (f'[{call}]' if many else call),
+            ]
+        else:
+            namespace[f'_get{index}'] = schema.get_attribute
+            lines += [
+                f'    value = _field{index}.serialize({attribute!r}, obj, accessor=_get{index})',
+                '    if value is not missing:',
+                f'        result[{key}] = value',
+            ]
+    lines.append('    return result')
+    exec(compile('\n'.join(lines), f'<serializer {schema!r}>', 'exec'), namespace)  # pylint: disable=W0122
+    return namespace['serialize']
+
+
+def dump(schema, data, many=False):
+    """
+    Serialize an object or a list of objects like schema.dump does, with the
+    compiled serializer unless "FAST_SERIALIZER" is disabled.
+    :param schema: A marshmallow schema instance.
+    :param data: The object or iterable of objects to serialize.
+    :param many: True if data is an iterable of objects.
+    :return: A dict or a list of dicts.
+    """
+    serialize = compile_schema(schema) if current_app.config['FAST_SERIALIZER'] else None
+    if serialize is None:
+        return schema.dump(data, many=many)
+    memo = {}
+    if many:
+        return [serialize(obj, memo) for obj in data]
+    return serialize(data, memo)
@@ -0,0 +1,139 @@
+"""
+Module contains Flask-Restful Resources for aggregate statistics.
+"""
+from datetime import date, datetime
+
+from flask import request, current_app
+from flask_restful import Resource
+
+from department_app.rest.params import parse_number_list
+from department_app.service import DepartmentServices, StatsServices
+
+
+class SalaryStatsApi(Resource):
+    """
+    This class defines the SalaryStatsApi Resource, available at the
+    "/api/v1/salary-stats" and "/api/v1/departments/<int:id>/salary-stats" urls
+    """
+    coalesce_gets = True
+
+    @staticmethod
+    def get(dep_id=None):
+        """
+        This method is called when GET request is sent to "/api/v1/salary-stats" or
+        "/api/v1/departments/<int:id>/salary-stats" url. Accepts optional query parameters:
+        "percentiles" (e.g. 50,90,99, at most "SALARY_STATS_MAX_PERCENTILES"), "bucket_width"
+        (e.g. 500) for fixed-width histogram buckets or "buckets" (e.g. 0,1000,2000) for
+        custom histogram edges, making at most "SALARY_STATS_MAX_BUCKETS" buckets.
+        :return:
+        Salary statistics (count, mean, min, max, percentiles, histogram) in json format,
+        status code 200.
+        If invalid query parameters => error message, status code 400.
+        If invalid "id" => error message, status code 404.
+        """
+        try:
+            percentiles = parse_number_list(
+                request.args.get('percentiles', ''), float
+            ) or current_app.config['SALARY_STATS_PERCENTILES']
+            bucket_width = int(
+                request.args.get('bucket_width', current_app.config['SALARY_STATS_BUCKET_WIDTH'])
+            )
+            edges = parse_number_list(request.args.get('buckets', ''), int)
+        except ValueError:
+            return {'message': 'Statistics parameters should be numbers'}, 400
+        if not all(0 <= percentile <= 100 for percentile in percentiles):
+            return {'message': 'Percentiles should be between 0 and 100'}, 400
+        max_percentiles = current_app.config['SALARY_STATS_MAX_PERCENTILES']
+        if len(percentiles) > max_percentiles:
+            return {'message': f'At most {max_percentiles} percentiles can be computed'}, 400
+        if bucket_width <= 0:
+            return {'message': 'Bucket width should be positive'}, 400
+        if edges != sorted(set(edges)):
+            return {'message': 'Bucket edges should be strictly ascending'}, 400
+        max_buckets = current_app.config['SALARY_STATS_MAX_BUCKETS']
+        if len(edges) + 1 > max_buckets:
+            return {'message': f'Bucket edges make more than {max_buckets} histogram buckets'}, 400
+        if dep_id is not None and not DepartmentServices.exists(dep_id):
+            return {'message': f'Department with id = {dep_id} was not found'}, 404
+        try:
+            stats = StatsServices.get_salary_stats(
+                dep_id, percentiles, bucket_width, edges, max_buckets
+            )
+        except ValueError as exception:
+            return {'message': str(exception)}, 400
+        if dep_id is not None:
+            stats['department_id'] = int(dep_id)
+        return stats, 200
+
+
+class DepartmentStatsApi(Resource):
+    """
+    This class defines the DepartmentStatsApi Resource, available at the
+    "/api/v1/departments/stats" url
+    """
+    coalesce_gets = True
+
+    @staticmethod
+    def get():
+        """
+        This method is called when GET request is sent to "/api/v1/departments/stats" url.
+        Accepts an optional "percentiles" query parameter (e.g. 50,90,99, at most
+        "SALARY_STATS_MAX_PERCENTILES").
+        :return:
+        The list of departments with employees, each with headcount, average salary
+        and salary percentiles in json format, status code 200.
+        If invalid query parameters => error message, status code 400.
+        """
+        try:
+            percentiles = parse_number_list(
+                request.args.get('percentiles', ''), float
+            ) or current_app.config['SALARY_STATS_PERCENTILES']
+        except ValueError:
+            return {'message': 'Statistics parameters should be numbers'}, 400
+        if not all(0 <= percentile <= 100 for percentile in percentiles):
+            return {'message': 'Percentiles should be between 0 and 100'}, 400
+        max_percentiles = current_app.config['SALARY_STATS_MAX_PERCENTILES']
+        if len(percentiles) > max_percentiles:
+            return {'message': f'At most {max_percentiles} percentiles can be computed'}, 400
+        stats = StatsServices.get_department_stats(percentiles)
+        return [{'department_id': dep_id, **stats[dep_id]} for dep_id in sorted(stats)], 200
+
+
+class DepartmentAgeStatsApi(Resource):
+    """
+    This class defines the DepartmentAgeStatsApi Resource, available at the
+    "/api/v1/departments/age-stats" url
+    """
+    coalesce_gets = True
+
+    @staticmethod
+    def get():
+        """
+        This method is called when GET request is sent to "/api/v1/departments/age-stats" url.
+        Accepts optional query parameters: "as_of" (e.g. 2022-01-01, today by default)
+        and "bands" (age band edges in years, e.g. 20,30,40).
+        :return:
+        The date the ages are computed at, the age bands and the list of departments
+        with headcount, band counts, average age, youngest and oldest age in json format,
+        status code 200.
+        If invalid query parameters => error message, status code 400.
+        """
+        try:
+            as_of = request.args.get('as_of')
+            as_of = datetime.strptime(as_of, '%Y-%m-%d').date() if as_of else date.today()
+            ages = parse_number_list(
+                request.args.get('bands', ''), int
+            ) or list(current_app.config['AGE_STATS_BANDS'])
+        except ValueError:
+            return {'message': 'Enter "as_of" as YYYY-MM-DD and "bands" as numbers'}, 400
+        if ages != sorted(set(ages)) or ages[0] <= 0 or ages[-1] >= as_of.year:
+            return {'message': 'Age bands should be strictly ascending positive numbers'}, 400
+        bounds = [None, *ages, None]
+        return {
+            'as_of': as_of.isoformat(),
+            'bands': [
+                {'min_age': bounds[index], 'max_age': bounds[index + 1]}
+                for index in range(len(ages) + 1)
+            ],
+            'departments': StatsServices.get_age_stats(as_of, ages),
+        }, 200
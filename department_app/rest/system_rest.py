@@ -0,0 +1,63 @@
+"""
+Module contains Flask-Restful Resources reporting the state of the application.
+"""
+from flask_restful import Resource
+
+from department_app.models.engine import get_pool_stats
+from department_app.models.replicas import get_replica_stats
+from department_app.service.cache import get_entity_cache
+
+
+class CacheStatsApi(Resource):
+    """
+    This class defines the CacheStatsApi Resource, available at the
+    "/api/v1/system/cache" url
+    """
+
+    @staticmethod
+    def get():
+        """
+        This method is called when GET request is sent to "/api/v1/system/cache" url.
+        :return:
+        The entity cache statistics (enabled, size, max_size, ttl, hits, misses,
+        evictions, invalidations) in json format, status code 200.
+        """
+        cache = get_entity_cache()
+        if cache is None:
+            return {'enabled': False}, 200
+        return {'enabled': True, **cache.stats()}, 200
+
+
+class PoolStatsApi(Resource):
+    """
+    This class defines the PoolStatsApi Resource, available at the
+    "/api/v1/system/pool" url
+    """
+
+    @staticmethod
+    def get():
+        """
+        This method is called when GET request is sent to "/api/v1/system/pool" url.
+        :return:
+        The database connection pool class and, for a timed pool, its size, checked in,
+        checked out and overflow connections and the checkout wait statistics
+        (count, mean, max and histogram) in json format, status code 200.
+        """
+        return get_pool_stats(), 200
+
+
+class ReplicaStatsApi(Resource):
+    """
+    This class defines the ReplicaStatsApi Resource, available at the
+    "/api/v1/system/replicas" url
+    """
+
+    @staticmethod
+    def get():
+        """
+        This method is called when GET request is sent to "/api/v1/system/replicas" url.
+        :return:
+        The replica binds and, if the SQLite copier runs, the number of copies and
+        the seconds since the last one in json format, status code 200.
+        """
+        return get_replica_stats(), 200
@@ -3,3 +3,4 @@ Module defines department and employee services.
 """
 from department_app.service.department_service import DepartmentServices
 from department_app.service.employee_service import EmployeeServices
+from department_app.service.stats_service import StatsServices
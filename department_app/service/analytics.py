@@ -0,0 +1,624 @@
+# pylint: disable=E1101
+"""
+Module contains an optional analytics engine keeping a columnar in-memory
+snapshot of employees in NumPy arrays, so aggregates run vectorized instead
+of materializing one ORM object per row.
+
+The engine is enabled with the "ANALYTICS_SNAPSHOT" configuration option and
+requires NumPy to be installed. The snapshot is refreshed incrementally: rows
+changed by committed transactions are counted and reloaded on the next read.
+Writes made by other processes become visible after "ANALYTICS_SNAPSHOT_MAX_AGE"
+seconds, when the snapshot is fully reloaded.
+
+Functions:
+    years_before(day, years)
+    day_number(day)
+    bucket_lowers(minimum, maximum, bucket_width, max_buckets)
+    get_snapshot()
+"""
+import threading
+import time
+from collections import namedtuple
+from datetime import date
+from functools import partial
+from operator import itemgetter
+
+from flask import current_app, has_app_context
+
+from department_app.models import db, Employee
+from department_app.models.sharding import gather, scatter
+from department_app.models.tracking import subscribe
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+Columns = namedtuple('Columns', ['ids', 'department_ids', 'salaries', 'birth_days'])
+
+# A snapshot generation: the rows as Columns sorted by department and salary, the
+# departments with the start, size and salary sum of their rows, the sorted
+# salaries and dates of birth, and the dates of birth sorted by department
+_Layout = namedtuple('_Layout', [
+    'columns', 'departments', 'starts', 'counts', 'sums',
+    'salaries', 'birth_days', 'department_birth_days'
+])
+
+# Number of removed and inserted elements up to which arrays are spliced by slices
+SPLICE_LIMIT = 1000
+
+
+def years_before(day, years):
+    """
+    Get the date the given number of years before a day. February 29 maps to
+    February 28 in non-leap years.
+    :param day: date object to count back from.
+    :param years: Number of years (int).
+    :return: date object.
+    """
+    try:
+        return day.replace(year=day.year - years)
+    except ValueError:
+        return day.replace(year=day.year - years, day=28)
+
+
+def day_number(day):
+    """
+    Convert a date to the number of days since 1970-01-01.
+    :param day: date object.
+    :return: int.
+    """
+    return day.toordinal() - EPOCH_ORDINAL
+
+
+def bucket_lowers(minimum, maximum, bucket_width, max_buckets=1000):
+    """
+    Get the lower bounds of the fixed-width histogram buckets of a range of values.
+    :param minimum: The lowest value (int).
+    :param maximum: The highest value (int).
+    :param bucket_width: Width of every bucket (int > 0).
+    :param max_buckets: Maximal number of buckets.
+    :return: A range of lower bounds, from the bucket of minimum to the bucket of maximum.
+    :raise ValueError: if there would be more than max_buckets buckets.
+    """
+    lowers = range(minimum - minimum % bucket_width, maximum + 1, bucket_width)
+    if len(lowers) > max_buckets:
+        raise ValueError(
+            f'Bucket width {bucket_width} makes more than {max_buckets} histogram buckets'
+        )
+    return lowers
+
+
+def _by_department(department_ids, values):
+    """
+    Get the order sorting rows by department, then value.
+    :param department_ids: NumPy int32 array.
+    :param values: NumPy int32 array.
+    :return: NumPy array of indices.
+    """
+    return np.argsort(
+        (department_ids.astype(np.int64) << 32) + values.astype(np.int64) + 2 ** 31
+    )
+
+
+def _splice(array, removed, positions, values):
+    """
+    Copy an array without the elements at some indices and with values inserted
+    before others. Few changes are copied slice by slice in one pass.
+    :param array: NumPy array.
+    :param removed: Ascending indices of the elements to remove.
+    :param positions: Ascending indices of the elements the values are inserted
+    before, len(array) to append.
+    :param values: NumPy array of the inserted values, in the order of positions.
+    :return: A new NumPy array.
+    """
+    values = values.astype(array.dtype)
+    if len(removed) + len(positions) > SPLICE_LIMIT:
+        return np.insert(np.delete(array, removed),
+                         positions - np.searchsorted(removed, positions), values)
+    events = sorted([*((int(position), 0, index) for index, position in enumerate(positions)),
+                     *((int(index), 1, 0) for index in removed)])
+    pieces, start = [], 0
+    for index, remove, value in events:
+        pieces.append(array[start:index])
+        if remove:
+            start = index + 1
+        else:
+            pieces.append(values[value:value + 1])
+            start = index
+    pieces.append(array[start:])
+    return np.concatenate(pieces)
+
+
+def _positions(array, starts, counts, values):
+    """
+    Find values in sorted ranges of an array.
+    :param array: NumPy array, sorted within every range.
+    :param starts: NumPy array of the start of the range of every value.
+    :param counts: NumPy array of the size of the range of every value.
+    :param values: NumPy array of values.
+    :return: NumPy int64 array of the leftmost position of every value in its range.
+    """
+    # Values of the dtype of the array, so the ranges are searched without a cast
+    return np.fromiter(
+        (start + np.searchsorted(array[start:start + count], value) for start, count, value
+         in zip(starts.tolist(), counts.tolist(), values.astype(array.dtype))),
+        dtype=np.int64, count=len(values)
+    )
+
+
+def _resplice(array, removed_ranges, added_ranges, removed, added):
+    """
+    Remove values from sorted ranges of an array and insert others into their
+    ranges without sorting again.
+    :param array: NumPy array, sorted within every range.
+    :param removed_ranges: A tuple of NumPy arrays (starts, sizes, groups) of the
+    ranges of the removed values; empty ranges starting at the same position
+    are ordered by group.
+    :param added_ranges: The same tuple for the added values.
+    :param removed: NumPy array of values held by the array.
+    :param added: NumPy array of values.
+    :return: A new NumPy array.
+    """
+    starts, counts, groups = removed_ranges
+    order = np.lexsort((removed, groups, starts))
+    removed_at = _positions(array, starts[order], counts[order], removed[order])
+    # Equal removed values of a range remove consecutive elements
+    removed_at += np.arange(len(removed_at)) - np.searchsorted(removed_at, removed_at)
+    starts, counts, groups = added_ranges
+    order = np.lexsort((added, groups, starts))
+    added_at = _positions(array, starts[order], counts[order], added[order])
+    return _splice(array, removed_at, added_at, added[order])
+
+
+class EmployeeSnapshot:
+    """
+    Columnar snapshot of the employees table: int32 ids, department ids, salaries
+    and dates of birth as day numbers, sorted by department and salary, so the
+    salaries of a department are a sorted slice. The sorted salaries and dates of
+    birth, and the dates of birth sorted by department, take 12 more bytes: 28
+    bytes per employee. Incremental refreshes copy every array once, removing
+    the changed rows and inserting their current state in place, without sorting.
+    """
+
+    def __init__(self, max_age=300, full_reload_ratio=0.1):
+        """
+        Initiate an empty snapshot.
+        :param max_age: Seconds after which the snapshot is fully reloaded.
+        :param full_reload_ratio: Share of changed rows from which a full reload
+        is cheaper than an incremental one.
+        """
+        self.max_age = max_age
+        self.full_reload_ratio = full_reload_ratio
+        self.loaded_at = 0
+        self.change_counter = 0
+        self.refreshed_counter = 0
+        self._dirty_ids = set()
+        self._layout = None
+        self._lock = threading.RLock()
+
+    @property
+    def columns(self):
+        """The Columns of the snapshot sorted by department and salary, None if not loaded."""
+        return None if self._layout is None else self._layout.columns
+
+    @property
+    def nbytes(self):
+        """Number of bytes taken by the arrays of the snapshot."""
+        if self._layout is None:
+            return 0
+        return sum(column.nbytes for column in self._layout.columns) + sum(
+            array.nbytes for array in self._layout[1:]
+        )
+
+    @staticmethod
+    def _to_columns(rows):
+        """
+        Convert (id_, department_id, salary, date_of_birth) rows to columns.
+        :param rows: A list of row tuples.
+        :return: A Columns instance.
+        """
+        count = len(rows)
+        columns = Columns(*(np.empty(count, dtype=np.int32) for _ in Columns._fields))
+        if count:
+            ids, department_ids, salaries, births = zip(*rows)
+            columns.ids[:] = ids
+            columns.department_ids[:] = department_ids
+            columns.salaries[:] = salaries
+            columns.birth_days[:] = [day_number(birth) for birth in births]
+        return columns
+
+    @staticmethod
+    def _build(columns):
+        """
+        Sort columns and derive the sorted views of a snapshot generation.
+        :param columns: A Columns instance in any order.
+        :return: A _Layout instance.
+        """
+        order = _by_department(columns.department_ids, columns.salaries)
+        columns = Columns(*(column[order] for column in columns))
+        departments, starts, counts = np.unique(
+            columns.department_ids, return_index=True, return_counts=True
+        )
+        sums = np.add.reduceat(columns.salaries.astype(np.int64), starts) \
+            if len(starts) else np.zeros(0, dtype=np.int64)
+        department_birth_days = columns.birth_days[
+            _by_department(columns.department_ids, columns.birth_days)
+        ]
+        return _Layout(columns, departments, starts, counts, sums, np.sort(columns.salaries),
+                       np.sort(columns.birth_days), department_birth_days)
+
+    @staticmethod
+    def _query():
+        """Build the query selecting the snapshot columns."""
+        return db.session.query(
+            Employee.id_, Employee.department_id, Employee.salary, Employee.date_of_birth
+        )
+
+    def _fetch(self, ids):
+        """Load the snapshot columns of employees by id."""
+        return self._to_columns(
+            gather(lambda: self._query().filter(Employee.id_.in_(ids)).all())
+        )
+
+    def _page(self, after, limit):
+        """Load the snapshot columns of employees following an id."""
+        return self._query().filter(Employee.id_ > after).order_by(Employee.id_).limit(limit).all()
+
+    def count(self):
+        """
+        Count the employees, on all shards.
+        :return: int
+        """
+        return sum(scatter(lambda: self._query().count()))
+
+    def reload(self, chunk_size, progress=None):
+        """
+        Fully reload the snapshot with one query per chunk of employees, so no
+        query runs for long. Rows changed meanwhile are reloaded on the next read.
+        :param chunk_size: Number of employees per query.
+        :param progress: Callable called with the number of employees of every chunk.
+        :return: The number of employees loaded.
+        """
+        since = self.change_counter
+        rows = []
+        while True:
+            after = rows[-1][0] if rows else 0
+            chunk = gather(partial(self._page, after, chunk_size),
+                           key=itemgetter(0), limit=chunk_size)
+            if not chunk:
+                break
+            rows.extend(chunk)
+            if progress is not None:
+                progress(len(chunk))
+        self.load(self._to_columns(rows), since=since)
+        return len(rows)
+
+    def mark_dirty(self, ids):
+        """
+        Register committed changes of employees and bump the change counter.
+        :param ids: Iterable of changed employee ids.
+        :return: None
+        """
+        with self._lock:
+            self._dirty_ids.update(ids)
+            self.change_counter += 1
+
+    def invalidate(self):
+        """Force a full reload on the next read, e.g. after bulk statements."""
+        with self._lock:
+            self.loaded_at = 0
+
+    def load(self, columns, since=None):
+        """
+        Replace the snapshot contents with prepared columns.
+        :param columns: A Columns instance in any order.
+        :param since: The change counter when the columns started to be read, None if
+        they are up to date. Rows changed since are reloaded on the next read.
+        :return: None
+        """
+        layout = self._build(columns)
+        with self._lock:
+            self._layout = layout
+            self.loaded_at = time.monotonic()
+            if since is None:
+                self._dirty_ids.clear()
+                self.refreshed_counter = self.change_counter
+            else:
+                self.refreshed_counter = since
+
+    def refresh(self):
+        """
+        Bring the snapshot up to date: reload only changed rows if the change counter
+        moved, or everything if the snapshot is empty, too old or mostly changed.
+        :return: The up-to-date Columns.
+        """
+        return self._current().columns
+
+    def _current(self):
+        """
+        Bring the snapshot up to date (see refresh).
+        :return: The up-to-date _Layout.
+        """
+        with self._lock:
+            expired = time.monotonic() - self.loaded_at > self.max_age
+            if self._layout is not None and not expired:
+                if self.refreshed_counter == self.change_counter:
+                    return self._layout
+                dirty = self._dirty_ids
+                if len(dirty) <= len(self._layout.columns.ids) * self.full_reload_ratio:
+                    self._dirty_ids = set()
+                    self.refreshed_counter = self.change_counter
+                    self._layout = self._merge(self._layout, dirty)
+                    return self._layout
+            counter = self.change_counter
+            self._layout = self._build(self._to_columns(gather(lambda: self._query().all())))
+            self.loaded_at = time.monotonic()
+            self._dirty_ids.clear()
+            self.refreshed_counter = counter
+            return self._layout
+
+    @staticmethod
+    def _ranges(layout, department_ids):
+        """
+        Get the ranges of departments in the rows of a layout.
+        :param layout: A _Layout instance.
+        :param department_ids: NumPy array of department ids.
+        :return: A tuple of NumPy arrays (starts, sizes, department ids); the range
+        of a department without rows is empty, where its rows would start.
+        """
+        index = np.searchsorted(layout.departments, department_ids)
+        present = np.zeros(len(index), dtype=bool)
+        inside = index < len(layout.departments)
+        present[inside] = layout.departments[index[inside]] == department_ids[inside]
+        starts = np.append(layout.starts, len(layout.columns.ids))[index]
+        counts = np.where(present, np.append(layout.counts, 0)[index], 0)
+        return starts, counts, department_ids
+
+    def _merge(self, layout, dirty):
+        """
+        Replace the rows with the given ids by their current DB state.
+        :param layout: Current _Layout.
+        :param dirty: A set of changed ids.
+        :return: New _Layout.
+        """
+        dirty = np.asarray(sorted(dirty), dtype=np.int32)
+        added = self._fetch(dirty.tolist())
+        columns = layout.columns
+        stale = np.flatnonzero(np.isin(columns.ids, dirty))
+        removed = Columns(*(column[stale] for column in columns))
+        added_ranges = self._ranges(layout, added.department_ids)
+        order = np.lexsort((added.salaries, added.department_ids, added_ranges[0]))
+        positions = _positions(columns.salaries, added_ranges[0][order],
+                               added_ranges[1][order], added.salaries[order])
+        merged = Columns(*(_splice(column, stale, positions, new[order])
+                           for column, new in zip(columns, added)))
+        department_birth_days = _resplice(
+            layout.department_birth_days, self._ranges(layout, removed.department_ids),
+            added_ranges, removed.birth_days, added.birth_days
+        )
+        everything = [
+            (np.zeros(len(rows.ids), np.int64), np.full(len(rows.ids), len(columns.ids)),
+             np.zeros(len(rows.ids), np.int64)) for rows in (removed, added)
+        ]
+        departments = np.union1d(layout.departments, added.department_ids)
+        counts = np.zeros(len(departments), dtype=np.int64)
+        sums = np.zeros(len(departments), dtype=np.int64)
+        index = np.searchsorted(departments, layout.departments)
+        counts[index], sums[index] = layout.counts, layout.sums
+        for rows, sign in ((removed, -1), (added, 1)):
+            index = np.searchsorted(departments, rows.department_ids)
+            np.add.at(counts, index, sign)
+            np.add.at(sums, index, sign * rows.salaries.astype(np.int64))
+        kept = counts > 0
+        counts = counts[kept]
+        return _Layout(
+            merged, departments[kept], np.cumsum(counts) - counts, counts, sums[kept],
+            _resplice(layout.salaries, *everything, removed.salaries, added.salaries),
+            _resplice(layout.birth_days, *everything, removed.birth_days, added.birth_days),
+            department_birth_days
+        )
+
+    def _department(self, dep_id):
+        """
+        Get the up-to-date layout with the range of a department.
+        :param dep_id: Id of the department or None for all employees.
+        :return: A tuple (_Layout, index of the department or None, start, end).
+        """
+        layout = self._current()
+        if dep_id is None:
+            return layout, None, 0, len(layout.columns.ids)
+        index = int(np.searchsorted(layout.departments, int(dep_id)))
+        if index < len(layout.departments) and layout.departments[index] == int(dep_id):
+            start = int(layout.starts[index])
+            return layout, index, start, start + int(layout.counts[index])
+        return layout, None, 0, 0
+
+    @staticmethod
+    def _percentile(ordered, percentile):
+        """
+        Compute a percentile of sorted values with linear interpolation between the
+        closest ranks, exactly as StatsServices does on the DB.
+        :param ordered: Sorted NumPy array (not empty).
+        :param percentile: The percentile to compute (0 <= percentile <= 100).
+        :return: The percentile value.
+        """
+        rank = percentile / 100 * (len(ordered) - 1)
+        lower = int(rank)
+        value = int(ordered[lower])
+        if lower + 1 < len(ordered) and rank > lower:
+            value += (int(ordered[lower + 1]) - value) * (rank - lower)
+        return round(value, 2)
+
+    def headcount(self):
+        """
+        Count employees per department.
+        :return: A dict {department id: number of employees}.
+        """
+        layout = self._current()
+        return dict(zip(layout.departments.tolist(), layout.counts.tolist()))
+
+    def department_stats(self, percentiles=(50, 90)):
+        """
+        Compute headcount, average salary and salary percentiles for every department
+        at once over department-sorted salaries.
+        :param percentiles: Iterable of percentiles to compute (0 <= p <= 100).
+        :return: A dict {department id: dict with headcount, avg_salary, percentiles}.
+        """
+        layout = self._current()
+        keys, starts, counts = layout.departments, layout.starts, layout.counts
+        salaries = layout.columns.salaries
+        result = {
+            key: {'headcount': count, 'avg_salary': round(total / count, 2), 'percentiles': {}}
+            for key, count, total in zip(keys.tolist(), counts.tolist(), layout.sums.tolist())
+        }
+        for percentile in percentiles:
+            rank = percentile / 100 * (counts - 1)
+            lower = np.floor(rank).astype(np.int64)
+            upper = np.minimum(lower + 1, counts - 1)
+            lower_salaries = salaries[starts + lower].astype(np.float64)
+            values = lower_salaries + (
+                salaries[starts + upper] - lower_salaries
+            ) * (rank - lower)
+            for key, value in zip(keys.tolist(), values.tolist()):
+                result[key]['percentiles'][f'p{percentile:g}'] = round(value, 2)
+        return result
+
+    def salary_stats(self, dep_id=None, percentiles=(50, 90), bucket_width=None, edges=None,
+                     max_buckets=1000):
+        """
+        Compute the same salary statistics as StatsServices.get_salary_stats.
+        Bucket counts are binary searches of the bucket bounds in sorted salaries.
+        :param dep_id: Id of the department (int) or None for all employees.
+        :param percentiles: Iterable of percentiles to compute (0 <= p <= 100).
+        :param bucket_width: Width of fixed-width histogram buckets (int > 0).
+        :param edges: Ascending list of custom histogram edges.
+        :param max_buckets: Maximal number of fixed-width histogram buckets.
+        :return: A dict with count, mean, min, max, percentiles and histogram.
+        :raise ValueError: if bucket_width makes more than max_buckets buckets.
+        """
+        layout, index, start, end = self._department(dep_id)
+        if dep_id is None:
+            salaries, total = layout.salaries, int(layout.sums.sum())
+        else:
+            salaries = layout.columns.salaries[start:end]
+            total = 0 if index is None else int(layout.sums[index])
+        count = len(salaries)
+        stats = {
+            'count': count,
+            'mean': round(total / count, 2) if count else None,
+            'min': int(salaries[0]) if count else None,
+            'max': int(salaries[-1]) if count else None,
+            'percentiles': {
+                f'p{percentile:g}': self._percentile(salaries, percentile) if count else None
+                for percentile in percentiles
+            },
+            'histogram': [],
+        }
+        if count and edges:
+            below = [0, *np.searchsorted(salaries, edges, side='left').tolist(), count]
+            bounds = [None, *edges, None]
+            stats['histogram'] = [
+                {'min': bounds[index], 'max': bounds[index + 1],
+                 'count': below[index + 1] - below[index]}
+                for index in range(len(bounds) - 1)
+                if 0 < index < len(edges) or below[index + 1] - below[index]
+            ]
+        elif count and bucket_width:
+            lowers = list(bucket_lowers(stats['min'], stats['max'], bucket_width, max_buckets))
+            below = np.searchsorted(
+                salaries, [*lowers, lowers[-1] + bucket_width], side='left'
+            ).tolist()
+            stats['histogram'] = [
+                {'min': lower, 'max': lower + bucket_width, 'count': below[index + 1] - below[index]}
+                for index, lower in enumerate(lowers)
+            ]
+        return stats
+
+    def _birth_days(self, dep_id=None):
+        """
+        Get sorted dates of birth as day numbers.
+        :param dep_id: Id of the department or None for all employees.
+        :return: A sorted NumPy array.
+        """
+        layout, _, start, end = self._department(dep_id)
+        if dep_id is None:
+            return layout.birth_days
+        return layout.department_birth_days[start:end]
+
+    def birth_summary(self, dep_id=None):
+        """
+        Get the headcount and the range and mean of dates of birth.
+        :param dep_id: Id of the department or None for all employees.
+        :return: A tuple (headcount, latest date of birth, earliest date of birth,
+        mean date of birth as day number); dates are None if there are no employees.
+        """
+        births = self._birth_days(dep_id)
+        if not len(births):  # pylint: disable=C1802
+            return 0, None, None, None
+        return (
+            len(births),
+            date.fromordinal(int(births[-1]) + EPOCH_ORDINAL),
+            date.fromordinal(int(births[0]) + EPOCH_ORDINAL),
+            float(births.mean(dtype=np.float64)),
+        )
+
+    def age_bands(self, as_of, ages, dep_id=None):
+        """
+        Count employees in age bands at a given date. Ages are converted to
+        date-of-birth bounds once, then each band is a binary search in sorted
+        day numbers.
+        :param as_of: date object the ages are computed at.
+        :param ages: Ascending list of band edges in years, e.g. [20, 30, 40].
+        :param dep_id: Id of the department or None for all employees.
+        :return: A list of counts: younger than ages[0], [ages[0], ages[1]), ...,
+        ages[-1] and older.
+        """
+        births = self._birth_days(dep_id)
+        not_younger = np.searchsorted(
+            births, [day_number(years_before(as_of, age)) for age in ages], side='right'
+        ).tolist()
+        counts = [len(births), *not_younger, 0]
+        return [counts[index] - counts[index + 1] for index in range(len(ages) + 1)]
+
+
+class AnalyticsEngine:
+    """
+    Flask extension owning an EmployeeSnapshot per application.
+    """
+
+    def init_app(self, app):
+        """
+        Create the snapshot for the app if "ANALYTICS_SNAPSHOT" is enabled
+        and NumPy is available.
+        :param app: Flask application instance.
+        :return: None
+        """
+        if not app.config.get('ANALYTICS_SNAPSHOT') or np is None:
+            return
+        app.extensions['analytics'] = EmployeeSnapshot(
+            max_age=app.config.get('ANALYTICS_SNAPSHOT_MAX_AGE', 300)
+        )
+        subscribe(_on_commit)
+
+
+def get_snapshot():
+    """
+    Get the employee snapshot of the current app.
+    :return: An EmployeeSnapshot, None if the analytics engine is disabled.
+    """
+    if not has_app_context():
+        return None
+    return current_app.extensions.get('analytics')
+
+
+def _on_commit(changes):
+    """Mark employees changed by a committed transaction in the current app's snapshot."""
+    snapshot = get_snapshot()
+    if snapshot is not None and changes.get(Employee):
+        snapshot.mark_dirty(changes[Employee])
+
+
+analytics = AnalyticsEngine()
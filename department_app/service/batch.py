@@ -0,0 +1,37 @@
+"""
+Module contains helpers to fetch many rows by primary key in few queries.
+
+Functions:
+    chunks(items, size)
+    get_by_ids(query, column, ids)
+"""
+
+# Bound parameters per IN query, below the SQLite default limit of 999
+ID_CHUNK_SIZE = 500
+
+
+def chunks(items, size=ID_CHUNK_SIZE):
+    """
+    Split a list into consecutive chunks.
+    :param items: A list.
+    :param size: Maximal length of a chunk (int).
+    :return: A generator of lists.
+    """
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def get_by_ids(query, column, ids):
+    """
+    Fetch rows by ids with one IN query per chunk of ids.
+    :param query: A Query to fetch the rows with.
+    :param column: The primary key column to filter on.
+    :param ids: A list of ids (int), duplicates are ignored.
+    :return: A tuple (list of found rows in the order of ids, list of missing ids).
+    """
+    ids = list(dict.fromkeys(ids))
+    found = {}
+    for chunk in chunks(ids, ID_CHUNK_SIZE):
+        for row in query.filter(column.in_(chunk)):
+            found[getattr(row, column.key)] = row
+    return [found[id_] for id_ in ids if id_ in found], [id_ for id_ in ids if id_ not in found]
@@ -0,0 +1,236 @@
+"""
+Module contains a read-through cache of departments and employees looked up
+by id, in front of the database.
+
+Entries are detached, immutable records (not ORM instances), so they can be
+shared between requests and threads. Ids which do not exist are cached too,
+so repeated 404 checks do not reach the database. The cache is bounded by
+"ENTITY_CACHE_SIZE" entries of the configured cache backend, every entry
+expires after "ENTITY_CACHE_TTL" seconds. Rows changed by committed
+transactions are invalidated through the tracking events of the models.
+
+Functions:
+    record_key(model, primary_key)
+    get_entity_cache()
+    get_record(model, primary_key, load)
+"""
+import threading
+from dataclasses import dataclass, fields
+from datetime import date
+
+from flask import current_app, has_app_context
+
+from department_app.models import Department, Employee
+from department_app.models.replicas import primary
+from department_app.models.tracking import subscribe
+from department_app.service.cache_backends import ABSENT, DATA_VERSION, create_backend
+
+
+@dataclass(frozen=True)
+class DepartmentRecord:
+    """Immutable snapshot of a department row."""
+    id_: int
+    title: str
+    version: int
+
+    @property
+    def employees(self):
+        """Employees of the department, loaded from the database on access."""
+        from department_app.service.employee_service import EmployeeServices  # pylint: disable=C0415
+        return EmployeeServices.get_all_from_department(self.id_)
+
+
+@dataclass(frozen=True)
+class EmployeeRecord:
+    """Immutable snapshot of an employee row."""
+    id_: int
+    full_name: str
+    date_of_birth: date
+    salary: int
+    department_id: int
+    version: int
+
+    @property
+    def department(self):
+        """The department record of the employee, looked up through the cache."""
+        from department_app.service.department_service import DepartmentServices  # pylint: disable=C0415
+        return DepartmentServices.get_cached(self.department_id)
+
+
+RECORDS = {
+    Department: DepartmentRecord,
+    Employee: EmployeeRecord,
+}
+# Part of the cache keys, changed with the fields of the records so records
+# pickled by older code in a shared backend are not read
+RECORD_FORMAT = 2
+
+
+def record_key(model, primary_key):
+    """
+    Get the cache key of a row.
+    :param model: The model class.
+    :param primary_key: The primary key of the row.
+    :return: str
+    """
+    return f'{model.__name__}:{RECORD_FORMAT}:{primary_key}'
+
+
+def to_record(instance):
+    """
+    Make the immutable record of a model instance.
+    :param instance: A Department or Employee instance.
+    :return: A DepartmentRecord or EmployeeRecord.
+    """
+    record_class = RECORDS[type(instance)]
+    return record_class(**{field.name: getattr(instance, field.name)
+                           for field in fields(record_class)})
+
+
+class EntityCache:
+    """
+    Cache of records in a backend, with hit/miss/invalidation counters of the process.
+    """
+
+    def __init__(self, backend, versions, ttl):
+        self.backend = backend
+        self.versions = versions
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self.counters = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+    @property
+    def generation(self):
+        """
+        The data version, changed by every commit, so loads racing with a commit
+        are not cached.
+        """
+        return self.versions.get_version(DATA_VERSION)
+
+    def _count(self, counter, value=1):
+        """Increment a counter."""
+        with self._lock:
+            self.counters[counter] += value
+
+    def get(self, key):
+        """
+        Get a cached value.
+        :param key: The key (str).
+        :return: The value (None for cached missing rows) or ABSENT if the key
+        is not cached or expired.
+        """
+        value = self.backend.get(key)
+        self._count('misses' if value is ABSENT else 'hits')
+        return value
+
+    def set(self, key, value, generation):
+        """
+        Cache a value, unless the data changed since the value was loaded.
+        :param key: The key (str).
+        :param value: The value.
+        :param generation: The generation read before loading the value.
+        :return: None
+        """
+        if generation == self.generation:
+            self.backend.set(key, value, self.ttl)
+
+    def invalidate(self, keys):
+        """
+        Drop cached values.
+        :param keys: Iterable of keys.
+        :return: None
+        """
+        self._count('invalidations', self.backend.delete(keys))
+
+    def clear(self):
+        """
+        Drop all cached values.
+        :return: None
+        """
+        self.backend.clear()
+
+    def stats(self):
+        """
+        Get the cache statistics.
+        :return: A dict with backend, size, max_size, ttl, hits, misses, evictions and
+        invalidations. Counters are of the current process.
+        """
+        with self._lock:
+            counters = dict(self.counters)
+        return {'backend': self.backend.name, 'size': self.backend.size(),
+                'max_size': self.backend.max_size, 'ttl': self.ttl,
+                'evictions': self.backend.evictions, **counters}
+
+
+class EntityCaching:
+    """
+    Flask extension owning an EntityCache per application.
+    """
+
+    def init_app(self, app):
+        """
+        Create the cache for the app if "ENTITY_CACHE_SIZE" is positive.
+        :param app: Flask application instance.
+        :return: None
+        """
+        if app.config.get('ENTITY_CACHE_SIZE', 0) <= 0:
+            return
+        app.extensions['entity_cache'] = EntityCache(
+            create_backend(app, 'entities', app.config['ENTITY_CACHE_SIZE']),
+            app.extensions['cache_versions'],
+            app.config.get('ENTITY_CACHE_TTL', 60)
+        )
+        subscribe(_on_commit)
+
+
+def get_entity_cache():
+    """
+    Get the entity cache of the current app.
+    :return: An EntityCache, None if the cache is disabled.
+    """
+    if not has_app_context():
+        return None
+    return current_app.extensions.get('entity_cache')
+
+
+def get_record(model, primary_key, load):
+    """
+    Get the record of a row through the cache of the current app.
+    :param model: The model class.
+    :param primary_key: The primary key of the row.
+    :param load: Callable loading the model instance by primary key, returning None if
+    there is no such row. Called on cache misses or if the cache is disabled.
+    :return: A record, None if there is no such row.
+    """
+    try:
+        primary_key = int(primary_key)
+    except (TypeError, ValueError):
+        return None
+    cache = get_entity_cache()
+    if cache is None:
+        instance = load(primary_key)
+        return None if instance is None else to_record(instance)
+    key = record_key(model, primary_key)
+    record = cache.get(key)
+    if record is ABSENT:
+        generation = cache.generation
+        # A lagging replica could put rows older than the generation in the cache
+        with primary():
+            instance = load(primary_key)
+        record = None if instance is None else to_record(instance)
+        cache.set(key, record, generation)
+    return record
+
+
+def _on_commit(changes):
+    """Invalidate rows changed by a committed transaction in the current app's cache."""
+    cache = get_entity_cache()
+    if cache is not None:
+        cache.invalidate(
+            record_key(model, primary_key)
+            for model, primary_keys in changes.items() if model in RECORDS
+            for primary_key in primary_keys
+        )
+
+
+entity_cache = EntityCaching()
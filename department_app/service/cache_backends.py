@@ -0,0 +1,354 @@
+"""
+Module contains the storage backends of the application caches and the shared
+data version.
+
+Every cache (entity records, compressed bodies) stores its entries in its own
+namespace of a backend, selected with the "CACHE_BACKEND" configuration option:
+    memory - an LRU dict of the process, every worker has its own copy;
+    sqlite - a SQLite file ("CACHE_SQLITE_PATH") shared by all workers of
+             the host, entries are evicted oldest first. By default the file
+             is in the instance folder and named after the database URI, so
+             apps of other deployments or databases never share it.
+
+Writes invalidate the entries of a memory backend in their own process only,
+so the entity cache ("ENTITY_CACHE_SIZE") needs the sqlite backend when more
+than one worker runs.
+
+The data version is a counter in the same backend, incremented after every
+commit which changed rows. Values loaded from the database are cached only if
+the data version did not change during the load, so workers sharing a backend
+agree on the data after a write.
+
+Functions:
+    default_sqlite_path(app)
+    create_backend(app, namespace, max_size)
+    get_data_version()
+"""
+import hashlib
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, has_app_context
+from sqlalchemy.engine.url import make_url
+
+from department_app.models.tracking import subscribe
+
+# Returned by Backend.get for keys which are not cached
+ABSENT = object()
+
+DATA_VERSION = 'data_version'
+
+
+class MemoryBackend:
+    """
+    Thread-safe LRU dict of the process with expiring entries.
+    """
+    name = 'memory'
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Get a cached value.
+        :param key: The key (str).
+        :return: The value or ABSENT if the key is not cached or expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return ABSENT
+            if entry[1] < time.monotonic():
+                del self._entries[key]
+                return ABSENT
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key, value, ttl=None):
+        """
+        Cache a value, evicting the least recently used ones above max_size.
+        :param key: The key (str).
+        :param value: The value.
+        :param ttl: Seconds before the value expires, None to keep it until evicted.
+        :return: None
+        """
+        expires = float('inf') if ttl is None else time.monotonic() + ttl
+        with self._lock:
+            self._entries[key] = (value, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, keys):
+        """
+        Drop cached values.
+        :param keys: Iterable of keys.
+        :return: Number of dropped values.
+        """
+        with self._lock:
+            return sum(self._entries.pop(key, None) is not None for key in keys)
+
+    def clear(self):
+        """
+        Drop all cached values.
+        :return: None
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def size(self):
+        """
+        Get the number of cached values.
+        :return: int
+        """
+        return len(self._entries)
+
+    def get_version(self, name):
+        """
+        Get a version counter.
+        :param name: Name of the counter.
+        :return: int, 0 if the counter was never incremented.
+        """
+        return self._versions.get(name, 0)
+
+    def incr_version(self, name):
+        """
+        Increment a version counter.
+        :param name: Name of the counter.
+        :return: The new value (int).
+        """
+        with self._lock:
+            self._versions[name] = self._versions.get(name, 0) + 1
+            return self._versions[name]
+
+
+class SQLiteBackend:
+    """
+    Cache namespace in a SQLite file shared by the processes of the host.
+    Values are pickled. Every thread uses its own connection, the file is in WAL
+    mode so reads are not blocked by writes of other processes.
+    """
+    name = 'sqlite'
+    # Number of writes between checks of the namespace size
+    EVICTION_INTERVAL = 64
+
+    def __init__(self, path, namespace, max_size):
+        self.path = path
+        self.namespace = namespace
+        self.max_size = max_size
+        self.evictions = 0
+        self._writes = 0
+        self._local = threading.local()
+        connection = self._connection()
+        connection.execute('CREATE TABLE IF NOT EXISTS cache_entries ('
+                           'namespace TEXT, key TEXT, value BLOB, expires REAL, stored REAL, '
+                           'PRIMARY KEY (namespace, key))')
+        connection.execute('CREATE INDEX IF NOT EXISTS ix_cache_entries_stored '
+                           'ON cache_entries (namespace, stored)')
+        connection.execute('CREATE TABLE IF NOT EXISTS cache_versions ('
+                           'name TEXT PRIMARY KEY, value INTEGER NOT NULL)')
+
+    def _connection(self):
+        """
+        Get the connection of the current thread.
+        :return: sqlite3.Connection in autocommit mode.
+        """
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None,
+                                         check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+        return connection
+
+    def get(self, key):
+        """
+        Get a cached value.
+        :param key: The key (str).
+        :return: The value or ABSENT if the key is not cached or expired.
+        """
+        row = self._connection().execute(
+            'SELECT value, expires FROM cache_entries WHERE namespace = ? AND key = ?',
+            (self.namespace, key)
+        ).fetchone()
+        if row is None or (row[1] is not None and row[1] < time.time()):
+            return ABSENT
+        return pickle.loads(row[0])
+
+    def set(self, key, value, ttl=None):
+        """
+        Cache a value, evicting the oldest ones above max_size.
+        :param key: The key (str).
+        :param value: The value, it must be picklable.
+        :param ttl: Seconds before the value expires, None to keep it until evicted.
+        :return: None
+        """
+        now = time.time()
+        connection = self._connection()
+        connection.execute(
+            'INSERT OR REPLACE INTO cache_entries VALUES (?, ?, ?, ?, ?)',
+            (self.namespace, key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL),
+             None if ttl is None else now + ttl, now)
+        )
+        self._writes += 1
+        if self._writes % self.EVICTION_INTERVAL == 0 or self.max_size < self.EVICTION_INTERVAL:
+            self._evict(connection, now)
+
+    def _evict(self, connection, now):
+        """
+        Drop expired values and the oldest values above max_size.
+        :param connection: The connection of the current thread.
+        :param now: The current time.
+        :return: None
+        """
+        connection.execute('DELETE FROM cache_entries WHERE namespace = ? AND expires < ?',
+                           (self.namespace, now))
+        excess = self.size() - self.max_size
+        if excess > 0:
+            connection.execute(
+                'DELETE FROM cache_entries WHERE namespace = ? AND key IN ('
+                'SELECT key FROM cache_entries WHERE namespace = ? ORDER BY stored LIMIT ?)',
+                (self.namespace, self.namespace, excess)
+            )
+            self.evictions += excess
+
+    def delete(self, keys):
+        """
+        Drop cached values.
+        :param keys: Iterable of keys.
+        :return: Number of dropped values.
+        """
+        connection = self._connection()
+        before = connection.total_changes
+        connection.executemany('DELETE FROM cache_entries WHERE namespace = ? AND key = ?',
+                               [(self.namespace, key) for key in keys])
+        return connection.total_changes - before
+
+    def clear(self):
+        """
+        Drop all cached values of the namespace.
+        :return: None
+        """
+        self._connection().execute('DELETE FROM cache_entries WHERE namespace = ?',
+                                   (self.namespace,))
+
+    def size(self):
+        """
+        Get the number of cached values of the namespace.
+        :return: int
+        """
+        return self._connection().execute(
+            'SELECT COUNT(*) FROM cache_entries WHERE namespace = ?', (self.namespace,)
+        ).fetchone()[0]
+
+    def get_version(self, name):
+        """
+        Get a version counter shared by all processes.
+        :param name: Name of the counter.
+        :return: int, 0 if the counter was never incremented.
+        """
+        row = self._connection().execute(
+            'SELECT value FROM cache_versions WHERE name = ?', (name,)
+        ).fetchone()
+        return 0 if row is None else row[0]
+
+    def incr_version(self, name):
+        """
+        Increment a version counter shared by all processes.
+        :param name: Name of the counter.
+        :return: The new value (int).
+        """
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            connection.execute(
+                'INSERT INTO cache_versions VALUES (?, 1) '
+                'ON CONFLICT (name) DO UPDATE SET value = value + 1', (name,)
+            )
+            value = connection.execute(
+                'SELECT value FROM cache_versions WHERE name = ?', (name,)
+            ).fetchone()[0]
+        except sqlite3.Error:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+        return value
+
+
+def default_sqlite_path(app):
+    """
+    Get the default path of the SQLite cache file of an app: a file of the
+    instance folder named after the database URI. In-memory databases belong
+    to one process, so their file is named after the process too.
+    :param app: Flask application instance.
+    :return: The path (str).
+    """
+    uri = app.config['SQLALCHEMY_DATABASE_URI']
+    url = make_url(uri)
+    if url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:'):
+        uri = f'{uri}#{os.getpid()}'
+    os.makedirs(app.instance_path, exist_ok=True)
+    digest = hashlib.sha1(uri.encode()).hexdigest()[:16]
+    return os.path.join(app.instance_path, f'cache-{digest}.sqlite')
+
+
+def create_backend(app, namespace, max_size):
+    """
+    Create the backend of a cache namespace with the configured backend type.
+    :param app: Flask application instance.
+    :param namespace: Name of the cache (str).
+    :param max_size: Maximal number of entries.
+    :return: A MemoryBackend or SQLiteBackend.
+    :raise ValueError: if "CACHE_BACKEND" is unknown.
+    """
+    backend = app.config.get('CACHE_BACKEND', 'memory')
+    if backend == 'memory':
+        return MemoryBackend(max_size)
+    if backend == 'sqlite':
+        path = app.config.get('CACHE_SQLITE_PATH') or default_sqlite_path(app)
+        return SQLiteBackend(path, namespace, max_size)
+    raise ValueError(f'Unknown CACHE_BACKEND: {backend}')
+
+
+class CacheBackends:
+    """
+    Flask extension owning the backend of the data version of an application.
+    """
+
+    def init_app(self, app):
+        """
+        Create the backend holding the data version.
+        :param app: Flask application instance.
+        :return: None
+        """
+        app.extensions['cache_versions'] = create_backend(app, 'versions', 0)
+
+
+def get_data_version():
+    """
+    Get the data version of the current app.
+    :return: int
+    """
+    return current_app.extensions['cache_versions'].get_version(DATA_VERSION)
+
+
+# Subscribed at import, before the caches, so the data version is incremented
+# before any cache entry is invalidated by the same commit
+@subscribe
+def _on_commit(changes):  # pylint: disable=W0613
+    """Increment the data version of the current app after a commit which changed rows."""
+    if has_app_context() and 'cache_versions' in current_app.extensions:
+        current_app.extensions['cache_versions'].incr_version(DATA_VERSION)
+
+
+cache_backends = CacheBackends()
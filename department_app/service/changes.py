@@ -0,0 +1,90 @@
+"""
+Module contains the change feed of departments and employees.
+
+Every transaction committing changes of departments or employees logs them
+in the changes table (see department_app.models.changelog). Clients keep the
+id of the last change they read as their cursor and read the changes after
+it, so they only fetch the departments and employees which changed (inserts
+and updates, e.g. with ?ids=) and drop the deleted ones (tombstones).
+
+Changes older than "CHANGE_LOG_RETENTION" seconds are pruned by the
+"prune-changes" job, except the last one, so the ids keep increasing and an
+empty log never passes for an unchanged one. A client whose cursor is before
+the oldest retained change, or after the last one (e.g. a restored
+database), missed changes: it has to fetch the full lists again.
+
+The feed is always read from the primary database: a replica lagging behind
+the database which gave a client its cursor would see the cursor after its
+last change and send the client to a needless resync.
+
+Functions:
+    get_changes(since, limit)
+    prune_changes(retention, chunk_size, progress)
+"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, func, select
+
+from department_app.models import db, Change
+from department_app.models import changelog  # pylint: disable=W0611
+from department_app.models.replicas import primary
+
+
+def get_changes(since=0, limit=100):
+    """
+    Get the changes after a cursor, oldest first, from the primary database.
+    :param since: The cursor, id of the last change the client read (0 for none).
+    :param limit: Maximal number of changes.
+    :return: A dict with the list of "changes", the cursor of the "next" call,
+    "more" (True if there are more changes after them) and "resync" (True if
+    changes after the cursor were pruned: the client has to fetch the full
+    lists, then read the changes after "next").
+    """
+    with primary():
+        oldest, last = db.session.execute(
+            select(func.min(Change.id_), func.max(Change.id_))
+        ).one()
+        if last is None:
+            resync = since > 0
+        else:
+            resync = since < oldest - 1 or since > last
+        if resync:
+            return {'changes': [], 'next': last or 0, 'more': False, 'resync': True}
+        changes = db.session.execute(
+            select(Change).where(Change.id_ > since).order_by(Change.id_).limit(limit + 1)
+        ).scalars().all()
+    more = len(changes) > limit
+    changes = changes[:limit]
+    return {
+        'changes': changes, 'next': changes[-1].id_ if changes else since,
+        'more': more, 'resync': False
+    }
+
+
+def prune_changes(retention, chunk_size=500, progress=None):
+    """
+    Delete the changes older than the retention, except the last change,
+    a chunk per transaction.
+    :param retention: Number of seconds changes are kept.
+    :param chunk_size: Number of changes deleted per transaction.
+    :param progress: Callable called with the number of changes deleted by
+    every transaction, or None.
+    :return: The number of deleted changes.
+    """
+    last = db.session.execute(select(func.max(Change.id_))).scalar()
+    if last is None:
+        return 0
+    criteria = (Change.changed_at < datetime.utcnow() - timedelta(seconds=retention),
+                Change.id_ < last)
+    deleted = 0
+    while True:
+        ids = db.session.execute(
+            select(Change.id_).where(*criteria).order_by(Change.id_).limit(chunk_size)
+        ).scalars().all()
+        if not ids:
+            return deleted
+        db.session.execute(delete(Change).where(Change.id_.in_(ids)))
+        db.session.commit()
+        deleted += len(ids)
+        if progress is not None:
+            progress(len(ids))
@@ -0,0 +1,31 @@
+"""
+Module contains helpers to load only the columns a client asked for.
+
+Functions:
+    load_only_options(model, fields)
+"""
+from sqlalchemy import inspect
+from sqlalchemy.orm import load_only
+
+
+def load_only_options(model, fields=None):
+    """
+    Build query options restricting loaded columns to the requested fields.
+    Relationships among the fields add their foreign key columns, other names
+    (computed fields) are ignored. The primary key and the version column are
+    always loaded.
+    :param model: The model class being queried.
+    :param fields: Iterable of requested field names, None for all columns.
+    :return: A list of query options.
+    """
+    if fields is None:
+        return []
+    mapper = inspect(model)
+    columns = {attr.key for attr in mapper.column_attrs}
+    names = [name for name in fields if name in columns]
+    if mapper.version_id_col is not None:
+        names.append(mapper.get_property_by_column(mapper.version_id_col).key)
+    for name in fields:
+        if name in mapper.relationships:
+            names.extend(column.key for column in mapper.relationships[name].local_columns)
+    return [load_only(*(getattr(model, name) for name in dict.fromkeys(names)))]
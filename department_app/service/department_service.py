@@ -1,26 +1,73 @@
 # pylint: disable=E1101
 """ Module contains Department Service class with methods for DB CRUD operations."""
-from department_app.models import db, Department
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.exc import StaleDataError
+
+from department_app.models import db, Department, Employee
+from department_app.models.replicas import read_only
+from department_app.service import batch, writes
+from department_app.service.cache import get_record
+from department_app.service.columns import load_only_options
 
 
 class DepartmentServices:
     """Class with methods for DB CRUD operation on departments."""
 
     @staticmethod
-    def get_all():
+    @read_only
+    def get_all(fields=None):
         """
         get_all returns a list with all Department objects from the DB.
+        :param fields: Names of the fields to load, all if None.
         """
-        return Department.query.all()
+        return Department.query.options(*load_only_options(Department, fields)).all()
 
     @staticmethod
-    def get_by_id(dep_id):
+    @read_only
+    def get_by_id(dep_id, fields=None):
         """
         Get a specific department by id from DB.
         :param dep_id: Id of the department to fetch (int)
+        :param fields: Names of the fields to load, all if None.
         :return: Department with id=dep_id, None if no such department.
         """
-        return Department.query.filter_by(id_=dep_id).first()
+        return Department.query.options(
+            *load_only_options(Department, fields)
+        ).filter_by(id_=dep_id).first()
+
+    @staticmethod
+    def get_cached(dep_id):
+        """
+        Get a read-only record of a department by id through the entity cache.
+        :param dep_id: Id of the department to fetch (int)
+        :return: DepartmentRecord with id=dep_id, None if no such department.
+        """
+        return get_record(Department, dep_id, DepartmentServices.get_by_id)
+
+    @staticmethod
+    def exists(dep_id):
+        """
+        Check if a department exists, through the entity cache.
+        :param dep_id: Id of the department (int)
+        :return: True if there is a department with id=dep_id.
+        """
+        return DepartmentServices.get_cached(dep_id) is not None
+
+    @staticmethod
+    @read_only
+    def get_by_ids(dep_ids, fields=None):
+        """
+        Get many departments by ids with one IN query per chunk of ids.
+        :param dep_ids: A list of department ids (int).
+        :param fields: Names of the fields to load, all if None.
+        :return: A tuple (list of departments in the order of dep_ids, list of missing ids).
+        """
+        return batch.get_by_ids(
+            Department.query.options(*load_only_options(Department, fields)),
+            Department.id_,
+            dep_ids
+        )
 
     @staticmethod
     def create(data):
@@ -48,6 +95,53 @@ class DepartmentServices:
         db.session.commit()
         return department
 
+    @staticmethod
+    def update_by_id(dep_id, data, version=None):
+        """
+        Update a department with one UPDATE statement, without loading it first.
+        :param dep_id: Id of the department (int or str).
+        :param data: A dict with data to update the department with.
+        :param version: The version of the department to update, None for any version.
+        :return: The updated department, None if no such department.
+        :raise IntegrityError: if the new title is not unique.
+        :raise StaleDataError: if the department is not at the given version.
+        """
+        dep_id = writes.parse_id(dep_id)
+        if dep_id is None:
+            return None
+        try:
+            found = writes.update_by_id(Department, dep_id, data, version)
+        except (IntegrityError, StaleDataError):
+            db.session.rollback()
+            raise
+        db.session.commit()
+        return DepartmentServices.get_by_id(dep_id) if found else None
+
+    @staticmethod
+    def delete_by_id(dep_id, version=None):
+        """
+        Delete a department and its employees with one DELETE statement per table,
+        without loading them first.
+        :param dep_id: Id of the department (int or str).
+        :param version: The version of the department to delete, None for any version.
+        :return: True if the department existed.
+        :raise StaleDataError: if the department is not at the given version.
+        """
+        dep_id = writes.parse_id(dep_id)
+        if dep_id is None:
+            return False
+        try:
+            writes.delete_where(Employee, Employee.department_id == dep_id)
+            found = writes.delete_by_id(Department, dep_id, version)
+        except StaleDataError:
+            db.session.rollback()
+            raise
+        if not found:
+            db.session.rollback()
+            return False
+        db.session.commit()
+        return True
+
     @staticmethod
     def delete(department):
         """
@@ -59,6 +153,7 @@ class DepartmentServices:
         db.session.commit()
 
     @staticmethod
+    @read_only
     def get_avg_salary(department):
         """
         Calculate the average salary for employees in working department.
@@ -66,8 +161,7 @@ class DepartmentServices:
         :return: The average salary round to 2 digits after point.
         0 if no employees in the department.
         """
-        if not list(department.employees):
-            return 0
-        return round(sum(employee.salary for employee in department.employees) / len(
-            list(department.employees))
-                     )
+        average = db.session.query(func.avg(Employee.salary)).filter(
+            Employee.department_id == department.id_
+        ).scalar()
+        return 0 if average is None else round(average)
@@ -1,80 +1,301 @@
 # pylint: disable=E1101
 """ Module contains Employee Service class with methods for DB CRUD operations."""
-from department_app.models import db, Employee
+import sqlite3
+from operator import attrgetter, itemgetter
+
+from sqlalchemy import and_, false, func, or_, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import aliased, joinedload
+from sqlalchemy.orm.exc import StaleDataError
+
+from department_app.models import db, Department, Employee
+from department_app.models.replicas import primary, read_only
+from department_app.models.sharding import find, gather, get_router, stream
+from department_app.service import batch, writes
+from department_app.service.department_service import DepartmentServices
+from department_app.service.cache import get_record
+from department_app.service.group_commit import get_group_committer, inserted
+from department_app.service.columns import load_only_options
+
+# Orderings available for rankings: pairs of (column name, descending)
+RANKINGS = {
+    'salary': (('salary', True), ('id_', False)),
+    'newest': (('id_', True),),
+}
+
+
+def supports_window_functions():
+    """
+    Check if the database supports window functions (SQLite 3.25+, MySQL 8+).
+    :return: bool
+    """
+    dialect = db.engine.dialect
+    if dialect.name == 'sqlite':
+        return sqlite3.sqlite_version_info >= (3, 25)
+    if dialect.name == 'mysql':
+        return dialect.server_version_info is None or dialect.server_version_info >= (8,)
+    return True
 
 
 class EmployeeServices:
     """Class with methods for DB CRUD operation on employees."""
 
     @staticmethod
-    def get_all():
+    def _query(fields=None):
+        """
+        Build a query on employees loading only the columns of requested fields.
+        :param fields: Names of the fields to load, all if None.
+        :return: A Query object.
+        """
+        return Employee.query.options(*load_only_options(Employee, fields))
+
+    @staticmethod
+    def _page(query, after=None, limit=None):
+        """
+        Order a query on employees by id and run it for one page.
+        :param query: A Query on employees.
+        :param after: Id of the last employee of the previous page, None for the first page.
+        :param limit: Maximal number of employees, None for all.
+        :return: A list of employees ordered by id.
+        """
+        if after is not None:
+            query = query.filter(Employee.id_ > after)
+        return query.order_by(Employee.id_).limit(limit).all()
+
+    @staticmethod
+    @read_only
+    def get_all(fields=None, after=None, limit=None):
         """
-        get_all returns a list with all Employee objects from the DB.
+        get_all returns a list with all Employee objects from the DB, ordered by id.
+        With sharded employees all shards are queried in parallel and merged.
+        :param fields: Names of the fields to load, all if None.
+        :param after: Id of the last employee of the previous page, None for the first page.
+        :param limit: Maximal number of employees, None for all.
         """
-        return Employee.query.all()
+        return gather(
+            lambda: EmployeeServices._page(EmployeeServices._query(fields), after, limit),
+            key=attrgetter('id_'), limit=limit
+        )
 
     @staticmethod
-    def get_all_from_department(dep_id):
+    @read_only
+    def get_all_from_department(dep_id, fields=None):
         """
         Get all employees working in a specified departmentю
         :param dep_id: ID of the department(int)
+        :param fields: Names of the fields to load, all if None.
         :return: A list with all Employee instances with "department_id=dep_id"
         Or an empty list if no employees in department with id=dep_id.
         """
-        return Employee.query.filter_by(department_id=dep_id).all()
+        return EmployeeServices._query(fields).filter_by(department_id=dep_id).all()
 
     @staticmethod
-    def get_by_id(emp_id):
+    @read_only
+    def get_by_id(emp_id, fields=None):
         """
         Get a specific employee by id from DB.
         :param emp_id: Id of the employee to fetch (int)
+        :param fields: Names of the fields to load, all if None.
         :return: Employee with id=dep_id, None if no such department.
         """
-        return Employee.query.filter_by(id_=emp_id).first()
+        return find(lambda: EmployeeServices._query(fields).filter_by(id_=emp_id).first())
+
+    @staticmethod
+    def get_cached(emp_id):
+        """
+        Get a read-only record of an employee by id through the entity cache.
+        :param emp_id: Id of the employee to fetch (int)
+        :return: EmployeeRecord with id=emp_id, None if no such employee.
+        """
+        return get_record(Employee, emp_id, EmployeeServices.get_by_id)
+
+    @staticmethod
+    @read_only
+    def get_by_ids(emp_ids, fields=None):
+        """
+        Get many employees by ids with one IN query per chunk of ids,
+        loading their departments in the same query if requested.
+        :param emp_ids: A list of employee ids (int).
+        :param fields: Names of the fields to load, all if None.
+        :return: A tuple (list of employees in the order of emp_ids, list of missing ids).
+        """
+        if get_router() is not None:
+            # Departments are in another database, they're loaded on access
+            found = {employee.id_: employee for employee in gather(
+                lambda: batch.get_by_ids(EmployeeServices._query(fields), Employee.id_, emp_ids)[0]
+            )}
+            emp_ids = list(dict.fromkeys(emp_ids))
+            return ([found[id_] for id_ in emp_ids if id_ in found],
+                    [id_ for id_ in emp_ids if id_ not in found])
+        query = EmployeeServices._query(fields)
+        if fields is None or 'department' in fields:
+            query = query.options(joinedload(Employee.department))
+        return batch.get_by_ids(query, Employee.id_, emp_ids)
 
     @staticmethod
-    def get_by_date_of_birth(date, date_for_interval=None):
+    @read_only
+    def get_by_date_of_birth(date, date_for_interval=None, fields=None, after=None, limit=None):
         """
-        Get employees born on a specific date or in an interval between dates.
+        Get employees born on a specific date or in an interval between dates, ordered
+        by id. With sharded employees all shards are queried in parallel and merged.
         :param date: date object to get employees born on specific date
         or lower point for interval to get employees born in interval
         (if date_for_interval passed).
         :param date_for_interval: date object to specify the upper point
         for interval to get employees born in interval.
+        :param fields: Names of the fields to load, all if None.
+        :param after: Id of the last employee of the previous page, None for the first page.
+        :param limit: Maximal number of employees, None for all.
         :return: a list of employees with date_of_birth matching the provided
         parameters. Empty list if no matches.
         """
-        if date_for_interval is None:
-            return Employee.query.filter_by(date_of_birth=date).all()
-        return Employee.query.filter(date <= Employee.date_of_birth, Employee.date_of_birth <= date_for_interval).all()
+        def load():
+            query = EmployeeServices._query(fields)
+            if date_for_interval is None:
+                query = query.filter_by(date_of_birth=date)
+            else:
+                query = query.filter(
+                    date <= Employee.date_of_birth, Employee.date_of_birth <= date_for_interval
+                )
+            return EmployeeServices._page(query, after, limit)
+        return gather(load, key=attrgetter('id_'), limit=limit)
 
     @staticmethod
-    def get_by_date_of_birth_from_department(dep_id, date, date_for_interval=None):
+    @read_only
+    def get_by_date_of_birth_from_department(dep_id, date, date_for_interval=None, fields=None,
+                                             after=None, limit=None):
         """
         Get employees born on a specific date or in an interval between dates,
-        who work in a specified department.
+        who work in a specified department, ordered by id.
         :param dep_id: Id of the department to get employees from (int).
         :param date: date object to get employees born on specific date
         or lower point for interval to get employees born in interval
         (if date_for_interval passed).
         :param date_for_interval: date object to specify the upper point
         for interval to get employees born in interval.
+        :param fields: Names of the fields to load, all if None.
+        :param after: Id of the last employee of the previous page, None for the first page.
+        :param limit: Maximal number of employees, None for all.
         :return: a list of employees with date_of_birth matching the provided
         parameters. Empty list if no matches.
         """
+        query = EmployeeServices._query(fields).filter_by(department_id=dep_id)
         if date_for_interval is None:
-            return Employee.query.filter_by(date_of_birth=date).filter_by(department_id=dep_id).all()
-        return Employee.query.filter(
+            return EmployeeServices._page(query.filter_by(date_of_birth=date), after, limit)
+        return EmployeeServices._page(query.filter(
             date <= Employee.date_of_birth, Employee.date_of_birth <= date_for_interval
-        ).filter_by(department_id=dep_id).all()
+        ), after, limit)
+
+    @staticmethod
+    @read_only
+    def export(dep_id=None, date=None, date_for_interval=None, chunk_size=1000):
+        """
+        Stream employees with the titles of their departments, ordered by id, from one
+        joined query whose rows are fetched chunk_size at a time, so they are never all
+        in memory. With sharded employees the shards are streamed together and merged
+        by id, the department titles are read once from the primary database.
+        :param dep_id: Id of the department to get employees from, None for all.
+        :param date: date object to get employees born on specific date
+        or lower point for interval to get employees born in interval
+        (if date_for_interval passed), None for all.
+        :param date_for_interval: date object to specify the upper point
+        for interval to get employees born in interval.
+        :param chunk_size: Number of rows fetched from the database at a time.
+        :return: An iterator of rows (id_, full_name, date_of_birth, salary,
+        department_id, department title).
+        """
+        criteria = []
+        if dep_id is not None:
+            criteria.append(Employee.department_id == dep_id)
+        if date is not None and date_for_interval is None:
+            criteria.append(Employee.date_of_birth == date)
+        elif date is not None:
+            criteria.extend((date <= Employee.date_of_birth,
+                             Employee.date_of_birth <= date_for_interval))
+        columns = (Employee.id_, Employee.full_name, Employee.date_of_birth, Employee.salary,
+                   Employee.department_id)
+        if get_router() is None:
+            return iter(db.session.execute(
+                select(*columns, Department.title).join(Employee.department).where(*criteria)
+                .order_by(Employee.id_).execution_options(yield_per=chunk_size)
+            ))
+        titles = dict(db.session.execute(select(Department.id_, Department.title)).all())
+
+        def load():
+            return db.session.execute(
+                select(*columns).where(*criteria).order_by(Employee.id_)
+                .execution_options(yield_per=chunk_size)
+            )
+        rows = load() if dep_id is not None else stream(load, key=itemgetter(0))
+        return ((*row, titles.get(row.department_id)) for row in rows)
+
+    @staticmethod
+    @read_only
+    def get_top_by_department(by='salary', per_department=10, fields=None):
+        """
+        Get the first employees of every department by a ranking, e.g. top earners
+        or newest hires. Uses one ROW_NUMBER() OVER (PARTITION BY department_id ...)
+        query, or a correlated count of higher ranked colleagues on databases without
+        window functions. With sharded employees every shard ranks its departments.
+        :param by: Name of the ranking, one of RANKINGS keys.
+        :param per_department: Number of employees to get from every department (int).
+        :param fields: Names of the fields to load, all if None.
+        :return: A list of employees ordered by department and rank.
+        """
+        return gather(
+            lambda: EmployeeServices._top_by_department(by, per_department, fields),
+            key=attrgetter('department_id')
+        )
+
+    @staticmethod
+    def _top_by_department(by, per_department, fields):
+        """
+        Run the ranking query of get_top_by_department.
+        :return: A list of employees ordered by department and rank.
+        """
+        ordering = [
+            (getattr(Employee, name), descending) for name, descending in RANKINGS[by]
+        ]
+        order_by = [column.desc() if descending else column for column, descending in ordering]
+        if supports_window_functions():
+            ranked = db.session.query(
+                Employee.id_,
+                func.row_number().over(
+                    partition_by=Employee.department_id, order_by=order_by
+                ).label('rank')
+            ).subquery()
+            return EmployeeServices._query(fields).join(
+                ranked, Employee.id_ == ranked.c.id_
+            ).filter(
+                ranked.c.rank <= per_department
+            ).order_by(Employee.department_id, ranked.c.rank).all()
+        other = aliased(Employee)
+        ahead, tied = false(), []
+        for column, descending in ordering:
+            other_column = getattr(other, column.key)
+            beats = other_column > column if descending else other_column < column
+            ahead = or_(ahead, and_(*tied, beats))
+            tied.append(other_column == column)
+        higher_ranked = select(func.count()).where(
+            other.department_id == Employee.department_id, ahead
+        ).scalar_subquery()
+        return EmployeeServices._query(fields).filter(higher_ranked < per_department).order_by(
+            Employee.department_id, *order_by
+        ).all()
 
     @staticmethod
     def create(data):
         """
-        Create a new Employee instance from dict and save new entry to DB
+        Create a new Employee instance from dict and save new entry to DB.
+        With group commit enabled the entry is committed with concurrent writes.
         :param data: A dict with data to create an employee from.
         :return: the created instance
+        :raise IntegrityError: if the department does not exist.
         """
+        EmployeeServices._check_department(data.get('department_id'))
+        committer = get_group_committer()
+        if committer is not None and get_router() is None:
+            return inserted(committer.submit('insert', data))
         employee = Employee(**data)
         db.session.add(employee)
         db.session.commit()
@@ -87,13 +308,90 @@ class EmployeeServices:
         :param employee: An Employee instance to be updated.
         :param data: A dict with data to update the employee with.
         :return: The updated instance.
+        :raise IntegrityError: if the new department does not exist.
         """
+        router = get_router()
+        if router is not None and 'department_id' in data:
+            EmployeeServices._check_department(data['department_id'])
+            if router.shard_of(employee.department_id) != router.shard_of(data['department_id']):
+                return EmployeeServices._move(employee, data)
         for key in data:
             if key in employee.__dict__.keys():
                 employee.__setattr__(key, data[key])
         db.session.commit()
         return employee
 
+    @staticmethod
+    def update_by_id(emp_id, data, version=None):
+        """
+        Update an employee with one UPDATE statement, without loading it first.
+        Employees moving to a department of another shard are loaded and moved.
+        With group commit enabled the statement is committed with concurrent writes.
+        :param emp_id: Id of the employee (int or str).
+        :param data: A dict with data to update the employee with.
+        :param version: The version of the employee to update, None for any version.
+        :return: The updated employee, None if no such employee.
+        :raise IntegrityError: if the new department does not exist.
+        :raise StaleDataError: if the employee is not at the given version.
+        """
+        emp_id = writes.parse_id(emp_id)
+        if emp_id is None:
+            return None
+        if get_router() is not None and 'department_id' in data:
+            employee = EmployeeServices.get_by_id(emp_id)
+            if employee is not None and version is not None and employee.version != version:
+                raise StaleDataError(f'Employee with id = {emp_id} is not at version {version}')
+            return None if employee is None else EmployeeServices.update(employee, data)
+        committer = get_group_committer()
+        if committer is not None and get_router() is None:
+            if not committer.submit('update', emp_id, data, version):
+                return None
+            with primary():
+                return EmployeeServices.get_by_id(emp_id)
+        try:
+            found = writes.update_by_id(Employee, emp_id, data, version)
+        except (IntegrityError, StaleDataError):
+            db.session.rollback()
+            raise
+        db.session.commit()
+        return EmployeeServices.get_by_id(emp_id) if found else None
+
+    @staticmethod
+    def _move(employee, data):
+        """
+        Move an employee to the shard of its new department: delete the row from
+        the old shard and insert it with the same id into the new one. The shards
+        are committed one after the other, not atomically.
+        :param employee: An Employee instance to be updated.
+        :param data: A dict with data to update the employee with.
+        :return: The new instance.
+        """
+        values = {column.key: getattr(employee, column.key)
+                  for column in Employee.__mapper__.column_attrs}
+        values.update((key, value) for key, value in data.items() if key in values)
+        values['version'] = employee.version + 1
+        db.session.delete(employee)
+        db.session.flush()
+        moved = Employee(**values)
+        db.session.add(moved)
+        db.session.commit()
+        return moved
+
+    @staticmethod
+    def _check_department(dep_id):
+        """
+        Check the department of an employee exists if employees are sharded,
+        since shard tables have no foreign key to the departments table.
+        :param dep_id: Id of the department.
+        :return: None
+        :raise IntegrityError: if there is no department with id=dep_id.
+        """
+        if get_router() is not None and not DepartmentServices.exists(dep_id):
+            raise IntegrityError(
+                'INSERT INTO employees', {'department_id': dep_id},
+                ValueError(f'Department with id {dep_id} does not exist')
+            )
+
     @staticmethod
     def delete(employee):
         """
@@ -103,3 +401,23 @@ class EmployeeServices:
         """
         db.session.delete(employee)
         db.session.commit()
+
+    @staticmethod
+    def delete_by_id(emp_id, version=None):
+        """
+        Delete an employee with one DELETE statement, without loading it first.
+        :param emp_id: Id of the employee (int or str).
+        :param version: The version of the employee to delete, None for any version.
+        :return: True if the employee existed.
+        :raise StaleDataError: if the employee is not at the given version.
+        """
+        emp_id = writes.parse_id(emp_id)
+        if emp_id is None:
+            return False
+        try:
+            found = writes.delete_by_id(Employee, emp_id, version)
+        except StaleDataError:
+            db.session.rollback()
+            raise
+        db.session.commit()
+        return found
@@ -0,0 +1,269 @@
+"""
+Module contains the group commit of concurrent employee writes.
+
+Employees created or updated one by one (web forms, importers) cost one
+transaction commit each, which is bounded by the durable flush of the
+database log. With "GROUP_COMMIT_WINDOW" set, the first write becomes the
+leader of a batch: it waits up to that many seconds, or until
+"GROUP_COMMIT_MAX_ROWS" writes joined the batch, then runs all of them in
+a session of the batch, apart from the sessions of the callers (so their
+pending changes are neither committed nor rolled back with it), and commits
+once. Every caller waits for the batch and gets its own result or exception.
+If the batch fails, it is rolled back and its writes are run again with one
+commit each, so a bad row only fails its own caller.
+
+A caller waits at most "GROUP_COMMIT_TIMEOUT" seconds for the batch, then
+gets a TimeoutError: if the batch did not start yet, its write is withdrawn
+and never runs, otherwise the write may still be committed.
+
+Functions:
+    inserted(values)
+    get_group_committer()
+"""
+import threading
+
+from flask import current_app
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+from department_app.models import db, Employee
+from department_app.models.changelog import ENABLED_KEY
+from department_app.service import writes
+
+
+class _Write:
+    """A write of a batch with its outcome."""
+
+    def __init__(self, operation, args):
+        self.operation = operation
+        self.args = args
+        self.done = threading.Event()
+        self.finished = False
+        self.result = None
+        self.error = None
+
+    def finish(self, result=None, error=None):
+        """Record the outcome of the write."""
+        self.finished = True
+        self.result = result
+        self.error = error
+
+
+class _Batch:
+    """Writes committed together."""
+
+    def __init__(self):
+        self.writes = []
+        self.full = threading.Event()
+        self.started = False
+
+
+def _insert(session, data):
+    """
+    Add an employee to the session of the batch.
+    :param data: A dict with data to create an employee from.
+    :return: The pending Employee instance.
+    """
+    employee = Employee(**data)
+    session.add(employee)
+    return employee
+
+
+def _update(session, emp_id, data, version):
+    """
+    Update an employee with one UPDATE statement in the session of the batch.
+    :return: True if the employee exists.
+    """
+    return writes.update_by_id(Employee, emp_id, data, version, session=session)
+
+
+OPERATIONS = {'insert': _insert, 'update': _update}
+
+
+def _outcome(result):
+    """
+    Turn the result of an operation into a value safe to hand to another thread.
+    :param result: The result of the operation, flushed.
+    :return: A dict of column values for inserted employees, the result otherwise.
+    """
+    if isinstance(result, Employee):
+        return {attribute.key: getattr(result, attribute.key)
+                for attribute in Employee.__mapper__.column_attrs}
+    return result
+
+
+class GroupCommitter:
+    """
+    Batches of concurrent writes of an application, one commit per batch.
+    """
+
+    def __init__(self, window, max_rows, timeout=30):
+        self.window = window
+        self.max_rows = max_rows
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.batch = None
+        self.counters = {'batches': 0, 'writes': 0, 'retries': 0, 'timeouts': 0}
+
+    def submit(self, operation, *args):
+        """
+        Run a write in the current batch and wait for its commit.
+        :param operation: Name of the operation, one of OPERATIONS keys.
+        :param args: Arguments of the operation.
+        :return: The outcome of the operation (see _outcome).
+        :raise TimeoutError: if the batch did not finish in time.
+        :raise Exception: the exception the operation raised when run alone.
+        """
+        write = _Write(operation, args)
+        with self.lock:
+            batch, leader = self.batch, self.batch is None
+            if leader:
+                batch = self.batch = _Batch()
+            batch.writes.append(write)
+            if len(batch.writes) >= self.max_rows:
+                self.batch = None
+                batch.full.set()
+        if leader:
+            self._lead(batch)
+        elif not write.done.wait(self.timeout):
+            self._give_up(batch, write)
+        if write.error is not None:
+            raise write.error
+        return write.result
+
+    def _close(self, batch):
+        """
+        Stop a batch from taking or withdrawing writes.
+        :return: The list of _Write objects of the batch.
+        """
+        with self.lock:
+            if self.batch is batch:
+                self.batch = None
+            batch.started = True
+            return list(batch.writes)
+
+    def _lead(self, batch):
+        """
+        Wait for the writes of a batch, run them and wake their callers up,
+        failing the writes left without an outcome.
+        :return: None
+        """
+        try:
+            batch.full.wait(self.window)
+            self._run(self._close(batch))
+        finally:
+            for write in self._close(batch):
+                if not write.finished:
+                    write.finish(error=RuntimeError('The group commit batch was aborted'))
+                write.done.set()
+
+    def _give_up(self, batch, write):
+        """
+        Withdraw a write from a batch which did not start yet.
+        :return: None
+        :raise TimeoutError: always.
+        """
+        with self.lock:
+            self.counters['timeouts'] += 1
+            if not batch.started:
+                batch.writes.remove(write)
+                raise TimeoutError(f'Group commit did not start in {self.timeout} seconds, '
+                                   f'the write was not run')
+        raise TimeoutError(f'Group commit did not finish in {self.timeout} seconds, '
+                           f'the write may still be committed')
+
+    @staticmethod
+    def _session():
+        """
+        Open a session for a batch on the primary database.
+        :return: Session instance writing the change log like the app sessions.
+        """
+        return Session(bind=db.engine,
+                       info={ENABLED_KEY: current_app.config.get('CHANGE_LOG', False)})
+
+    def _run(self, batch_writes):
+        """
+        Run the writes of a closed batch in one transaction, or one by one if it fails.
+        :param batch_writes: A list of _Write objects.
+        :return: None
+        """
+        with self._session() as session:
+            try:
+                results = [OPERATIONS[write.operation](session, *write.args)
+                           for write in batch_writes]
+                session.flush()
+                outcomes = [_outcome(result) for result in results]
+                session.commit()
+            except Exception as exception:  # pylint: disable=W0703
+                session.rollback()
+                if len(batch_writes) == 1:
+                    batch_writes[0].finish(error=exception)
+                else:
+                    self._run_alone(session, batch_writes)
+            else:
+                for write, outcome in zip(batch_writes, outcomes):
+                    write.finish(result=outcome)
+        with self.lock:
+            self.counters['batches'] += 1
+            self.counters['writes'] += len(batch_writes)
+
+    def _run_alone(self, session, batch_writes):
+        """
+        Run writes of a rolled back batch with one commit each.
+        :param session: The session of the batch.
+        :param batch_writes: A list of _Write objects.
+        :return: None
+        """
+        with self.lock:
+            self.counters['retries'] += 1
+        for write in batch_writes:
+            try:
+                result = OPERATIONS[write.operation](session, *write.args)
+                session.flush()
+                outcome = _outcome(result)
+                session.commit()
+            except Exception as exception:  # pylint: disable=W0703
+                session.rollback()
+                write.finish(error=exception)
+            else:
+                write.finish(result=outcome)
+
+
+def inserted(values):
+    """
+    Attach an employee inserted by a batch to the session without querying it.
+    :param values: The column values returned by the batch.
+    :return: The persistent Employee instance.
+    """
+    employee = Employee(**values)
+    make_transient_to_detached(employee)
+    return db.session.merge(employee, load=False)
+
+
+class GroupCommit:
+    """
+    Flask extension holding the group committer of an application.
+    """
+
+    def init_app(self, app):
+        """
+        Enable group commit for the app if "GROUP_COMMIT_WINDOW" is positive.
+        :param app: Flask application instance.
+        :return: None
+        """
+        window = app.config.get('GROUP_COMMIT_WINDOW', 0)
+        if window > 0:
+            app.extensions['group_commit'] = GroupCommitter(
+                window, app.config.get('GROUP_COMMIT_MAX_ROWS', 100),
+                app.config.get('GROUP_COMMIT_TIMEOUT', 30)
+            )
+
+
+def get_group_committer():
+    """
+    Get the group committer of the current application.
+    :return: GroupCommitter instance, None if group commit is disabled.
+    """
+    return current_app.extensions.get('group_commit')
+
+
+group_commit = GroupCommit()
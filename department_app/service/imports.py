@@ -0,0 +1,262 @@
+"""
+Module contains the bulk import of employees from CSV or JSON Lines streams.
+
+Records are read one at a time from the stream and processed in chunks of
+"IMPORT_CHUNK_SIZE": a chunk is validated at once like the employee REST API
+does, with the department given by id ("department_id") or by title
+("department", resolved with a map of all departments read by one query),
+then its valid rows are inserted in one transaction. If the transaction
+fails, the rows of the chunk are inserted one by one, so only the bad rows
+are rejected. Columns which are not employee fields (e.g. "id") are ignored,
+so exported CSV files can be imported again.
+
+Rows are numbered from 1, without the CSV header. After every chunk the
+report tells the last row committed (the checkpoint); an import started at a
+checkpoint skips the rows up to it, which resumes an interrupted import. An
+import stopped while inserting a chunk row by row checkpoints the row before
+the failed one, so the rows committed meanwhile are not imported twice.
+
+Functions:
+    read_csv(stream)
+    read_jsonl(stream)
+    read_records(stream, file_format)
+    import_employees(records, start, chunk_size, max_errors, progress)
+"""
+import csv
+import itertools
+import json
+import time
+
+from marshmallow import EXCLUDE, ValidationError
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+
+from department_app.models import db, Department, Employee
+
+# Formats of the files by media type of the request body
+IMPORT_MEDIATYPES = {
+    'text/csv': 'csv',
+    'application/x-ndjson': 'jsonl',
+    'application/jsonl': 'jsonl',
+    'application/x-jsonlines': 'jsonl',
+}
+
+
+class ImportInterrupted(Exception):
+    """
+    Raised when a database error stops an import, with the report of the rows
+    committed before it.
+    """
+
+    def __init__(self, report, cause):
+        super().__init__(f'Import stopped after row {report["checkpoint"]}: {cause}')
+        self.report = report
+
+
+class _RowFailed(Exception):
+    """
+    Raised when a database error stops the row by row insert of a chunk, with
+    the errors of the rows committed or rejected before the failed row.
+    """
+
+    def __init__(self, number, errors, cause):
+        super().__init__(f'Row {number} failed: {cause}')
+        self.number = number
+        self.errors = errors
+        self.cause = cause
+
+
+def read_csv(stream):
+    """
+    Read employees from a CSV text stream with a header row.
+    :param stream: A text stream opened with newline=''.
+    :return: An iterator of dicts {column name: value}.
+    :raise ValueError: if the header has no "full_name" column.
+    """
+    reader = csv.DictReader(stream)
+    if reader.fieldnames is None or 'full_name' not in reader.fieldnames:
+        raise ValueError('The CSV header should name the employee fields')
+    return iter(reader)
+
+
+def read_jsonl(stream):
+    """
+    Read employees from a JSON Lines text stream, one object per line.
+    Blank lines are skipped.
+    :param stream: A text stream.
+    :return: A generator of decoded values, None for lines which are not JSON.
+    """
+    for line in stream:
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            yield None
+
+
+READERS = {'csv': read_csv, 'jsonl': read_jsonl}
+
+
+def read_records(stream, file_format):
+    """
+    Read employees from a text stream in a format.
+    :param stream: A text stream opened with newline=''.
+    :param file_format: "csv" or "jsonl".
+    :return: An iterator of records.
+    :raise ValueError: if the format is unknown or the CSV header is invalid.
+    """
+    if file_format not in READERS:
+        raise ValueError(f'Unknown import format: {file_format}')
+    return READERS[file_format](stream)
+
+
+def _employee_schema():
+    """Make the schema validating employees like the REST API, ignoring unknown columns."""
+    from department_app.rest.schemas import EmployeeSchema  # pylint: disable=C0415
+    return EmployeeSchema(unknown=EXCLUDE)
+
+
+def _departments():
+    """
+    Read all departments with one query.
+    :return: A tuple (dict {title: id}, set of ids).
+    """
+    rows = db.session.execute(select(Department.id_, Department.title)).all()
+    return {title: id_ for id_, title in rows}, {id_ for id_, _ in rows}
+
+
+def _validate(schema, chunk, titles, dep_ids):
+    """
+    Validate a chunk of records.
+    :param schema: The EmployeeSchema instance.
+    :param chunk: A list of (row number, record) pairs.
+    :param titles: A dict {department title: id}.
+    :param dep_ids: A set of department ids.
+    :return: A tuple (list of (row number, loaded data) pairs, dict {row number: errors}).
+    """
+    errors, numbers, items = {}, [], []
+    for number, record in chunk:
+        if not isinstance(record, dict):
+            errors[number] = {'_schema': ['Invalid JSON object']}
+            continue
+        record = {key: value for key, value in record.items() if value not in ('', None)}
+        title = record.pop('department', None)
+        if 'department_id' not in record and title is not None:
+            if not isinstance(title, str) or title not in titles:
+                errors[number] = {'department': [f'Unknown department: {title}']}
+                continue
+            record['department_id'] = titles[title]
+        numbers.append(number)
+        items.append(record)
+    try:
+        loaded, messages = schema.load(items, many=True), {}
+    except ValidationError as exception:
+        loaded, messages = exception.valid_data, exception.messages
+    valid = []
+    for index, (number, data) in enumerate(zip(numbers, loaded)):
+        if index in messages:
+            errors[number] = messages[index]
+        elif data['department_id'] not in dep_ids:
+            errors[number] = {'department_id': ['Not valid department id']}
+        else:
+            valid.append((number, data))
+    return valid, errors
+
+
+def _insert(valid):
+    """
+    Insert validated rows in one transaction, or one by one if it fails.
+    :param valid: A list of (row number, loaded data) pairs.
+    :return: A dict {row number: errors} of the rows which could not be inserted.
+    :raise _RowFailed: if a database error other than an integrity error stops the
+    row by row insert, after some rows were committed.
+    """
+    try:
+        db.session.add_all([Employee(**data) for _, data in valid])
+        db.session.commit()
+        return {}
+    except IntegrityError:
+        db.session.rollback()
+    errors = {}
+    for number, data in valid:
+        try:
+            db.session.add(Employee(**data))
+            db.session.commit()
+        except IntegrityError as exception:
+            db.session.rollback()
+            errors[number] = {'_schema': [str(exception.orig)]}
+        except SQLAlchemyError as exception:
+            db.session.rollback()
+            raise _RowFailed(number, errors, exception) from exception
+    return errors
+
+
+def _count(report, chunk, valid, errors, max_errors):
+    """
+    Add processed rows to a report and move its checkpoint after them.
+    :param chunk: A list of (row number, record) pairs, the processed rows.
+    :param valid: A list of (row number, loaded data) pairs, the valid rows among them.
+    :param errors: A dict {row number: errors} of their rejected rows.
+    :param max_errors: Maximal number of row errors listed in the report.
+    :return: None
+    """
+    report['rows'] += len(chunk)
+    report['imported'] += sum(number not in errors for number, _ in valid)
+    report['failed'] += len(errors)
+    report['errors'].extend(
+        {'row': number, 'errors': errors[number]} for number in sorted(errors)
+    )
+    del report['errors'][max_errors:]
+    if chunk:
+        report['checkpoint'] = chunk[-1][0]
+
+
+def _measure(report, started):
+    """Add the elapsed time and the throughput to a report."""
+    report['seconds'] = round(time.monotonic() - started, 3)
+    report['rows_per_second'] = round(report['rows'] / report['seconds']) \
+        if report['seconds'] else report['rows']
+    return report
+
+
+def import_employees(records, start=0, chunk_size=1000, max_errors=100, progress=None):
+    """
+    Import employees from records, a chunk per transaction.
+    :param records: An iterable of records (dicts of employee fields) read from a file.
+    :param start: Number of rows to skip, the checkpoint of an interrupted import.
+    :param chunk_size: Number of rows validated and inserted at a time.
+    :param max_errors: Maximal number of row errors listed in the report.
+    :param progress: Callable called with the report after every chunk, or None.
+    :return: The report: a dict with the numbers of "rows" read (without the skipped
+    ones), "imported" and "failed" rows, the "errors" of the first failed rows
+    ({"row": number, "errors": {field: messages}}), the "checkpoint", "seconds"
+    and "rows_per_second".
+    :raise ImportInterrupted: if a database error stops the import.
+    """
+    started = time.monotonic()
+    schema = _employee_schema()
+    titles, dep_ids = _departments()
+    report = {'rows': 0, 'imported': 0, 'failed': 0, 'errors': [], 'checkpoint': start}
+    numbered = itertools.islice(enumerate(records, 1), start, None)
+    while True:
+        chunk = list(itertools.islice(numbered, chunk_size))
+        if not chunk:
+            break
+        try:
+            valid, errors = _validate(schema, chunk, titles, dep_ids)
+            errors.update(_insert(valid))
+        except _RowFailed as stop:
+            # The rows before the failed one were committed or rejected for good
+            _count(report, [row for row in chunk if row[0] < stop.number],
+                   [row for row in valid if row[0] < stop.number],
+                   {**{number: error for number, error in errors.items()
+                       if number < stop.number}, **stop.errors}, max_errors)
+            raise ImportInterrupted(_measure(report, started), stop.cause) from stop.cause
+        except SQLAlchemyError as exception:
+            db.session.rollback()
+            raise ImportInterrupted(_measure(report, started), exception) from exception
+        _count(report, chunk, valid, errors, max_errors)
+        if progress is not None:
+            progress(_measure(report, started))
+    return _measure(report, started)
@@ -0,0 +1,275 @@
+"""
+Module contains the background job runner of long-running operations.
+
+Operations too long for a request (deleting a large department, reloading
+the analytics snapshot, pruning the change log) are submitted as jobs: a row of the jobs table is
+created and the operation runs in a thread pool of the process, in an
+application context of its own. The operation reports its progress as rows
+done out of a total, and works in chunks of "JOB_CHUNK_SIZE" rows, each
+committed with the progress, so it never holds locks for long. The jobs
+table keeps the status, progress, result or error of every job.
+
+Jobs are lost if the process stops while they run: they stay "running".
+
+Functions:
+    job(kind)
+    get_job(job_id)
+    get_job_runner()
+"""
+import inspect
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import func, select, update
+from sqlalchemy.orm.exc import StaleDataError
+
+from department_app.models import db, Department, Employee, Job
+from department_app.service import writes
+from department_app.service.analytics import get_snapshot
+from department_app.service.changes import prune_changes
+
+# Functions running the jobs by kind, registered with the job decorator
+JOBS = {}
+
+
+def job(kind):
+    """
+    Register a function running jobs of a kind. The function is called with a
+    JobContext and the parameters of the job as keyword arguments, and returns
+    the result of the job (JSON serializable).
+    :param kind: Name of the kind of jobs.
+    :return: The decorator.
+    """
+    def register(function):
+        JOBS[kind] = function
+        return function
+    return register
+
+
+class JobContext:
+    """
+    Progress of a running job, written to its row of the jobs table.
+    """
+
+    def __init__(self, job_id, chunk_size):
+        self.job_id = job_id
+        self.chunk_size = chunk_size
+
+    def _update(self, **values):
+        """Update the row of the job and commit the transaction of the job."""
+        db.session.execute(update(Job).where(Job.id_ == self.job_id).values(**values))
+        db.session.commit()
+
+    def set_total(self, total):
+        """
+        Set the number of rows the job has to process.
+        :param total: int
+        :return: None
+        """
+        self._update(rows_total=total)
+
+    def advance(self, count):
+        """
+        Commit a processed chunk of rows with the progress of the job.
+        :param count: Number of rows processed since the last call.
+        :return: None
+        """
+        self._update(rows_done=Job.rows_done + count)
+
+
+class JobRunner:
+    """
+    Thread pool running the jobs of an application.
+    """
+
+    def __init__(self, app, workers, chunk_size):
+        self.app = app
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.lock = threading.Lock()
+        self.futures = {}
+        self._executor = None
+        self._pid = None
+
+    @property
+    def executor(self):
+        """The thread pool, created in every process on the first job."""
+        with self.lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=self.workers,
+                                                    thread_name_prefix='job')
+                self._pid = os.getpid()
+                self.futures = {}
+            return self._executor
+
+    def submit(self, kind, params=None):
+        """
+        Create a job and schedule it.
+        :param kind: Kind of the job, one of JOBS keys.
+        :param params: A dict of parameters of the job.
+        :return: The created Job.
+        :raise ValueError: if the kind or the parameters are unknown.
+        """
+        params = params or {}
+        if kind not in JOBS:
+            raise ValueError(f'Unknown job kind: {kind}')
+        try:
+            inspect.signature(JOBS[kind]).bind(None, **params)
+        except TypeError as exception:
+            raise ValueError(f'Wrong parameters of {kind} job: {exception}') from exception
+        new_job = Job(kind=kind, params=params)
+        db.session.add(new_job)
+        db.session.commit()
+        future = self.executor.submit(self._run, new_job.id_)
+        with self.lock:
+            self.futures[new_job.id_] = future
+        future.add_done_callback(lambda _: self._forget(new_job.id_))
+        return new_job
+
+    def _forget(self, job_id):
+        """Drop the future of a finished job."""
+        with self.lock:
+            self.futures.pop(job_id, None)
+
+    def wait(self, job_id, timeout=None):
+        """
+        Wait for a job submitted by this process to finish.
+        :param job_id: Id of the job.
+        :param timeout: Maximal number of seconds to wait, None to wait forever.
+        :return: None
+        """
+        with self.lock:
+            future = self.futures.get(job_id)
+        if future is not None:
+            future.exception(timeout)
+
+    def _run(self, job_id):
+        """
+        Run a job in an application context and record its outcome.
+        :param job_id: Id of the job.
+        :return: None
+        """
+        with self.app.app_context():
+            try:
+                current = db.session.get(Job, job_id)
+                function, params = JOBS[current.kind], dict(current.params)
+                current.status, current.started_at = 'running', datetime.utcnow()
+                db.session.commit()
+                result = function(JobContext(job_id, self.chunk_size), **params)
+            except Exception as exception:  # pylint: disable=W0703
+                db.session.rollback()
+                self.app.logger.exception('Job %s failed', job_id)
+                self._finish(job_id, status='failed', error=str(exception)[:512])
+            else:
+                self._finish(job_id, status='done', result=result)
+            finally:
+                db.session.remove()
+
+    @staticmethod
+    def _finish(job_id, **values):
+        """Record the outcome of a job."""
+        db.session.execute(
+            update(Job).where(Job.id_ == job_id).values(finished_at=datetime.utcnow(), **values)
+        )
+        db.session.commit()
+
+
+class BackgroundJobs:
+    """
+    Flask extension holding the job runner of an application.
+    """
+
+    def init_app(self, app):
+        """
+        Create the job runner of the app.
+        :param app: Flask application instance.
+        :return: None
+        """
+        app.extensions['jobs'] = JobRunner(
+            app, app.config.get('JOB_WORKERS', 2), app.config.get('JOB_CHUNK_SIZE', 500)
+        )
+
+
+def get_job_runner():
+    """
+    Get the job runner of the current application.
+    :return: JobRunner instance.
+    """
+    return current_app.extensions['jobs']
+
+
+def get_job(job_id):
+    """
+    Get a job by id, reloading it to report its latest progress.
+    :param job_id: Id of the job (int or str).
+    :return: Job with id=job_id, None if no such job.
+    """
+    job_id = writes.parse_id(job_id)
+    return None if job_id is None else db.session.get(Job, job_id, populate_existing=True)
+
+
+@job('delete-department')
+def delete_department(context, dep_id, version=None):
+    """
+    Delete a department and its employees, a chunk of employees per transaction.
+    :param context: JobContext of the job.
+    :param dep_id: Id of the department (int).
+    :param version: The version of the department to delete, None for any version.
+    :return: {"deleted": True if the department existed}
+    :raise StaleDataError: if the department is not at the given version.
+    """
+    current = db.session.execute(
+        select(Department.version).where(Department.id_ == dep_id)
+    ).scalar()
+    if current is None:
+        return {'deleted': False}
+    if version is not None and current != version:
+        raise StaleDataError(f'Department with id = {dep_id} is not at version {version}')
+    criteria = Employee.department_id == dep_id
+    context.set_total(
+        db.session.execute(select(func.count(Employee.id_)).where(criteria)).scalar() + 1
+    )
+    while True:
+        emp_ids = db.session.execute(
+            select(Employee.id_).where(criteria).limit(context.chunk_size)
+        ).scalars().all()
+        if not emp_ids:
+            break
+        writes.delete_where(Employee, criteria, Employee.id_.in_(emp_ids))
+        context.advance(len(emp_ids))
+    deleted = writes.delete_by_id(Department, dep_id, version)
+    context.advance(1)
+    return {'deleted': deleted}
+
+
+@job('refresh-analytics')
+def refresh_analytics(context):
+    """
+    Reload the analytics snapshot of the process running the job, a chunk of
+    employees per query.
+    :param context: JobContext of the job.
+    :return: {"rows": number of employees loaded}
+    :raise ValueError: if the analytics snapshot is disabled.
+    """
+    snapshot = get_snapshot()
+    if snapshot is None:
+        raise ValueError('The analytics snapshot is disabled')
+    context.set_total(snapshot.count())
+    return {'rows': snapshot.reload(context.chunk_size, context.advance)}
+
+
+@job('prune-changes')
+def prune_change_log(context):
+    """
+    Delete the changes older than "CHANGE_LOG_RETENTION" seconds from the change log.
+    :param context: JobContext of the job.
+    :return: {"deleted": number of deleted changes}
+    """
+    retention = current_app.config.get('CHANGE_LOG_RETENTION', 7 * 24 * 3600)
+    return {'deleted': prune_changes(retention, context.chunk_size, context.advance)}
+
+
+background_jobs = BackgroundJobs()
@@ -0,0 +1,442 @@
+# pylint: disable=E1101
+""" Module contains Stats Service class with methods for aggregate queries on employees."""
+from collections import Counter
+
+from sqlalchemy import case, func
+
+from department_app.models import db, Department, Employee
+from department_app.models.replicas import read_only
+from department_app.models.sharding import current_shard, get_router, scatter
+from department_app.service.analytics import (
+    bucket_lowers, day_number, get_snapshot, years_before
+)
+
+DAYS_IN_YEAR = 365.2425
+
+
+def age_at(date_of_birth, as_of):
+    """
+    Get the age in full years at a given date.
+    :param date_of_birth: date object.
+    :param as_of: date object the age is computed at.
+    :return: int.
+    """
+    return as_of.year - date_of_birth.year - (
+        (as_of.month, as_of.day) < (date_of_birth.month, date_of_birth.day)
+    )
+
+
+def _day_number_expression(column):
+    """
+    Build a SQL expression converting a date column to days since 1970-01-01.
+    :param column: A Date column.
+    :return: A SQL expression.
+    """
+    if db.engine.dialect.name == 'sqlite':
+        return func.julianday(column) - 2440587.5
+    return func.to_days(column) - 719528
+
+
+class StatsServices:
+    """Class with methods computing aggregates over employees inside the DB."""
+
+    @staticmethod
+    def _salary_query(dep_id=None):
+        """
+        Build a base query on employees, optionally narrowed to one department.
+        :param dep_id: Id of the department to narrow the query to (int) or None.
+        :return: A Query object.
+        """
+        query = db.session.query(Employee.salary)
+        if dep_id is not None:
+            query = query.filter(Employee.department_id == dep_id)
+        return query
+
+    @staticmethod
+    def _percentile(dep_id, count, percentile):
+        """
+        Compute a percentile with linear interpolation between the closest ranks.
+        Only the one or two rows around the rank are fetched, by offset on the
+        ordered salary column (served by "ix_employees_salary").
+        :param dep_id: Id of the department or None for all employees.
+        :param count: Number of salaries in the set (int > 0).
+        :param percentile: The percentile to compute (0 <= percentile <= 100).
+        :return: The percentile value.
+        """
+        rank = percentile / 100 * (count - 1)
+        lower = int(rank)
+        rows = StatsServices._salary_query(dep_id).order_by(
+            Employee.salary
+        ).offset(lower).limit(2).all()
+        value = rows[0].salary
+        if len(rows) > 1 and rank > lower:
+            value += (rows[1].salary - value) * (rank - lower)
+        return round(value, 2)
+
+    @staticmethod
+    def _fixed_counts(dep_id, bucket_width):
+        """
+        Count salaries in fixed-width buckets, grouping by the bucket lower bound in SQL.
+        :param dep_id: Id of the department or None for all employees.
+        :param bucket_width: Width of every bucket (int > 0).
+        :return: A dict {bucket lower bound: count} of the non-empty buckets.
+        """
+        lower_bound = Employee.salary - Employee.salary % bucket_width
+        query = db.session.query(lower_bound.label('lower'), func.count())
+        if dep_id is not None:
+            query = query.filter(Employee.department_id == dep_id)
+        return dict(query.group_by(lower_bound).all())
+
+    @staticmethod
+    def _fixed_histogram(counts, bucket_width, lowers):
+        """
+        Build fixed-width histogram buckets from their counts.
+        :param counts: A dict {bucket lower bound: count} (see _fixed_counts).
+        :param bucket_width: Width of every bucket (int > 0).
+        :param lowers: Lower bounds of the buckets, from the lowest to the highest
+        non-empty one (see bucket_lowers).
+        :return: A list of buckets.
+        """
+        return [
+            {'min': lower, 'max': lower + bucket_width, 'count': counts.get(lower, 0)}
+            for lower in lowers
+        ]
+
+    @staticmethod
+    def _custom_counts(dep_id, edges):
+        """
+        Count salaries in buckets delimited by the given edges, grouping in SQL.
+        Bucket 0 holds salaries below the first edge, bucket len(edges) the
+        salaries from the last edge on.
+        :param dep_id: Id of the department or None for all employees.
+        :param edges: Ascending list of bucket edges.
+        :return: A dict {bucket index: count} of the non-empty buckets.
+        """
+        bucket = case(
+            *[(Employee.salary < edge, index) for index, edge in enumerate(edges)],
+            else_=len(edges)
+        )
+        query = db.session.query(bucket.label('bucket'), func.count())
+        if dep_id is not None:
+            query = query.filter(Employee.department_id == dep_id)
+        return dict(query.group_by(bucket).all())
+
+    @staticmethod
+    def _custom_histogram(counts, edges):
+        """
+        Build the buckets delimited by the given edges from their counts. The open
+        buckets below the first and from the last edge are reported only when not empty.
+        :param counts: A dict {bucket index: count} (see _custom_counts).
+        :param edges: Ascending list of bucket edges.
+        :return: A list of buckets.
+        """
+        bounds = [None, *edges, None]
+        return [
+            {'min': bounds[index], 'max': bounds[index + 1], 'count': counts.get(index, 0)}
+            for index in range(len(bounds) - 1)
+            if 0 < index < len(edges) or counts.get(index)
+        ]
+
+    @staticmethod
+    @read_only
+    def get_salary_stats(dep_id=None, percentiles=(50, 90), bucket_width=None, edges=None,
+                         max_buckets=1000):
+        """
+        Get salary distribution statistics for a department or the whole organisation.
+        All aggregates and bucket counts are computed by the DB, or by the analytics
+        snapshot if it is enabled.
+        :param dep_id: Id of the department (int) or None for all employees.
+        :param percentiles: Iterable of percentiles to compute (0 <= p <= 100).
+        :param bucket_width: Width of fixed-width histogram buckets (int > 0).
+        :param edges: Ascending list of custom histogram edges, takes precedence
+        over bucket_width.
+        :param max_buckets: Maximal number of fixed-width histogram buckets.
+        :return: A dict with count, mean, min, max, percentiles and histogram.
+        Values are None and histogram is empty if there are no employees.
+        :raise ValueError: if bucket_width makes more than max_buckets buckets.
+        """
+        snapshot = get_snapshot()
+        if snapshot is not None:
+            return snapshot.salary_stats(dep_id, percentiles, bucket_width, edges, max_buckets)
+        if dep_id is None and get_router() is not None:
+            return StatsServices._merged_salary_stats(percentiles, bucket_width, edges,
+                                                      max_buckets)
+        count, mean, minimum, maximum = StatsServices._salary_query(dep_id).with_entities(
+            func.count(Employee.salary),
+            func.avg(Employee.salary),
+            func.min(Employee.salary),
+            func.max(Employee.salary),
+        ).one()
+        stats = {
+            'count': count,
+            'mean': round(float(mean), 2) if count else None,
+            'min': minimum,
+            'max': maximum,
+            'percentiles': {
+                f'p{percentile:g}': (
+                    StatsServices._percentile(dep_id, count, percentile) if count else None
+                )
+                for percentile in percentiles
+            },
+            'histogram': [],
+        }
+        if count and edges:
+            stats['histogram'] = StatsServices._custom_histogram(
+                StatsServices._custom_counts(dep_id, edges), edges
+            )
+        elif count and bucket_width:
+            stats['histogram'] = StatsServices._fixed_histogram(
+                StatsServices._fixed_counts(dep_id, bucket_width), bucket_width,
+                bucket_lowers(minimum, maximum, bucket_width, max_buckets)
+            )
+        return stats
+
+    @staticmethod
+    def _merged_salary_stats(percentiles, bucket_width, edges, max_buckets):
+        """
+        Compute the statistics of get_salary_stats for all employees of all shards.
+        Every shard computes its aggregates and bucket counts, which are combined,
+        and percentiles are selected across shards (see _merged_percentile), so
+        salaries are never loaded.
+        :return: A dict with count, mean, min, max, percentiles and histogram.
+        """
+        shards = scatter(lambda: StatsServices._salary_query().with_entities(
+            func.count(Employee.salary),
+            func.sum(Employee.salary),
+            func.min(Employee.salary),
+            func.max(Employee.salary),
+        ).one())
+        counts = [count for count, _, _, _ in shards]
+        count = sum(counts)
+        stats = {
+            'count': count,
+            'mean': round(sum(total or 0 for _, total, _, _ in shards) / count, 2)
+            if count else None,
+            'min': min((minimum for _, _, minimum, _ in shards if minimum is not None),
+                       default=None),
+            'max': max((maximum for _, _, _, maximum in shards if maximum is not None),
+                       default=None),
+            'percentiles': {
+                f'p{percentile:g}': (
+                    StatsServices._merged_percentile(counts, percentile) if count else None
+                )
+                for percentile in percentiles
+            },
+            'histogram': [],
+        }
+        if count and edges:
+            stats['histogram'] = StatsServices._custom_histogram(
+                sum(map(Counter, scatter(lambda: StatsServices._custom_counts(None, edges))),
+                    Counter()),
+                edges
+            )
+        elif count and bucket_width:
+            stats['histogram'] = StatsServices._fixed_histogram(
+                sum(map(Counter, scatter(lambda: StatsServices._fixed_counts(None, bucket_width))),
+                    Counter()),
+                bucket_width,
+                bucket_lowers(stats['min'], stats['max'], bucket_width, max_buckets)
+            )
+        return stats
+
+    @staticmethod
+    def _merged_percentile(counts, percentile):
+        """
+        Compute a percentile of the salaries of all shards with linear interpolation
+        between the closest ranks, like _percentile.
+        :param counts: Number of salaries in every shard, in the order of scatter().
+        :param percentile: The percentile to compute (0 <= percentile <= 100).
+        :return: The percentile value.
+        """
+        rank = percentile / 100 * (sum(counts) - 1)
+        lower = int(rank)
+        value, not_above = StatsServices._select(counts, lower)
+        if lower + 1 < sum(counts) and rank > lower:
+            following = value
+            if not_above <= lower + 1:
+                following = min(above for above in scatter(
+                    lambda: StatsServices._salary_query().filter(
+                        Employee.salary > value
+                    ).with_entities(func.min(Employee.salary)).scalar()
+                ) if above is not None)
+            value += (following - value) * (rank - lower)
+        return round(value, 2)
+
+    @staticmethod
+    def _select(counts, rank):
+        """
+        Find the salary at a rank of the salaries of all shards, by a k-way selection.
+        Every shard keeps a range of its ordered salaries which may hold the salary.
+        Each round every shard fetches the middle salary of its range by offset,
+        the median of these weighted by the range sizes is counted in every shard,
+        and the ranges are cut to the salaries below or above it, which drops at
+        least a quarter of the salaries left.
+        :param counts: Number of salaries in every shard, in the order of scatter().
+        :param rank: The rank of the salary, from 0 to sum(counts) - 1.
+        :return: A tuple (salary, number of salaries not above it).
+        """
+        ranges = [[0, count] for count in counts]
+
+        def probe():
+            start, end = ranges[current_shard()]
+            if start >= end:
+                return None
+            middle = StatsServices._salary_query().order_by(
+                Employee.salary
+            ).offset((start + end) // 2).limit(1).scalar()
+            return middle, end - start
+
+        def count_around(pivot):
+            return lambda: StatsServices._salary_query().with_entities(
+                func.count(case((Employee.salary < pivot, 1))),
+                func.count(case((Employee.salary <= pivot, 1))),
+            ).one()
+
+        while True:
+            middles = sorted(middle for middle in scatter(probe) if middle is not None)
+            weight = sum(size for _, size in middles) / 2
+            for pivot, size in middles:
+                weight -= size
+                if weight <= 0:
+                    break
+            around = scatter(count_around(pivot))
+            below = sum(less for less, _ in around)
+            not_above = sum(less_or_equal for _, less_or_equal in around)
+            if below <= rank < not_above:
+                return pivot, not_above
+            for bounds, (less, less_or_equal) in zip(ranges, around):
+                if rank < below:
+                    bounds[1] = min(bounds[1], less)
+                else:
+                    bounds[0] = max(bounds[0], less_or_equal)
+
+    @staticmethod
+    @read_only
+    def get_department_stats(percentiles=(50, 90)):
+        """
+        Get headcount, average salary and salary percentiles of every department
+        with employees. Served from the analytics snapshot if it is enabled.
+        With sharded employees every shard computes the stats of its departments.
+        :param percentiles: Iterable of percentiles to compute (0 <= p <= 100).
+        :return: A dict {department id: dict with headcount, avg_salary, percentiles}.
+        """
+        snapshot = get_snapshot()
+        if snapshot is not None:
+            return snapshot.department_stats(percentiles)
+        stats = {}
+        for shard_stats in scatter(lambda: StatsServices._department_stats(percentiles)):
+            stats.update(shard_stats)
+        return dict(sorted(stats.items()))
+
+    @staticmethod
+    def _department_stats(percentiles):
+        """
+        Run the queries of get_department_stats.
+        :return: A dict {department id: dict with headcount, avg_salary, percentiles}.
+        """
+        rows = db.session.query(
+            Employee.department_id, func.count(Employee.id_), func.avg(Employee.salary)
+        ).group_by(Employee.department_id).all()
+        return {
+            dep_id: {
+                'headcount': count,
+                'avg_salary': round(float(average), 2),
+                'percentiles': {
+                    f'p{percentile:g}': StatsServices._percentile(dep_id, count, percentile)
+                    for percentile in percentiles
+                },
+            }
+            for dep_id, count, average in rows
+        }
+
+    @staticmethod
+    def _age_summary(as_of, youngest, oldest, mean_day):
+        """
+        Build the ages part of the department age statistics.
+        :param as_of: date object the ages are computed at.
+        :param youngest: Latest date of birth or None.
+        :param oldest: Earliest date of birth or None.
+        :param mean_day: Average date of birth as day number or None.
+        :return: A dict with average_age, youngest and oldest ages.
+        """
+        if youngest is None:
+            return {'average_age': None, 'youngest': None, 'oldest': None}
+        return {
+            'average_age': round((day_number(as_of) - float(mean_day)) / DAYS_IN_YEAR, 2),
+            'youngest': age_at(youngest, as_of),
+            'oldest': age_at(oldest, as_of),
+        }
+
+    @staticmethod
+    @read_only
+    def get_age_stats(as_of, ages):
+        """
+        Get age distribution of every department at a given date. Band edges are
+        converted to date-of-birth bounds up front, so every band is one range count
+        on "ix_employees_date_of_birth" grouped by department.
+        :param as_of: date object the ages are computed at.
+        :param ages: Ascending list of band edges in years, e.g. [20, 30, 40].
+        :return: A list of dicts, one per department, with headcount, counts of
+        the bands (younger than ages[0], [ages[0], ages[1]), ..., ages[-1] and older),
+        average_age, youngest and oldest ages.
+        """
+        dep_ids = [dep_id for dep_id, in db.session.query(Department.id_).order_by(Department.id_)]
+        snapshot = get_snapshot()
+        if snapshot is not None:
+            stats = []
+            for dep_id in dep_ids:
+                counts = snapshot.age_bands(as_of, ages, dep_id)
+                headcount, youngest, oldest, mean_day = snapshot.birth_summary(dep_id)
+                stats.append({
+                    'department_id': dep_id,
+                    'headcount': headcount,
+                    'age_bands': counts,
+                    **StatsServices._age_summary(as_of, youngest, oldest, mean_day),
+                })
+            return stats
+        bounds = [None, *(years_before(as_of, age) for age in ages), None]
+        band_counts = {dep_id: [0] * (len(ages) + 1) for dep_id in dep_ids}
+        summaries = {}
+        for counts, shard_summaries in scatter(lambda: StatsServices._birth_aggregates(bounds)):
+            for (index, dep_id), count in counts.items():
+                if dep_id in band_counts:
+                    band_counts[dep_id][index] = count
+            summaries.update(shard_summaries)
+        return [
+            {
+                'department_id': dep_id,
+                'headcount': sum(band_counts[dep_id]),
+                'age_bands': band_counts[dep_id],
+                **StatsServices._age_summary(as_of, *summaries.get(dep_id, (None,) * 3)),
+            }
+            for dep_id in dep_ids
+        ]
+
+    @staticmethod
+    def _birth_aggregates(bounds):
+        """
+        Count employees of every department in date of birth bands and summarize
+        their dates of birth.
+        :param bounds: Date of birth bounds of the bands, from the latest, None for open ends.
+        :return: A tuple (dict {(band index, department id): count},
+        dict {department id: (latest, earliest, mean day number)}).
+        """
+        counts = {}
+        for index in range(len(bounds) - 1):
+            query = db.session.query(Employee.department_id, func.count())
+            if bounds[index] is not None:
+                query = query.filter(Employee.date_of_birth <= bounds[index])
+            if bounds[index + 1] is not None:
+                query = query.filter(Employee.date_of_birth > bounds[index + 1])
+            for dep_id, count in query.group_by(Employee.department_id):
+                counts[index, dep_id] = count
+        summaries = {
+            dep_id: (youngest, oldest, mean_day)
+            for dep_id, youngest, oldest, mean_day in db.session.query(
+                Employee.department_id,
+                func.max(Employee.date_of_birth),
+                func.min(Employee.date_of_birth),
+                func.avg(_day_number_expression(Employee.date_of_birth)),
+            ).group_by(Employee.department_id)
+        }
+        return counts, summaries
@@ -0,0 +1,143 @@
+"""
+Module contains helpers to update and delete rows by primary key with one
+statement, without loading them as ORM instances first.
+
+The rows are marked as changed for the tracking subscribers (entity cache,
+analytics snapshot) and the change log since the statements bypass the unit of work. Whether a
+row existed is told by the number of affected rows; the MySQL dialects count
+matched rows, so an UPDATE setting the current values still counts.
+
+Updates increment the version column of the row. Given the version a client
+read, updates and deletes only apply to that version of the row (optimistic
+locking) and raise StaleDataError, like the unit of work, if the row changed
+in the meantime.
+
+Functions:
+    parse_id(value)
+    column_values(model, data)
+    update_by_id(model, primary_key, data, version)
+    delete_by_id(model, primary_key, version)
+    delete_where(model, *criteria)
+"""
+from sqlalchemy import delete, select, update
+from sqlalchemy.orm.exc import StaleDataError
+
+from department_app.models import db
+from department_app.models.tracking import mark_changed
+
+
+def parse_id(value):
+    """
+    Convert a primary key given in a URL to int.
+    :param value: The primary key (str or int).
+    :return: int, None if the value is not a number.
+    """
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def column_values(model, data):
+    """
+    Keep the values of the columns of a model, except its primary key and version.
+    :param model: The model class.
+    :param data: A dict of loaded data.
+    :return: A dict {attribute name: value}.
+    """
+    mapper = model.__mapper__
+    names = {attribute.key for attribute in mapper.column_attrs
+             if not any(column.primary_key or column is mapper.version_id_col
+                        for column in attribute.columns)}
+    return {key: value for key, value in data.items() if key in names}
+
+
+def _exists(session, model, *criteria):
+    """Check if a row matches criteria."""
+    return session.execute(select(model.id_).where(*criteria)).first() is not None
+
+
+def _check_version(session, model, primary_key, version):
+    """
+    Tell a missing row from a row of another version after a statement matched nothing.
+    :return: None
+    :raise StaleDataError: if the row exists.
+    """
+    if version is not None and _exists(session, model, model.id_ == primary_key):
+        raise StaleDataError(
+            f'{model.__name__} with id = {primary_key} is not at version {version}'
+        )
+
+
+def update_by_id(model, primary_key, data, version=None, session=None):
+    """
+    Update a row with one UPDATE statement in the session's transaction.
+    :param model: The model class.
+    :param primary_key: The primary key of the row (int).
+    :param data: A dict of loaded data, keys which are not columns are ignored.
+    :param version: The version of the row to update, None for any version.
+    :param session: The session running the statement, None for db.session.
+    :return: True if the row exists.
+    :raise StaleDataError: if the row is not at the given version.
+    """
+    if session is None:
+        session = db.session
+    criteria = [model.id_ == primary_key]
+    if version is not None:
+        criteria.append(model.version == version)
+    values = column_values(model, data)
+    if not values:
+        found = _exists(session, model, *criteria)
+    else:
+        result = session.execute(
+            update(model).where(*criteria).values(**values, version=model.version + 1)
+            .execution_options(synchronize_session=False)
+        )
+        found = result.rowcount > 0
+        if found:
+            mark_changed(session, model, primary_key)
+    if not found:
+        _check_version(session, model, primary_key, version)
+    return found
+
+
+def delete_by_id(model, primary_key, version=None):
+    """
+    Delete a row with one DELETE statement in the session's transaction.
+    :param model: The model class.
+    :param primary_key: The primary key of the row (int).
+    :param version: The version of the row to delete, None for any version.
+    :return: True if the row existed.
+    :raise StaleDataError: if the row is not at the given version.
+    """
+    criteria = [model.id_ == primary_key]
+    if version is not None:
+        criteria.append(model.version == version)
+    result = db.session.execute(
+        delete(model).where(*criteria).execution_options(synchronize_session=False)
+    )
+    if not result.rowcount:
+        _check_version(db.session, model, primary_key, version)
+        return False
+    mark_changed(db.session, model, primary_key, 'delete')
+    return True
+
+
+def delete_where(model, *criteria):
+    """
+    Delete the rows matching criteria with one DELETE statement in the session's
+    transaction. Only the primary keys of the rows are read first, to mark them
+    as changed.
+    :param model: The model class.
+    :param criteria: Filter expressions on the model columns.
+    :return: The number of deleted rows.
+    """
+    primary_keys = db.session.execute(select(model.id_).where(*criteria)).scalars().all()
+    if not primary_keys:
+        return 0
+    result = db.session.execute(
+        delete(model).where(*criteria).execution_options(synchronize_session=False)
+    )
+    for primary_key in primary_keys:
+        mark_changed(db.session, model, primary_key, 'delete')
+    return result.rowcount
@@ -12,12 +12,14 @@ class BaseTestCase(unittest.TestCase):
     """
     Base test case class
     """
+    # Configuration of the app under test
+    config_class = TestConfig
 
     def setUp(self):
         """
         Execute before every test case
         """
-        self.app = create_app(config_class=TestConfig)
+        self.app = create_app(config_class=self.config_class)
         self.app_context = self.app.app_context()
         self.app_context.push()
         db.create_all()
@@ -0,0 +1,186 @@
+# pylint: disable=R0201
+""""Module contains test for the columnar employee snapshot of the analytics engine"""
+import unittest
+from datetime import date
+
+from config import TestConfig
+from department_app import create_app, db
+from department_app.models.population import populate_bd
+from department_app.service import EmployeeServices, StatsServices
+from department_app.service.analytics import Columns, EmployeeSnapshot, get_snapshot, np
+
+
+class AnalyticsConfig(TestConfig):
+    """Configuration for testing with the analytics snapshot enabled"""
+    ANALYTICS_SNAPSHOT = True
+
+
+@unittest.skipIf(np is None, 'numpy is not installed')
+class TestEmployeeSnapshot(unittest.TestCase):
+    """
+    This is the class for analytics snapshot test cases
+    """
+
+    def setUp(self):
+        """
+        Execute before every test case
+        """
+        self.app = create_app(config_class=AnalyticsConfig)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        populate_bd()
+        self.snapshot = get_snapshot()
+
+    def tearDown(self):
+        """
+        Execute after every test case
+        """
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def _without_snapshot(self, method, *args, **kwargs):
+        """Call a StatsServices method with the analytics engine switched off."""
+        del self.app.extensions['analytics']
+        try:
+            return method(*args, **kwargs)
+        finally:
+            self.app.extensions['analytics'] = self.snapshot
+
+    def test_columns_layout(self):
+        """
+        Test the snapshot keeps 28 bytes per employee sorted by department and salary.
+        """
+        columns = self.snapshot.refresh()
+        assert sorted(columns.ids.tolist()) == list(range(1, 11))
+        order = np.lexsort((columns.salaries, columns.department_ids))
+        assert order.tolist() == list(range(10))
+        assert sum(column.nbytes for column in columns) == 10 * 16
+        # 28 bytes per employee and per department (id, row range and salary sum)
+        assert self.snapshot.nbytes == 10 * 28 + 3 * 28
+
+    def test_salary_stats_match_sql(self):
+        """
+        Test snapshot salary stats are identical to the SQL ones.
+        """
+        for dep_id in (None, 1, 2, 42):
+            for params in ({'bucket_width': 250}, {'edges': [1200, 1800]},
+                           {'percentiles': (0, 33.3, 50, 99.9, 100)}):
+                assert StatsServices.get_salary_stats(dep_id, **params) == \
+                       self._without_snapshot(StatsServices.get_salary_stats, dep_id, **params)
+        with self.assertRaises(ValueError):
+            StatsServices.get_salary_stats(bucket_width=1)
+
+    def test_age_stats_match_sql(self):
+        """
+        Test snapshot department age stats are identical to the SQL ones.
+        """
+        for as_of, ages in ((date(2022, 1, 1), [20, 30, 40, 50]), (date(2022, 4, 4), [23])):
+            assert StatsServices.get_age_stats(as_of, ages) == \
+                   self._without_snapshot(StatsServices.get_age_stats, as_of, ages)
+
+    def test_department_stats(self):
+        """
+        Test headcount, average and percentiles by department.
+        """
+        stats = StatsServices.get_department_stats((50,))
+        assert self.snapshot.headcount() == {1: 4, 2: 4, 3: 2}
+        assert stats[1] == {'headcount': 4, 'avg_salary': 1375, 'percentiles': {'p50': 1250}}
+        assert stats[3]['percentiles'] == {'p50': 1500}
+
+    def test_age_bands(self):
+        """
+        Test age band counts at a given date.
+        """
+        as_of = date(2022, 1, 1)
+        assert self.snapshot.age_bands(as_of, [20, 30, 40, 50]) == [1, 4, 2, 2, 1]
+        assert self.snapshot.age_bands(as_of, [40], dep_id=2) == [3, 1]
+        # an employee of department 1 turns 23 on 2022-04-04
+        assert self.snapshot.age_bands(date(2022, 4, 3), [23], dep_id=1) == [2, 2]
+        assert self.snapshot.age_bands(date(2022, 4, 4), [23], dep_id=1) == [1, 3]
+
+    def test_incremental_refresh(self):
+        """
+        Test committed changes are merged into the snapshot without a full reload.
+        """
+        self.snapshot.refresh()
+        loaded_at = self.snapshot.loaded_at
+        counter = self.snapshot.change_counter
+        EmployeeServices.create(dict(
+            full_name="New Employee", date_of_birth=date(1990, 1, 1),
+            salary=9000, department_id=3
+        ))
+        EmployeeServices.update(EmployeeServices.get_by_id(1), dict(salary=500))
+        EmployeeServices.delete(EmployeeServices.get_by_id(2))
+        assert self.snapshot.change_counter == counter + 3
+        self.snapshot.full_reload_ratio = 1
+        columns = self.snapshot.refresh()
+        assert self.snapshot.loaded_at == loaded_at
+        assert sorted(columns.ids.tolist()) == [1, *range(3, 12)]
+        assert columns.salaries[columns.ids == 1].tolist() == [500]
+        assert self.snapshot.headcount() == {1: 3, 2: 4, 3: 3}
+        assert StatsServices.get_salary_stats()['max'] == 9000
+
+    def test_incremental_sorted_views(self):
+        """
+        Test sorted views are updated in place by incremental refreshes and
+        match the ones of a full reload.
+        """
+        def aggregates():
+            return (self.snapshot.department_stats(), self.snapshot.salary_stats(dep_id=1),
+                    self.snapshot.age_bands(date(2022, 1, 1), [30, 50], dep_id=3))
+        aggregates()
+        EmployeeServices.update(EmployeeServices.get_by_id(1), dict(department_id=3))
+        EmployeeServices.update(EmployeeServices.get_by_id(4), dict(salary=1000))
+        EmployeeServices.delete(EmployeeServices.get_by_id(7))
+        EmployeeServices.create(dict(
+            full_name="New Employee", date_of_birth=date(1980, 1, 1),
+            salary=1000, department_id=1
+        ))
+        self.snapshot.full_reload_ratio = 1
+        loaded_at = self.snapshot.loaded_at
+        incremental = aggregates()
+        assert self.snapshot.loaded_at == loaded_at
+        assert self.snapshot.nbytes == 10 * 28 + 3 * 28
+        self.snapshot.invalidate()
+        assert aggregates() == incremental
+        assert self.snapshot.loaded_at > loaded_at
+        assert incremental[0][3]['headcount'] == 2
+
+    def test_merge_matches_build(self):
+        """
+        Test incremental refreshes of random changes, with new and emptied
+        departments, build the same arrays as a full load.
+        """
+        rng = np.random.default_rng(7)
+        rows = {emp_id: (int(rng.integers(1, 5)), int(rng.integers(100, 120)),
+                         int(rng.integers(-50, 50))) for emp_id in range(1, 201)}
+
+        def columns(ids):
+            return Columns(*(np.asarray(values, dtype=np.int32) for values in zip(
+                *[(emp_id, *rows[emp_id]) for emp_id in ids if emp_id in rows]
+            ))) if any(emp_id in rows for emp_id in ids) else \
+                Columns(*(np.empty(0, dtype=np.int32) for _ in Columns._fields))
+
+        snapshot = EmployeeSnapshot(max_age=float('inf'), full_reload_ratio=1)
+        snapshot._fetch = columns  # pylint: disable=W0212
+        snapshot.load(columns(rows))
+        for _ in range(30):
+            changed = rng.choice(260, int(rng.integers(1, 40)), replace=False) + 1
+            for emp_id in changed.tolist():
+                if rng.random() < 0.2:
+                    rows.pop(emp_id, None)
+                else:
+                    rows[emp_id] = (int(rng.integers(1, 8)), int(rng.integers(100, 120)),
+                                    int(rng.integers(-50, 50)))
+            snapshot.mark_dirty(changed.tolist())
+            merged = snapshot._current()  # pylint: disable=W0212
+            built = EmployeeSnapshot._build(columns(rows))  # pylint: disable=W0212
+            for field in ('department_ids', 'salaries'):
+                assert getattr(merged.columns, field).tolist() == \
+                       getattr(built.columns, field).tolist()
+            assert sorted(zip(*(column.tolist() for column in merged.columns))) == \
+                   sorted(zip(*(column.tolist() for column in built.columns)))
+            for field in merged._fields[1:]:
+                assert getattr(merged, field).tolist() == getattr(built, field).tolist(), field
@@ -0,0 +1,132 @@
+# pylint: disable=R0201
+""""Module contains tests for the entity cache"""
+import dataclasses
+from unittest import mock
+
+from config import TestConfig
+from department_app.models import db, Department, Employee
+from department_app.service import DepartmentServices, EmployeeServices
+from department_app.service.cache import get_entity_cache, record_key
+from department_app.tests.conftest import BaseTestCase
+
+
+class CacheConfig(TestConfig):
+    """Configuration for testing with the entity cache enabled"""
+    ENTITY_CACHE_SIZE = 10000
+
+
+class TestEntityCache(BaseTestCase):
+    """
+    This is the class for entity cache test cases
+    """
+    config_class = CacheConfig
+
+    def setUp(self):
+        """
+        Execute before every test case
+        """
+        super().setUp()
+        self.cache = get_entity_cache()
+
+    def test_read_through(self):
+        """
+        Test a record is loaded once and served from the cache afterwards
+        """
+        with mock.patch.object(EmployeeServices, 'get_by_id',
+                               wraps=EmployeeServices.get_by_id) as get_by_id:
+            first = EmployeeServices.get_cached(1)
+            second = EmployeeServices.get_cached('1')
+        self.assertEqual(get_by_id.call_count, 1)
+        self.assertIs(first, second)
+        self.assertEqual(first.full_name, 'Vladyslav Radchenko')
+        self.assertEqual(first.department.title, 'Python')
+        self.assertEqual(self.cache.stats()['hits'], 1)
+        self.assertEqual(self.cache.stats()['misses'], 2)
+
+    def test_immutable(self):
+        """
+        Test cached records can't be changed
+        """
+        department = DepartmentServices.get_cached(1)
+        self.assertNotIsInstance(department, Department)
+        with self.assertRaises(dataclasses.FrozenInstanceError):
+            department.title = 'Changed'
+
+    def test_negative_caching(self):
+        """
+        Test missing ids are cached until a row with the id is created
+        """
+        with mock.patch.object(DepartmentServices, 'get_by_id',
+                               wraps=DepartmentServices.get_by_id) as get_by_id:
+            self.assertFalse(DepartmentServices.exists(4))
+            self.assertFalse(DepartmentServices.exists(4))
+            self.assertEqual(get_by_id.call_count, 1)
+            DepartmentServices.create({'title': 'Golang'})
+            self.assertTrue(DepartmentServices.exists(4))
+        self.assertFalse(DepartmentServices.exists('abc'))
+
+    def test_invalidation(self):
+        """
+        Test committed updates and deletes invalidate the cached records
+        """
+        self.assertEqual(EmployeeServices.get_cached(1).salary, 1500)
+        EmployeeServices.update(EmployeeServices.get_by_id(1), {'salary': 1700})
+        self.assertEqual(EmployeeServices.get_cached(1).salary, 1700)
+        self.assertIsNotNone(EmployeeServices.get_cached(3))
+        DepartmentServices.delete(DepartmentServices.get_by_id(2))
+        self.assertIsNone(DepartmentServices.get_cached(2))
+        self.assertIsNone(EmployeeServices.get_cached(3))
+        self.assertGreaterEqual(self.cache.stats()['invalidations'], 2)
+
+    def test_rollback(self):
+        """
+        Test rolled back changes don't invalidate the cache
+        """
+        EmployeeServices.get_cached(1)
+        employee = Employee.query.get(1)
+        employee.salary = 10
+        db.session.flush()
+        db.session.rollback()
+        self.assertEqual(self.cache.stats()['invalidations'], 0)
+        self.assertEqual(EmployeeServices.get_cached(1).salary, 1500)
+
+    def test_stale_load(self):
+        """
+        Test records loaded before a commit are not cached
+        """
+        cache = self.cache
+        generation = cache.generation
+        EmployeeServices.update(EmployeeServices.get_by_id(1), {'salary': 1700})
+        cache.set(record_key(Employee, 1), 'stale', generation)
+        self.assertEqual(EmployeeServices.get_cached(1).salary, 1700)
+
+    def test_rest(self):
+        """
+        Test REST responses of cached records match the database
+        """
+        response = self.client.get('/api/v1/departments/1')
+        self.assertEqual(response.json['title'], 'Python')
+        self.assertEqual(len(response.json['employees']),
+                         Employee.query.filter_by(department_id=1).count())
+        self.client.put('/api/v1/departments/1', json={'title': 'Python 3'})
+        response = self.client.get('/api/v1/departments/1?fields=title')
+        self.assertEqual(response.json, {'title': 'Python 3'})
+        response = self.client.get('/api/v1/employees/1?fields=department&fields[department]=title')
+        self.assertEqual(response.json, {'department': {'title': 'Python 3'}})
+        response = self.client.get('/api/v1/system/cache')
+        self.assertTrue(response.json['enabled'])
+        self.assertGreater(response.json['hits'], 0)
+
+
+class TestEntityCacheDisabled(BaseTestCase):
+    """
+    This is the class for test cases without the entity cache
+    """
+
+    def test_disabled(self):
+        """
+        Test the cache is disabled by default and lookups go to the database
+        """
+        self.assertNotIn('entity_cache', self.app.extensions)
+        self.assertEqual(EmployeeServices.get_cached(1).salary, 1500)
+        self.assertEqual(self.client.get('/api/v1/system/cache').json, {'enabled': False})
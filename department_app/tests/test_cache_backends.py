@@ -0,0 +1,212 @@
+# pylint: disable=R0201
+""""Module contains tests for the cache backends"""
+import os
+import tempfile
+from unittest import mock
+
+from config import TestConfig
+from department_app import create_app, db
+from department_app.models import Employee
+from department_app.models.population import populate_bd
+from department_app.service import EmployeeServices
+from department_app.service.cache_backends import (
+    ABSENT, DATA_VERSION, MemoryBackend, SQLiteBackend, default_sqlite_path, get_data_version
+)
+from department_app.service.cache import get_entity_cache, record_key
+from department_app.tests.conftest import BaseTestCase
+
+
+class BackendTests:
+    """
+    Test cases run against every backend
+    """
+
+    def make_backend(self, max_size):
+        """
+        Make the tested backend
+        """
+        raise NotImplementedError
+
+    def test_get_set_delete(self):
+        """
+        Test values are stored, replaced and deleted
+        """
+        backend = self.make_backend(10)
+        self.assertIs(backend.get('a'), ABSENT)
+        backend.set('a', {'value': 1})
+        backend.set('b', None)
+        self.assertEqual(backend.get('a'), {'value': 1})
+        self.assertIsNone(backend.get('b'))
+        self.assertEqual(backend.delete(['a', 'c']), 1)
+        self.assertIs(backend.get('a'), ABSENT)
+        backend.clear()
+        self.assertEqual(backend.size(), 0)
+
+    def test_eviction(self):
+        """
+        Test values above max_size are evicted
+        """
+        backend = self.make_backend(2)
+        for key in 'abc':
+            backend.set(key, key)
+        self.assertEqual(backend.size(), 2)
+        self.assertIs(backend.get('a'), ABSENT)
+        self.assertEqual(backend.get('c'), 'c')
+        self.assertEqual(backend.evictions, 1)
+
+    def test_expiry(self):
+        """
+        Test values expire after their TTL
+        """
+        backend = self.make_backend(2)
+        with mock.patch('department_app.service.cache_backends.time') as time_mock:
+            time_mock.monotonic.return_value = time_mock.time.return_value = 100
+            backend.set('a', 1, ttl=10)
+            backend.set('b', 2)
+            self.assertEqual(backend.get('a'), 1)
+            time_mock.monotonic.return_value = time_mock.time.return_value = 111
+            self.assertIs(backend.get('a'), ABSENT)
+            self.assertEqual(backend.get('b'), 2)
+
+    def test_versions(self):
+        """
+        Test version counters
+        """
+        backend = self.make_backend(2)
+        self.assertEqual(backend.get_version('v'), 0)
+        self.assertEqual(backend.incr_version('v'), 1)
+        self.assertEqual(backend.incr_version('v'), 2)
+        self.assertEqual(backend.get_version('v'), 2)
+
+
+class TestMemoryBackend(BackendTests, BaseTestCase):
+    """
+    This is the class for the in-process backend test cases
+    """
+
+    def make_backend(self, max_size):
+        """
+        Make the tested backend
+        """
+        return MemoryBackend(max_size)
+
+    def test_lru(self):
+        """
+        Test the least recently used values are evicted first
+        """
+        backend = self.make_backend(2)
+        backend.set('a', 1)
+        backend.set('b', 2)
+        backend.get('a')
+        backend.set('c', 3)
+        self.assertIs(backend.get('b'), ABSENT)
+        self.assertEqual(backend.get('a'), 1)
+
+
+class TestSQLiteBackend(BackendTests, BaseTestCase):
+    """
+    This is the class for the shared SQLite backend test cases
+    """
+
+    def setUp(self):
+        """
+        Execute before every test case
+        """
+        super().setUp()
+        handle, self.path = tempfile.mkstemp(suffix='.sqlite')
+        os.close(handle)
+
+    def tearDown(self):
+        """
+        Execute after every test case
+        """
+        super().tearDown()
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(self.path + suffix):
+                os.remove(self.path + suffix)
+
+    def make_backend(self, max_size):
+        """
+        Make the tested backend
+        """
+        return SQLiteBackend(self.path, 'test', max_size)
+
+    def test_shared(self):
+        """
+        Test values and versions are shared between backends of the same file
+        and namespaces are separate
+        """
+        first, second = self.make_backend(10), self.make_backend(10)
+        other = SQLiteBackend(self.path, 'other', 10)
+        first.set('a', 1)
+        first.incr_version('v')
+        self.assertEqual(second.get('a'), 1)
+        self.assertIs(other.get('a'), ABSENT)
+        self.assertEqual(other.get_version('v'), 1)
+        second.delete(['a'])
+        self.assertIs(first.get('a'), ABSENT)
+
+    def test_default_path(self):
+        """
+        Test the default file is in the instance folder and named after the database
+        """
+        path = default_sqlite_path(self.app)
+        self.assertEqual(os.path.dirname(path), self.app.instance_path)
+        self.assertEqual(path, default_sqlite_path(self.app))
+        for uri in ('sqlite:////tmp/other.db', 'mysql://user@localhost/department_app'):
+            with mock.patch.dict(self.app.config, SQLALCHEMY_DATABASE_URI=uri):
+                self.assertNotEqual(default_sqlite_path(self.app), path)
+        with mock.patch('os.getpid', return_value=-1):
+            self.assertNotEqual(default_sqlite_path(self.app), path)
+
+
+class SharedCacheConfig(TestConfig):
+    """Configuration for testing with the shared SQLite cache backend"""
+    CACHE_BACKEND = 'sqlite'
+    ENTITY_CACHE_SIZE = 10000
+
+
+class TestSharedCache(BaseTestCase):
+    """
+    This is the class for test cases of two workers sharing the SQLite backend
+    """
+
+    def setUp(self):
+        """
+        Execute before every test case
+        """
+        handle, SharedCacheConfig.CACHE_SQLITE_PATH = tempfile.mkstemp(suffix='.sqlite')
+        os.close(handle)
+        self.worker = create_app(config_class=SharedCacheConfig)
+        self.app = create_app(config_class=SharedCacheConfig)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        populate_bd()
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        """
+        Execute after every test case
+        """
+        super().tearDown()
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(SharedCacheConfig.CACHE_SQLITE_PATH + suffix):
+                os.remove(SharedCacheConfig.CACHE_SQLITE_PATH + suffix)
+
+    def test_invalidation_between_workers(self):
+        """
+        Test a write of one worker invalidates the entries cached by another
+        """
+        with self.worker.app_context():
+            version = get_data_version()
+            self.assertEqual(get_entity_cache().backend.name, 'sqlite')
+            get_entity_cache().set(record_key(Employee, 1), 'cached', version)
+        self.assertEqual(EmployeeServices.get_cached(1), 'cached')
+        EmployeeServices.update(EmployeeServices.get_by_id(1), {'salary': 1700})
+        with self.worker.app_context():
+            self.assertGreater(get_data_version(), version)
+            self.assertEqual(
+                get_entity_cache().versions.get_version(DATA_VERSION), get_data_version()
+            )
+            self.assertIs(get_entity_cache().get(record_key(Employee, 1)), ABSENT)
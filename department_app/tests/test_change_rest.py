@@ -0,0 +1,43 @@
+# pylint: disable=R0201
+""""Module contains tests for the change feed REST API"""
+from department_app.tests.conftest import BaseTestCase
+
+
+class TestChangesApi(BaseTestCase):
+    """
+    This is the class for change feed api test cases
+    """
+
+    def test_changes_get(self):
+        """
+        Test reading the changes after a cursor, tombstones included
+        """
+        response = self.client.get("/api/v1/changes?limit=2")
+        assert response.status_code == 200
+        assert [change["entity_id"] for change in response.json["changes"]] == [1, 2]
+        assert response.json["changes"][0]["operation"] == "insert"
+        assert (response.json["next"], response.json["more"]) == (2, True)
+        assert response.json["resync"] is False
+        self.client.delete("/api/v1/employees/1")
+        response = self.client.get("/api/v1/changes?since=13")
+        assert response.status_code == 200
+        change = response.json["changes"][0]
+        assert (change["id_"], change["entity"], change["entity_id"], change["operation"]) == \
+               (14, "employee", 1, "delete")
+        assert (response.json["next"], response.json["more"]) == (14, False)
+
+    def test_changes_get_resync(self):
+        """
+        Test clients with a cursor unknown to the log are told to resync
+        """
+        response = self.client.get("/api/v1/changes?since=42")
+        assert response.status_code == 200
+        assert response.json == {"changes": [], "next": 13, "more": False, "resync": True}
+
+    def test_changes_get_wrong_parameters(self):
+        """
+        Test invalid cursors and limits
+        """
+        for query in ("since=abc", "since=-1", "limit=0", "limit=1001"):
+            response = self.client.get(f"/api/v1/changes?{query}")
+            assert response.status_code == 400
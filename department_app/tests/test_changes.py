@@ -0,0 +1,172 @@
+# pylint: disable=R0201
+""""Module contains tests for the change log and change feed"""
+import os
+import tempfile
+import threading
+import unittest
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from config import TestConfig
+from department_app import create_app, db
+from department_app.models import Change, Department, Employee
+from department_app.models.changelog import ENABLED_KEY, _write_log
+from department_app.models.population import populate_bd
+from department_app.service import DepartmentServices, EmployeeServices, writes
+from department_app.service.changes import get_changes, prune_changes
+from department_app.service.jobs import get_job, get_job_runner
+from department_app.tests.conftest import BaseTestCase
+
+
+def entries(feed):
+    """
+    Get the (entity, entity_id, operation) tuples of the changes of a feed
+    """
+    return [(change.entity, change.entity_id, change.operation) for change in feed['changes']]
+
+
+class TestChanges(BaseTestCase):
+    """
+    This is the class for change log test cases
+    """
+
+    def test_log(self):
+        """
+        Test committed inserts, updates and deletes are logged with their net operation
+        """
+        feed = get_changes()
+        self.assertEqual(entries(feed)[:3], [('department', 1, 'insert'),
+                                             ('department', 2, 'insert'),
+                                             ('department', 3, 'insert')])
+        self.assertEqual(len(feed['changes']), 13)
+        self.assertEqual((feed['next'], feed['more'], feed['resync']), (13, False, False))
+        EmployeeServices.update_by_id(1, {'salary': 2000})
+        DepartmentServices.delete(DepartmentServices.get_by_id(3))
+        employee = Employee(full_name='Test Name', date_of_birth=date(1990, 1, 1),
+                            salary=1000, department_id=1)
+        db.session.add(employee)
+        db.session.flush()
+        db.session.delete(employee)
+        db.session.commit()
+        DepartmentServices.update(DepartmentServices.get_by_id(1), {'title': 'Rust'})
+        db.session.add(Department(title='Go'))
+        db.session.rollback()
+        feed = get_changes(13)
+        self.assertEqual(sorted(entries(feed)[:4]), [('department', 3, 'delete'),
+                                                     ('employee', 1, 'update'),
+                                                     ('employee', 7, 'delete'),
+                                                     ('employee', 8, 'delete')])
+        self.assertEqual(entries(feed)[4:], [('department', 1, 'update')])
+        self.assertEqual(feed['next'], 18)
+
+    def test_pages(self):
+        """
+        Test the feed is read a page at a time after a cursor
+        """
+        feed = get_changes(limit=5)
+        self.assertEqual([change.id_ for change in feed['changes']], [1, 2, 3, 4, 5])
+        self.assertEqual((feed['next'], feed['more']), (5, True))
+        feed = get_changes(10, 5)
+        self.assertEqual((len(feed['changes']), feed['next'], feed['more']), (3, 13, False))
+        feed = get_changes(13)
+        self.assertEqual((feed['changes'], feed['next'], feed['resync']), ([], 13, False))
+
+    def test_prune(self):
+        """
+        Test old changes are pruned except the last one and clients before them resync
+        """
+        db.session.execute(update(Change).values(
+            changed_at=datetime.utcnow() - timedelta(days=30)
+        ))
+        db.session.commit()
+        EmployeeServices.update_by_id(1, {'salary': 2000})
+        self.assertEqual(prune_changes(24 * 3600, chunk_size=5), 13)
+        self.assertEqual(Change.query.count(), 1)
+        feed = get_changes(10)
+        self.assertEqual((feed['changes'], feed['next'], feed['resync']), ([], 14, True))
+        self.assertTrue(get_changes()['resync'])
+        self.assertFalse(get_changes(13)['resync'])
+        self.assertTrue(get_changes(15)['resync'])
+        self.assertEqual(prune_changes(0), 0)
+
+    def test_prune_job(self):
+        """
+        Test the change log is pruned by a background job
+        """
+        self.app.config['CHANGE_LOG_RETENTION'] = 0
+        job = get_job_runner().submit('prune-changes')
+        get_job_runner().wait(job.id_, 10)
+        job = get_job(job.id_)
+        self.assertEqual((job.status, job.result), ('done', {'deleted': 12}))
+        self.assertEqual([change.id_ for change in Change.query.all()], [13])
+
+    def test_disabled(self):
+        """
+        Test the change log is not written with "CHANGE_LOG" unset
+        """
+        self.app.config['CHANGE_LOG'] = False
+        EmployeeServices.update_by_id(1, {'salary': 2000})
+        self.assertEqual(Change.query.count(), 13)
+        app = create_app(config_class=TestConfig)
+        self.assertTrue(app.config['CHANGE_LOG'])
+
+
+class FileConfig(TestConfig):
+    """Configuration for testing concurrent transactions with a SQLite file"""
+
+
+class TestChangeOrder(unittest.TestCase):
+    """
+    This is the class for test cases of the change ids of concurrent transactions
+    """
+
+    def setUp(self):
+        """
+        Execute before every test case
+        """
+        handle, self.path = tempfile.mkstemp(suffix='.db')
+        os.close(handle)
+        FileConfig.SQLALCHEMY_DATABASE_URI = f'sqlite:///{self.path}'
+        self.app = create_app(config_class=FileConfig)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        populate_bd()
+        db.session.remove()
+
+    def tearDown(self):
+        """
+        Execute after every test case
+        """
+        db.session.remove()
+        db.engine.dispose()
+        self.app_context.pop()
+        for suffix in ('', '-journal'):
+            if os.path.exists(self.path + suffix):
+                os.remove(self.path + suffix)
+
+    def test_commit_order(self):
+        """
+        Test a transaction committing after another one which took its ids
+        gets the next ids, so clients don't skip the changes of the first
+        """
+        first = Session(bind=db.engine, info={ENABLED_KEY: True})
+        second = Session(bind=db.engine, info={ENABLED_KEY: True})
+        second.get(Employee, 2).salary = 3000
+        writes.update_by_id(Employee, 1, {'salary': 2000}, session=first)
+        _write_log(first)
+        thread = threading.Thread(target=second.commit)
+        thread.start()
+        thread.join(0.5)
+        self.assertTrue(thread.is_alive())
+        self.assertEqual(get_changes(13)['changes'], [])
+        db.session.remove()
+        first.commit()
+        thread.join(10)
+        feed = get_changes(13)
+        self.assertEqual(entries(feed), [('employee', 1, 'update'), ('employee', 2, 'update')])
+        self.assertEqual([change.id_ for change in feed['changes']], [14, 15])
+        first.close()
+        second.close()
@@ -0,0 +1,111 @@
+# pylint: disable=R0201
+""""Module contains tests for the coalescing of concurrent GET requests"""
+import threading
+import time
+from unittest import mock
+
+from department_app.models.replicas import READ_YOUR_WRITES_HEADER
+from department_app.service import DepartmentServices
+from department_app.tests.conftest import BaseTestCase
+
+
+class TestCoalescing(BaseTestCase):
+    """
+    This is the class for request coalescing test cases
+    """
+
+    def setUp(self):
+        """
+        Execute before every test case
+        """
+        super().setUp()
+        self.state = self.app.extensions['coalescing']
+        self.release = threading.Event()
+        self.calls = 0
+
+    def slow_get_all(self, fields=None):  # pylint: disable=W0613
+        """
+        Block the first call until released
+        """
+        self.calls += 1
+        if self.calls == 1:
+            self.release.wait(5)
+        return []
+
+    def get_concurrently(self, urls, headers=None):
+        """
+        Send GET requests from threads, releasing the leader once all followers wait
+        """
+        responses = [None] * len(urls)
+
+        def get(index):
+            responses[index] = self.app.test_client().get(urls[index], headers=headers)
+
+        threads = [threading.Thread(target=get, args=(index,)) for index in range(len(urls))]
+        for thread in threads:
+            thread.start()
+            time.sleep(0.02)
+        self.release.set()
+        for thread in threads:
+            thread.join(5)
+        return responses
+
+    def test_identical_requests(self):
+        """
+        Test identical concurrent requests share the response of the first one
+        """
+        with mock.patch.object(DepartmentServices, 'get_all', side_effect=self.slow_get_all):
+            responses = self.get_concurrently(['/api/v1/departments'] * 5)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual([response.status_code for response in responses], [200] * 5)
+        self.assertEqual({response.data for response in responses}, {b'[]\n'})
+        self.assertEqual(self.state['counters']['followers'], 4)
+        self.assertEqual(self.state['flights'], {})
+
+    def test_different_requests(self):
+        """
+        Test requests with different query strings are not coalesced
+        """
+        with mock.patch.object(DepartmentServices, 'get_all', side_effect=self.slow_get_all):
+            self.get_concurrently(['/api/v1/departments', '/api/v1/departments?fields=id_'])
+        self.assertEqual(self.calls, 2)
+
+    def test_timeout(self):
+        """
+        Test followers compute their own response when the leader is too slow
+        """
+        self.state['timeout'] = 0.01
+        with mock.patch.object(DepartmentServices, 'get_all', side_effect=self.slow_get_all):
+            responses = self.get_concurrently(['/api/v1/departments'] * 2)
+        self.assertEqual(self.calls, 2)
+        self.assertEqual(self.state['counters']['timeouts'], 1)
+        self.assertEqual([response.status_code for response in responses], [200] * 2)
+
+    def test_writes(self):
+        """
+        Test only GET requests are coalesced
+        """
+        response = self.client.post('/api/v1/departments', json={'title': 'Golang'})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(sum(self.state['counters'].values()), 0)
+
+    def test_read_your_writes(self):
+        """
+        Test requests which must read the primary database are not coalesced
+        """
+        with mock.patch.object(DepartmentServices, 'get_all', side_effect=self.slow_get_all):
+            self.get_concurrently(['/api/v1/departments'] * 2, {READ_YOUR_WRITES_HEADER: '1'})
+        self.assertEqual(self.calls, 2)
+        self.assertEqual(sum(self.state['counters'].values()), 0)
+
+    def test_resources(self):
+        """
+        Test only collection and statistics resources are coalesced
+        """
+        def coalesced(endpoint):
+            return self.app.view_functions[endpoint].__code__.co_name == 'coalesced'
+
+        for endpoint in ('departments', 'departmentstatsapi', 'salarystatsapi'):
+            self.assertTrue(coalesced(endpoint), endpoint)
+        for endpoint in ('job', 'changesapi', 'cachestatsapi'):
+            self.assertFalse(coalesced(endpoint), endpoint)
@@ -0,0 +1,112 @@
+# pylint: disable=R0201
+""""Module contains tests for the compression of responses"""
+import gzip
+import zlib
+
+from flask import Response, stream_with_context
+
+from department_app.tests.conftest import BaseTestCase
+
+
+class TestCompression(BaseTestCase):
+    """
+    This is the class for response compression test cases
+    """
+    headers = {'Accept-Encoding': 'gzip'}
+
+    def setUp(self):
+        """
+        Execute before every test case
+        """
+        super().setUp()
+        self.app.extensions['compress']['min_size'] = 100
+
+        @self.app.route('/test-stream')
+        def stream():
+            """Stream a body in chunks."""
+            return Response(stream_with_context(
+                f'line {index}\n' for index in range(1000)
+            ), mimetype='text/plain')
+
+        @self.app.route('/test-html')
+        def html():
+            """Return an html page."""
+            return '<html>' + '<p>text</p>' * 100 + '</html>'
+
+        @self.app.route('/test-encoded')
+        def encoded():
+            """Return an already compressed body."""
+            return Response(gzip.compress(b'x' * 1000), mimetype='text/plain',
+                            headers={'Content-Encoding': 'gzip'})
+
+    def test_compressed(self):
+        """
+        Test responses are compressed with gzip when the client accepts it
+        """
+        plain = self.client.get('/api/v1/employees')
+        response = self.client.get('/api/v1/employees', headers=self.headers)
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response.headers['Vary'])
+        self.assertEqual(int(response.headers['Content-Length']), len(response.data))
+        self.assertEqual(gzip.decompress(response.data), plain.data)
+        self.assertNotIn('Content-Encoding', plain.headers)
+
+    def test_html(self):
+        """
+        Test html pages are compressed
+        """
+        response = self.client.get('/test-html', headers=self.headers)
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertIn(b'<html', gzip.decompress(response.data))
+
+    def test_threshold(self):
+        """
+        Test responses smaller than "COMPRESS_MIN_SIZE" are not compressed
+        """
+        response = self.client.get('/api/v1/departments/1?fields=id_', headers=self.headers)
+        self.assertNotIn('Content-Encoding', response.headers)
+        self.assertEqual(response.json, {'id_': 1})
+
+    def test_not_accepted(self):
+        """
+        Test responses are not compressed with encodings the client refuses
+        """
+        response = self.client.get('/api/v1/employees', headers={'Accept-Encoding': 'gzip;q=0'})
+        self.assertNotIn('Content-Encoding', response.headers)
+        response = self.client.get('/api/v1/employees', headers={'Accept-Encoding': 'identity'})
+        self.assertNotIn('Content-Encoding', response.headers)
+
+    def test_stream(self):
+        """
+        Test streamed responses are compressed chunk by chunk
+        """
+        response = self.client.get('/test-stream', headers=self.headers, buffered=False)
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertNotIn('Content-Length', response.headers)
+        decompressor = zlib.decompressobj(31)
+        chunks = list(response.response)
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(decompressor.decompress(chunks[0]), b'line 0\n')
+        body = b'line 0\n' + b''.join(decompressor.decompress(chunk) for chunk in chunks[1:])
+        self.assertEqual(body, ''.join(f'line {index}\n' for index in range(1000)).encode())
+        self.assertTrue(decompressor.eof)
+
+    def test_no_double_compression(self):
+        """
+        Test responses with a "Content-Encoding" are left as is
+        """
+        response = self.client.get('/test-encoded', headers=self.headers)
+        self.assertEqual(gzip.decompress(response.data), b'x' * 1000)
+
+    def test_cache(self):
+        """
+        Test the same body is compressed once
+        """
+        cache = self.app.extensions['compress']['cache']
+        first = self.client.get('/api/v1/employees', headers=self.headers)
+        self.assertEqual(cache.size(), 1)
+        second = self.client.get('/api/v1/employees', headers=self.headers)
+        self.assertEqual(cache.size(), 1)
+        self.assertEqual(first.data, second.data)
+        self.client.get('/api/v1/departments', headers=self.headers)
+        self.assertEqual(cache.size(), 2)
@@ -3,6 +3,12 @@
 """
 Module contains class to test department api.
 """
+from unittest import mock
+
+from sqlalchemy.exc import IntegrityError
+
+from department_app.service import EmployeeServices
+from department_app.service.jobs import get_job_runner
 from department_app.tests.conftest import BaseTestCase
 
 
@@ -197,6 +203,27 @@ class TestDepartmentApi(BaseTestCase):
         assert response.status_code == 201
         assert response.json["department"]["id_"] == dep_id
         assert response.json["full_name"] == "New Employee"
+        assert response.headers["ETag"] == '"1"'
+
+    def test_departments_employees_post_failures(self):
+        """
+        Test post request when the department is deleted meanwhile or the group commit times out.
+        """
+        data = {
+            "full_name": "New Employee",
+            "date_of_birth": "1995-05-05",
+            "salary": 5000,
+        }
+        with mock.patch.object(EmployeeServices, "create",
+                               side_effect=IntegrityError("INSERT", {}, Exception())):
+            response = self.client.post("/api/v1/departments/1/employees", json=data)
+        assert response.status_code == 400
+        assert response.json["message"] == "Not valid department id"
+        with mock.patch.object(EmployeeServices, "create",
+                               side_effect=TimeoutError("Group commit did not finish")):
+            response = self.client.post("/api/v1/departments/1/employees", json=data)
+        assert response.status_code == 503
+        assert response.json["message"] == "Group commit did not finish"
 
     def test_departments_employees_post_with_nonexistent_id(self):
         """
@@ -249,3 +276,70 @@ class TestDepartmentApi(BaseTestCase):
         dep_id = 1
         response = self.client.delete(f"/api/v1/departments/{dep_id}/employees")
         assert response.status_code == 405
+
+    # Tests for batch fetch
+    def test_departments_get_with_ids(self):
+        """
+        Test get request with a list of ids.
+        """
+        response = self.client.get("/api/v1/departments?ids=2,1,42")
+        assert response.status_code == 200
+        assert [dep["title"] for dep in response.json["items"]] == ["C++", "Python"]
+        assert response.json["missing"] == [42]
+
+    def test_departments_get_with_wrong_ids(self):
+        """
+        Test get request with incorrect list of ids.
+        """
+        response = self.client.get("/api/v1/departments?ids=1;2")
+        assert response.status_code == 400
+
+    # Tests for sparse fieldsets
+    def test_departments_get_with_fields(self):
+        """
+        Test get request with sparse fieldsets of departments and their employees.
+        """
+        response = self.client.get("/api/v1/departments?fields=title")
+        assert response.json == [{"title": "Python"}, {"title": "C++"}, {"title": "Assembler"}]
+        response = self.client.get("/api/v1/departments/3?fields=employees"
+                                   "&fields[employees]=id_")
+        assert response.json == {"employees": [{"id_": 7}, {"id_": 8}]}
+
+    # Tests for optimistic concurrency
+    def test_departments_versions(self):
+        """
+        Test the version of a department is its ETag and conditional writes of stale versions fail.
+        """
+        response = self.client.post("/api/v1/departments", json={"title": "Golang"})
+        assert response.headers["ETag"] == '"1"'
+        dep_id = response.json["id_"]
+        response = self.client.put(f"/api/v1/departments/{dep_id}", json={"title": "Rust"},
+                                   headers={"If-Match": response.headers["ETag"]})
+        assert response.headers["ETag"] == '"2"'
+        assert self.client.get(f"/api/v1/departments/{dep_id}").headers["ETag"] == '"2"'
+        response = self.client.put(f"/api/v1/departments/{dep_id}", json={"title": "Kotlin"},
+                                   headers={"If-Match": '"1"'})
+        assert response.status_code == 409
+        assert response.json["title"] == "Rust"
+        response = self.client.delete(f"/api/v1/departments/{dep_id}", headers={"If-Match": '"1"'})
+        assert response.status_code == 409
+        response = self.client.delete(f"/api/v1/departments/{dep_id}", headers={"If-Match": '"2"'})
+        assert response.status_code == 204
+
+    def test_departments_delete_async(self):
+        """
+        Test delete request run as a background job reporting its progress.
+        """
+        response = self.client.delete("/api/v1/departments/2", headers={"If-Match": '"2"',
+                                                                       "Prefer": "respond-async"})
+        assert response.status_code == 409
+        response = self.client.delete("/api/v1/departments/42", headers={"Prefer": "respond-async"})
+        assert response.status_code == 404
+        response = self.client.delete("/api/v1/departments/2", headers={"Prefer": "respond-async"})
+        assert response.status_code == 202
+        assert response.json["kind"] == "delete-department"
+        get_job_runner().wait(response.json["id_"], 10)
+        response = self.client.get(response.headers["Location"])
+        assert response.json["status"] == "done"
+        assert (response.json["rows_done"], response.json["progress"]) == (5, 1)
+        assert self.client.get("/api/v1/departments/2").status_code == 404
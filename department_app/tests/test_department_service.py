@@ -1,5 +1,7 @@
 # pylint: disable=R0201
 """"Module contains test for DepartmentServices class's methods"""
+from sqlalchemy.exc import IntegrityError
+
 from department_app.service import DepartmentServices, EmployeeServices
 from ..tests.conftest import BaseTestCase
 
@@ -73,6 +75,30 @@ class TestDepartmentService(BaseTestCase):
         # to check if cascade delete happened
         assert len(employees) == 6
 
+    def test_update_by_id(self):
+        """
+        Test update department operation with one UPDATE statement.
+        """
+        updated = DepartmentServices.update_by_id('1', dict(title="Updated Python"))
+        assert updated.title == "Updated Python"
+        assert DepartmentServices.get_cached(1).title == "Updated Python"
+        assert DepartmentServices.update_by_id(42, dict(title="Golang")) is None
+        with self.assertRaises(IntegrityError):
+            DepartmentServices.update_by_id(2, dict(title="Updated Python"))
+        assert DepartmentServices.get_by_id(2).title == "C++"
+
+    def test_delete_by_id(self):
+        """
+        Test delete department operation with its employees, without loading them.
+        """
+        assert EmployeeServices.get_cached(1) is not None
+        assert DepartmentServices.delete_by_id(1)
+        assert len(DepartmentServices.get_all()) == 2
+        assert len(EmployeeServices.get_all()) == 6
+        assert EmployeeServices.get_cached(1) is None
+        assert not DepartmentServices.delete_by_id(1)
+        assert not DepartmentServices.delete_by_id('abc')
+
     def test_avg_salary_non_empty_departments(self):
         """
         Test get average salary operation from non-empty department.
@@ -91,3 +117,11 @@ class TestDepartmentService(BaseTestCase):
         dep_4 = DepartmentServices.create(dict(title="PHP"))
         salary_4 = DepartmentServices.get_avg_salary(dep_4)
         assert salary_4 == 0
+
+    def test_get_by_ids(self):
+        """
+        Test get departments by ids operation keeps the order of ids and reports missing ones.
+        """
+        departments, missing = DepartmentServices.get_by_ids([3, 7, 1])
+        assert [dep.title for dep in departments] == ["Assembler", "Python"]
+        assert missing == [7]
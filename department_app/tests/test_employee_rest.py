@@ -1,6 +1,9 @@
 """
 Module contains class to test employee api.
 """
+from unittest import mock
+
+from department_app.service import DepartmentServices
 from department_app.tests.conftest import BaseTestCase
 
 
@@ -257,3 +260,170 @@ class TestDEmployeeApi(BaseTestCase):
         )
         assert response.status_code == 404
         assert f"Department with id {wrong_dep_id} not found" in response.json["message"]
+
+    # Tests for top employees
+    def test_employees_top(self):
+        """
+        Test get request for top earners of every department.
+        """
+        response = self.client.get("/api/v1/employees/top?by=salary&per_department=1")
+        assert response.status_code == 200
+        assert [emp["id_"] for emp in response.json] == [9, 3, 8]
+
+    def test_employees_top_wrong_parameters(self):
+        """
+        Test get request for top employees with incorrect query parameters.
+        """
+        for query in ("by=name", "per_department=0", "per_department=ten"):
+            response = self.client.get(f"/api/v1/employees/top?{query}")
+            assert response.status_code == 400
+
+    # Tests for batch fetch
+    def test_employees_get_with_ids(self):
+        """
+        Test get request with a list of ids.
+        """
+        response = self.client.get("/api/v1/employees?ids=7,42,2")
+        assert response.status_code == 200
+        assert [emp["id_"] for emp in response.json["items"]] == [7, 2]
+        assert response.json["items"][0]["department"]["id_"] == 3
+        assert response.json["missing"] == [42]
+
+    def test_employees_get_with_wrong_ids(self):
+        """
+        Test get request with incorrect list of ids.
+        """
+        response = self.client.get("/api/v1/employees?ids=1,two")
+        assert response.status_code == 400
+
+    # Tests for sparse fieldsets
+    def test_employees_get_with_fields(self):
+        """
+        Test get request with a sparse fieldset skips nested department.
+        """
+        with mock.patch.object(DepartmentServices, "get_avg_salary") as get_avg_salary:
+            response = self.client.get("/api/v1/employees?fields=id_,full_name")
+        assert response.status_code == 200
+        assert response.json[0] == {"id_": 1, "full_name": "Vladyslav Radchenko"}
+        get_avg_salary.assert_not_called()
+
+    def test_employees_get_with_nested_fields(self):
+        """
+        Test get request with a sparse fieldset of the nested department.
+        """
+        response = self.client.get("/api/v1/employees/3?fields=salary,department"
+                                   "&fields[department]=title")
+        assert response.status_code == 200
+        assert response.json == {"salary": 2000, "department": {"title": "C++"}}
+        response = self.client.get("/api/v1/employees/search?date_of_birth=1995-05-05"
+                                   "&fields[department]=id_")
+        assert response.json[0]["department"] == {"id_": 2}
+        assert response.json[0]["full_name"] == "Abdirahman Davidson"
+
+    def test_employees_get_with_unknown_fields(self):
+        """
+        Test get request with unknown fields.
+        """
+        for query in ("fields=id_,name", "fields[department]=name",
+                      "fields=id_&fields[department]=title", "fields[salary]=id_"):
+            response = self.client.get(f"/api/v1/employees?{query}")
+            assert response.status_code == 400
+            assert "Unknown fields" in response.json["message"]
+
+    # Tests for optimistic concurrency
+    def test_employees_versions(self):
+        """
+        Test the version of an employee is its ETag and conditional writes of stale versions fail.
+        """
+        response = self.client.get("/api/v1/employees/1")
+        assert response.headers["ETag"] == '"1"'
+        response = self.client.put("/api/v1/employees/1", json={"salary": 1700},
+                                   headers={"If-Match": '"1"'})
+        assert response.status_code == 200
+        assert response.headers["ETag"] == '"2"'
+        response = self.client.put("/api/v1/employees/1", json={"salary": 1800},
+                                   headers={"If-Match": '"1"'})
+        assert response.status_code == 409
+        assert response.json["salary"] == 1700
+        assert response.headers["ETag"] == '"2"'
+        response = self.client.put("/api/v1/employees/1", json={"salary": 1800},
+                                   headers={"If-Match": 'W/"2"'})
+        assert response.json["salary"] == 1800
+        response = self.client.put("/api/v1/employees/1", json={"salary": 1900})
+        assert response.headers["ETag"] == '"4"'
+        response = self.client.put("/api/v1/employees/1", json={"salary": 1},
+                                   headers={"If-Match": "x"})
+        assert response.status_code == 400
+        response = self.client.put("/api/v1/employees/42", json={"salary": 1},
+                                   headers={"If-Match": '"1"'})
+        assert response.status_code == 404
+        response = self.client.delete("/api/v1/employees/1", headers={"If-Match": '"3"'})
+        assert response.status_code == 409
+        response = self.client.delete("/api/v1/employees/1", headers={"If-Match": '"4"'})
+        assert response.status_code == 204
+
+    def test_employees_export(self):
+        """
+        Test the CSV export of employees, with search filters.
+        """
+        response = self.client.get("/api/v1/employees/export.csv")
+        assert response.status_code == 200
+        assert response.is_streamed
+        assert response.mimetype == "text/csv"
+        lines = response.data.decode().splitlines()
+        assert lines[0] == "id,full_name,date_of_birth,salary,department_id,department"
+        assert lines[7] == "7,Corban Snow,1962-02-02,1000,3,Assembler"
+        assert len(lines) == 11
+        response = self.client.get("/api/v1/employees/export.csv?date_of_birth=1990-01-01"
+                                   "&date_for_interval=2005-01-01")
+        assert [line.split(",")[0] for line in response.data.decode().splitlines()[1:]] == \
+            ["1", "2", "4", "9", "10"]
+        response = self.client.get("/api/v1/employees/export.csv?date_of_birth=1990-13-01")
+        assert response.status_code == 400
+        response = self.client.get("/api/v1/employees/export.csv?date_for_interval=2005-01-01")
+        assert response.status_code == 400
+
+    def test_departments_employees_export(self):
+        """
+        Test the CSV export of the employees of a department.
+        """
+        response = self.client.get("/api/v1/departments/3/employees/export.csv")
+        assert response.status_code == 200
+        assert response.headers["Content-Disposition"] == \
+            "attachment; filename=department-3-employees.csv"
+        assert response.data.decode().splitlines()[1:] == [
+            "7,Corban Snow,1962-02-02,1000,3,Assembler", "8,Carmel Boyle,1983-03-03,2000,3,Assembler"
+        ]
+        response = self.client.get("/api/v1/departments/42/employees/export.csv")
+        assert response.status_code == 404
+
+    def test_employees_import(self):
+        """
+        Test importing employees from a streamed CSV body.
+        """
+        body = ("full_name,date_of_birth,salary,department\r\n"
+                "Ada Lovelace,1990-12-10,3000,Python\r\n"
+                "Alan Turing,1912-06-23,-1,C++\r\n")
+        response = self.client.post("/api/v1/employees/import", data=body,
+                                    content_type="text/csv")
+        assert response.status_code == 200
+        assert (response.json["imported"], response.json["failed"]) == (1, 1)
+        assert response.json["errors"] == [{"row": 2, "errors": {"salary": [
+            "Must be greater than or equal to 0."]}}]
+        assert self.client.get("/api/v1/employees/11").json["department"]["title"] == "Python"
+        response = self.client.post("/api/v1/employees/import?start=1", data=body,
+                                    content_type="text/csv")
+        assert (response.json["rows"], response.json["imported"]) == (1, 0)
+
+    def test_employees_import_wrong_data(self):
+        """
+        Test imports of unknown formats, with invalid CSV headers or start values.
+        """
+        response = self.client.post("/api/v1/employees/import", json=[])
+        assert response.status_code == 415
+        response = self.client.post("/api/v1/employees/import", data="Ada,1990-12-10\r\n",
+                                    content_type="text/csv")
+        assert response.status_code == 400
+        response = self.client.post("/api/v1/employees/import?start=x", data="",
+                                    content_type="application/x-ndjson")
+        assert response.status_code == 400
@@ -1,10 +1,13 @@
 # pylint: disable=R0201
 """"Module contains test for EmployeeServices class's methods"""
 from datetime import date
+from unittest import mock
 
+from sqlalchemy import event, inspect
 from sqlalchemy.exc import IntegrityError
 
-from department_app.service import EmployeeServices
+from department_app import db
+from department_app.service import EmployeeServices, batch, employee_service
 from ..tests.conftest import BaseTestCase
 
 
@@ -105,6 +108,39 @@ class TestDepartmentService(BaseTestCase):
         assert employee_to_delete not in employees
         assert len(employees) == 9
 
+    def test_update_by_id(self):
+        """
+        Test update employee operation with one UPDATE statement.
+        """
+        EmployeeServices.get_cached(1)
+        statements = []
+
+        def record(conn, cursor, statement, *args):  # pylint: disable=W0613
+            statements.append(statement)
+        event.listen(db.engine, 'before_cursor_execute', record)
+        updated = EmployeeServices.update_by_id('1', dict(full_name="Updated Employee", salary=10))
+        event.remove(db.engine, 'before_cursor_execute', record)
+        assert statements[0].startswith('UPDATE employees')
+        assert statements[1].startswith('UPDATE change_cursor')
+        assert statements[3].startswith('INSERT INTO changes')
+        assert len(statements) == 5 and statements[4].startswith('SELECT')
+        assert (updated.full_name, updated.salary) == ("Updated Employee", 10)
+        assert EmployeeServices.get_cached(1).full_name == "Updated Employee"
+        assert EmployeeServices.update_by_id(42, dict(salary=10)) is None
+        assert EmployeeServices.update_by_id('abc', dict(salary=10)) is None
+        assert EmployeeServices.update_by_id(2, {}).id_ == 2
+
+    def test_delete_by_id(self):
+        """
+        Test delete employee operation with one DELETE statement.
+        """
+        EmployeeServices.get_cached(1)
+        assert EmployeeServices.delete_by_id(1)
+        assert EmployeeServices.get_cached(1) is None
+        assert len(EmployeeServices.get_all()) == 9
+        assert not EmployeeServices.delete_by_id(1)
+        assert not EmployeeServices.delete_by_id('abc')
+
     def test_get_by_date_of_birth_without_interval(self):
         """
         Test get employees by date of birth operation.
@@ -145,3 +181,73 @@ class TestDepartmentService(BaseTestCase):
         )
         assert all(test_date1 <= emp.date_of_birth <= test_date2 for emp in employees)
         assert all(emp.department_id == dep_id for emp in employees)
+
+    def test_get_top_by_department_salary(self):
+        """
+        Test get top earners of every department operation, ties broken by id.
+        """
+        employees = EmployeeServices.get_top_by_department('salary', 2)
+        assert [emp.id_ for emp in employees] == [9, 1, 3, 4, 8, 7]
+
+    def test_get_top_by_department_newest(self):
+        """
+        Test get newest employee of every department operation.
+        """
+        employees = EmployeeServices.get_top_by_department('newest', 1)
+        assert [emp.id_ for emp in employees] == [9, 10, 8]
+
+    def test_get_top_by_department_without_window_functions(self):
+        """
+        Test the fallback for databases without window functions gives the same result.
+        """
+        expected = {
+            (by, number): [emp.id_ for emp in EmployeeServices.get_top_by_department(by, number)]
+            for by in ('salary', 'newest') for number in (1, 2, 3, 5)
+        }
+        with mock.patch.object(employee_service, 'supports_window_functions', return_value=False):
+            for (by, number), ids in expected.items():
+                employees = EmployeeServices.get_top_by_department(by, number)
+                assert [emp.id_ for emp in employees] == ids
+
+    def test_get_by_ids(self):
+        """
+        Test get employees by ids operation keeps the order of ids and reports missing ones.
+        """
+        employees, missing = EmployeeServices.get_by_ids([5, 42, 1, 5, 3])
+        assert [emp.id_ for emp in employees] == [5, 1, 3]
+        assert missing == [42]
+
+    def test_get_by_ids_chunked(self):
+        """
+        Test get employees by ids operation splits ids into several IN queries.
+        """
+        with mock.patch.object(batch, 'ID_CHUNK_SIZE', 3):
+            employees, missing = EmployeeServices.get_by_ids(list(range(12, 0, -1)))
+        assert [emp.id_ for emp in employees] == list(range(10, 0, -1))
+        assert missing == [12, 11]
+
+    def test_get_by_id_with_fields(self):
+        """
+        Test get employee by id operation loads only the requested columns.
+        """
+        employee = EmployeeServices.get_by_id(1, fields=('id_', 'full_name', 'department'))
+        assert employee.full_name == "Vladyslav Radchenko"
+        assert inspect(employee).unloaded == {'date_of_birth', 'salary', 'department'}
+
+    def test_export(self):
+        """
+        Test employees are exported with the titles of their departments by one query.
+        """
+        statements = []
+
+        def record(conn, cursor, statement, *args):  # pylint: disable=W0613
+            statements.append(statement)
+        event.listen(db.engine, 'before_cursor_execute', record)
+        rows = list(EmployeeServices.export(chunk_size=3))
+        event.remove(db.engine, 'before_cursor_execute', record)
+        assert len(statements) == 1 and 'JOIN departments' in statements[0]
+        assert [row[0] for row in rows] == list(range(1, 11))
+        assert tuple(rows[6]) == (7, 'Corban Snow', date(1962, 2, 2), 1000, 3, 'Assembler')
+        rows = EmployeeServices.export(1, date(1990, 1, 1), date(2005, 1, 1))
+        assert [row[0] for row in rows] == [1, 2, 9]
+        assert [row[0] for row in EmployeeServices.export(date=date(1962, 2, 2))] == [7]
@@ -0,0 +1,167 @@
+# pylint: disable=R0201
+""""Module contains tests for the database engine configuration"""
+import os
+import tempfile
+import unittest
+
+from config import TestConfig
+from department_app import create_app, db
+from department_app.models.engine import TimedQueuePool
+
+
+class FileConfig(TestConfig):
+    """Configuration for testing with a SQLite file"""
+
+
+class TestSQLiteProfile(unittest.TestCase):
+    """
+    This is the class for SQLite profile test cases
+    """
+
+    def setUp(self):
+        """
+        Execute before every test case
+        """
+        handle, self.path = tempfile.mkstemp(suffix='.db')
+        os.close(handle)
+        FileConfig.SQLALCHEMY_DATABASE_URI = f'sqlite:///{self.path}'
+
+    def tearDown(self):
+        """
+        Execute after every test case
+        """
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(self.path + suffix):
+                os.remove(self.path + suffix)
+
+    def pragma(self, app, name):
+        """
+        Read a pragma of a new connection of the app
+        """
+        with app.app_context():
+            value = db.session.execute(f'PRAGMA {name}').scalar()
+            db.session.remove()
+            return value
+
+    def test_concurrent_profile(self):
+        """
+        Test the concurrent profile pragmas are applied to new connections
+        """
+        FileConfig.SQLITE_PROFILE = 'concurrent'
+        app = create_app(config_class=FileConfig)
+        self.assertEqual(self.pragma(app, 'journal_mode'), 'wal')
+        self.assertEqual(self.pragma(app, 'synchronous'), 1)
+        self.assertEqual(self.pragma(app, 'foreign_keys'), 1)
+        self.assertEqual(self.pragma(app, 'busy_timeout'), 5000)
+        self.assertEqual(self.pragma(app, 'temp_store'), 2)
+        self.assertEqual(self.pragma(app, 'cache_size'), -65536)
+
+    def test_default_profile(self):
+        """
+        Test the default profile leaves SQLite defaults
+        """
+        FileConfig.SQLITE_PROFILE = 'default'
+        app = create_app(config_class=FileConfig)
+        self.assertEqual(self.pragma(app, 'journal_mode'), 'delete')
+        self.assertEqual(self.pragma(app, 'foreign_keys'), 0)
+
+    def test_unknown_profile(self):
+        """
+        Test an unknown profile is refused
+        """
+        FileConfig.SQLITE_PROFILE = 'fastest'
+        with self.assertRaises(ValueError):
+            create_app(config_class=FileConfig)
+
+
+class PoolConfig(TestConfig):
+    """Configuration for testing the connection pool of a SQLite file"""
+    DB_POOL_SIZE = 3
+    DB_POOL_MAX_OVERFLOW = 1
+    DB_POOL_WARMUP = 2
+
+
+class TestPool(unittest.TestCase):
+    """
+    This is the class for connection pool test cases
+    """
+
+    def setUp(self):
+        """
+        Execute before every test case
+        """
+        handle, self.path = tempfile.mkstemp(suffix='.db')
+        os.close(handle)
+        PoolConfig.SQLALCHEMY_DATABASE_URI = f'sqlite:///{self.path}'
+        self.app = create_app(config_class=PoolConfig)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        self.engine = db.engine
+
+    def tearDown(self):
+        """
+        Execute after every test case
+        """
+        db.session.remove()
+        self.engine.dispose()
+        self.app_context.pop()
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(self.path + suffix):
+                os.remove(self.path + suffix)
+
+    def test_pool_options(self):
+        """
+        Test the pool is sized from the config and times checkouts
+        """
+        pool = self.engine.pool
+        self.assertIsInstance(pool, TimedQueuePool)
+        self.assertEqual(pool.size(), 3)
+        self.engine.connect().close()
+        stats = pool.stats()
+        self.assertEqual(stats['wait']['count'], 1)
+        self.assertEqual(sum(bucket['count'] for bucket in stats['wait']['buckets']), 1)
+
+    def test_warm_up(self):
+        """
+        Test connections are opened on the first request
+        """
+        self.assertEqual(self.engine.pool.checkedin(), 0)
+        response = self.app.test_client().get('/api/v1/system/pool')
+        self.assertEqual(response.json['pool'], 'TimedQueuePool')
+        self.assertEqual(response.json['checked_in'], 2)
+        self.assertEqual(response.json['wait']['count'], 2)
+
+    def test_connection_of_other_process(self):
+        """
+        Test a pooled connection opened by another process is replaced, not closed
+        """
+        connection = self.engine.connect()
+        dbapi_connection = connection.connection.dbapi_connection
+        connection.connection._connection_record.info['pid'] = -1  # pylint: disable=W0212
+        connection.close()
+        with self.engine.connect() as connection:
+            self.assertIsNot(connection.connection.dbapi_connection, dbapi_connection)
+        self.assertEqual(dbapi_connection.execute('SELECT 1').fetchone(), (1,))
+
+    @unittest.skipUnless(hasattr(os, 'fork'), 'fork is not available')
+    def test_fork(self):
+        """
+        Test a forked child gets an empty pool and the parent keeps its connections
+        """
+        with self.engine.connect() as connection:
+            connection.execute('SELECT 1')
+        parent_pool = self.engine.pool
+        pid = os.fork()
+        if pid == 0:  # pragma: no cover
+            code = 1
+            try:
+                if self.engine.pool is not parent_pool and self.engine.pool.checkedin() == 0:
+                    with self.engine.connect() as connection:
+                        code = 0 if connection.execute('SELECT 1').scalar() == 1 else 1
+            finally:
+                os._exit(code)  # pylint: disable=W0212
+        _, status = os.waitpid(pid, 0)
+        self.assertEqual(os.waitstatus_to_exitcode(status), 0)
+        self.assertIs(self.engine.pool, parent_pool)
+        with self.engine.connect() as connection:
+            self.assertEqual(connection.execute('SELECT 1').scalar(), 1)
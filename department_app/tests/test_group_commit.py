@@ -0,0 +1,179 @@
+# pylint: disable=R0201
+""""Module contains tests for the group commit of employee writes"""
+import os
+import tempfile
+import threading
+import unittest
+from datetime import date
+
+from sqlalchemy import event, func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.exc import StaleDataError
+
+from config import TestConfig
+from department_app import create_app, db
+from department_app.models import Department, Employee
+from department_app.models.population import populate_bd
+from department_app.service import EmployeeServices
+
+
+class GroupCommitConfig(TestConfig):
+    """Configuration for testing group commit with a SQLite file"""
+    GROUP_COMMIT_WINDOW = 2
+    GROUP_COMMIT_MAX_ROWS = 3
+
+
+class TestGroupCommit(unittest.TestCase):
+    """
+    This is the class for group commit test cases
+    """
+
+    def setUp(self):
+        """
+        Execute before every test case
+        """
+        handle, self.path = tempfile.mkstemp(suffix='.db')
+        os.close(handle)
+        GroupCommitConfig.SQLALCHEMY_DATABASE_URI = f'sqlite:///{self.path}'
+        self.app = create_app(config_class=GroupCommitConfig)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        populate_bd()
+        db.session.remove()
+        self.committer = self.app.extensions['group_commit']
+        self.commits = 0
+        event.listen(db.engine, 'commit', self.count_commit)
+
+    def tearDown(self):
+        """
+        Execute after every test case
+        """
+        event.remove(db.engine, 'commit', self.count_commit)
+        db.session.remove()
+        db.engine.dispose()
+        self.app_context.pop()
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(self.path + suffix):
+                os.remove(self.path + suffix)
+
+    def count_commit(self, connection):  # pylint: disable=W0613
+        """
+        Count the commits of the database
+        """
+        self.commits += 1
+
+    def run_concurrently(self, calls):
+        """
+        Run service calls from threads with their own application context
+        :return: A list of (result, exception) tuples in the order of the calls.
+        """
+        outcomes = [None] * len(calls)
+
+        def run(index):
+            with self.app.app_context():
+                try:
+                    outcomes[index] = calls[index](), None
+                except Exception as exception:  # pylint: disable=W0703
+                    outcomes[index] = None, exception
+                finally:
+                    db.session.remove()
+
+        threads = [threading.Thread(target=run, args=(index,)) for index in range(len(calls))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(10)
+        return outcomes
+
+    @staticmethod
+    def create(name, dep_id=1):
+        """
+        Make a call creating an employee and reading its department
+        """
+        def call():
+            employee = EmployeeServices.create({
+                'full_name': name, 'date_of_birth': date(1990, 12, 10),
+                'salary': 1000, 'department_id': dep_id
+            })
+            return employee.id_, employee.full_name, employee.department.title
+        return call
+
+    def test_creates(self):
+        """
+        Test concurrent creations share one commit per batch
+        """
+        names = [f'Test Name {index}' for index in range(6)]
+        outcomes = self.run_concurrently([self.create(name) for name in names])
+        self.assertEqual([error for _, error in outcomes], [None] * 6)
+        self.assertEqual(sorted(result[1] for result, _ in outcomes), names)
+        self.assertEqual({result[2] for result, _ in outcomes}, {'Python'})
+        self.assertEqual(self.commits, 2)
+        self.assertEqual(self.committer.counters, {'batches': 2, 'writes': 6, 'retries': 0,
+                                                   'timeouts': 0})
+        for (emp_id, name, _), _ in outcomes:
+            self.assertEqual(db.session.get(Employee, emp_id).full_name, name)
+
+    def test_bad_row(self):
+        """
+        Test a failing batch is retried row by row and only fails the bad row
+        """
+        outcomes = self.run_concurrently([
+            self.create('Test Name 1'), self.create('Test Name 2', dep_id=42),
+            self.create('Test Name 3', dep_id=3)
+        ])
+        self.assertIsInstance(outcomes[1][1], IntegrityError)
+        self.assertEqual([result[1:] for result, _ in (outcomes[0], outcomes[2])],
+                         [('Test Name 1', 'Python'), ('Test Name 3', 'Assembler')])
+        self.assertEqual(self.committer.counters['retries'], 1)
+        self.assertEqual(Employee.query.count(), 12)
+
+    def test_updates(self):
+        """
+        Test updates by id through group commit, with missing rows and stale versions
+        """
+        self.committer.window = 0.01
+        updated = EmployeeServices.update_by_id(1, {'salary': 2000})
+        self.assertEqual((updated.salary, updated.version), (2000, 2))
+        self.assertIsNone(EmployeeServices.update_by_id(42, {'salary': 2000}))
+        with self.assertRaises(StaleDataError):
+            EmployeeServices.update_by_id(1, {'salary': 3000}, version=1)
+        self.assertEqual(self.commits, 2)
+
+    def test_caller_session(self):
+        """
+        Test a batch neither commits nor rolls back the pending changes of its leader
+        """
+        self.committer.window = 0.01
+        department = Department(title='Go')
+        db.session.add(department)
+        data = {'full_name': 'Test Name', 'date_of_birth': date(1990, 12, 10),
+                'salary': 1000, 'department_id': 1}
+        self.assertEqual(EmployeeServices.create(data).full_name, 'Test Name')
+        with self.assertRaises(IntegrityError):
+            EmployeeServices.create({**data, 'department_id': 42})
+        self.assertIn(department, db.session.new)
+        with db.engine.connect() as connection:
+            self.assertEqual(connection.execute(select(func.count(Department.id_))).scalar(), 3)
+            self.assertEqual(connection.execute(select(func.count(Employee.id_))).scalar(), 11)
+
+    def test_timeout(self):
+        """
+        Test a write waiting longer than the timeout is withdrawn from its batch
+        """
+        self.committer.window, self.committer.timeout = 1, 0.1
+        outcomes = self.run_concurrently([self.create('Test Name 1'), self.create('Test Name 2')])
+        errors = [error for _, error in outcomes if error is not None]
+        self.assertEqual(len(errors), 1)
+        self.assertIsInstance(errors[0], TimeoutError)
+        self.assertIn('was not run', str(errors[0]))
+        self.assertEqual(self.committer.counters['timeouts'], 1)
+        self.assertEqual(self.committer.counters['writes'], 1)
+        self.assertEqual(Employee.query.count(), 11)
+
+    def test_disabled(self):
+        """
+        Test group commit is disabled by default
+        """
+        app = create_app(config_class=TestConfig)
+        self.assertNotIn('group_commit', app.extensions)
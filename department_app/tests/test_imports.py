@@ -0,0 +1,167 @@
+# pylint: disable=R0201
+""""Module contains tests for the bulk import of employees"""
+import io
+import json
+import os
+import tempfile
+from unittest import mock
+
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from department_app import db
+from department_app.models import Employee
+from department_app.service import imports
+from department_app.service.imports import ImportInterrupted, import_employees, read_records
+from department_app.tests.conftest import BaseTestCase
+
+CSV = (
+    'id,full_name,date_of_birth,salary,department_id,department\r\n'
+    '1,Ada Lovelace,1990-12-10,3000,,Python\r\n'
+    '2,Alan Turing,1912-06-23,abc,,C++\r\n'
+    '3,Grace Hopper,1906-12-09,2500,3,\r\n'
+    '4,Edsger Dijkstra,1930-05-11,2000,,Cobol\r\n'
+    '5,Linus Torvalds,1969-12-28,1800,42,\r\n'
+)
+
+
+class TestImports(BaseTestCase):
+    """
+    This is the class for employee import test cases
+    """
+
+    def test_csv(self):
+        """
+        Test valid rows are imported and invalid rows reported
+        """
+        report = import_employees(read_records(io.StringIO(CSV, newline=''), 'csv'),
+                                  chunk_size=2)
+        self.assertEqual((report['rows'], report['imported'], report['failed']), (5, 2, 3))
+        self.assertEqual(report['checkpoint'], 5)
+        self.assertEqual([error['row'] for error in report['errors']], [2, 4, 5])
+        self.assertEqual(report['errors'][0]['errors'], {'salary': ['Not a valid integer.']})
+        self.assertEqual(report['errors'][1]['errors'],
+                         {'department': ['Unknown department: Cobol']})
+        self.assertEqual(report['errors'][2]['errors'],
+                         {'department_id': ['Not valid department id']})
+        ada = Employee.query.filter_by(full_name='Ada Lovelace').one()
+        self.assertEqual((ada.department_id, ada.salary), (1, 3000))
+        self.assertEqual(Employee.query.filter_by(full_name='Grace Hopper').one().department_id, 3)
+
+    def test_jsonl(self):
+        """
+        Test JSON Lines records, with lines which are not JSON objects
+        """
+        lines = [json.dumps({'full_name': 'Ada Lovelace', 'date_of_birth': '1990-12-10',
+                             'salary': 3000, 'department': 'Assembler'}),
+                 '', '{"full_name": ', '[1, 2]']
+        report = import_employees(read_records(io.StringIO('\n'.join(lines)), 'jsonl'))
+        self.assertEqual((report['rows'], report['imported'], report['failed']), (3, 1, 2))
+        self.assertEqual(report['errors'][0], {'row': 2, 'errors': {'_schema': ['Invalid JSON object']}})
+
+    def test_csv_header(self):
+        """
+        Test CSV files without a header are refused
+        """
+        with self.assertRaises(ValueError):
+            read_records(io.StringIO('Ada Lovelace,1990-12-10,3000,1\r\n'), 'csv')
+
+    def test_chunks(self):
+        """
+        Test rows are inserted with a transaction per chunk
+        """
+        commits = []
+
+        def record(connection):
+            commits.append(connection)
+
+        records = [{'full_name': 'Test Name', 'date_of_birth': '1990-12-10', 'salary': 1000,
+                    'department_id': 1 + index % 3} for index in range(10)]
+        checkpoints = []
+        event.listen(db.engine, 'commit', record)
+        report = import_employees(records, chunk_size=4,
+                                  progress=lambda report: checkpoints.append(report['checkpoint']))
+        event.remove(db.engine, 'commit', record)
+        self.assertEqual(len(commits), 3)
+        self.assertEqual(checkpoints, [4, 8, 10])
+        self.assertEqual(report['imported'], 10)
+        self.assertIn('rows_per_second', report)
+
+    def test_resume(self):
+        """
+        Test an interrupted import reports its checkpoint and resumes from it
+        """
+        records = [{'full_name': 'Test Name', 'date_of_birth': '1990-12-10', 'salary': index,
+                    'department_id': 1} for index in range(10)]
+        insert = imports._insert  # pylint: disable=W0212
+        calls = []
+
+        def fail_third_chunk(valid):
+            calls.append(valid)
+            if len(calls) == 3:
+                raise OperationalError('INSERT', {}, Exception('database is gone'))
+            return insert(valid)
+
+        with mock.patch.object(imports, '_insert', side_effect=fail_third_chunk):
+            with self.assertRaises(ImportInterrupted) as context:
+                import_employees(records, chunk_size=3)
+        self.assertEqual(context.exception.report['checkpoint'], 6)
+        report = import_employees(records, start=6, chunk_size=3)
+        self.assertEqual((report['rows'], report['imported'], report['checkpoint']), (4, 4, 10))
+        self.assertEqual(
+            sorted(employee.salary for employee in Employee.query.filter_by(full_name='Test Name')),
+            list(range(10))
+        )
+
+    def test_resume_row_by_row(self):
+        """
+        Test an import stopped while inserting a chunk row by row checkpoints
+        the row before the failed one, so resuming does not duplicate rows
+        """
+        records = [{'full_name': 'Test Name', 'date_of_birth': '1990-12-10', 'salary': index,
+                    'department_id': 1} for index in range(6)]
+
+        def fail(conn, cursor, statement, parameters, *args):  # pylint: disable=W0613
+            if statement.startswith('INSERT INTO employees') and parameters[2] == 2:
+                raise IntegrityError(statement, parameters, Exception('constraint failed'))
+            if statement.startswith('INSERT INTO employees') and parameters[2] == 4:
+                raise OperationalError(statement, parameters, Exception('database is gone'))
+
+        event.listen(db.engine, 'before_cursor_execute', fail)
+        try:
+            with self.assertRaises(ImportInterrupted) as context:
+                import_employees(records, chunk_size=6)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', fail)
+        report = context.exception.report
+        self.assertEqual((report['rows'], report['imported'], report['failed'],
+                          report['checkpoint']), (4, 3, 1, 4))
+        self.assertEqual(report['errors'], [{'row': 3, 'errors': {'_schema': ['constraint failed']}}])
+        report = import_employees(records, start=report['checkpoint'], chunk_size=6)
+        self.assertEqual((report['rows'], report['imported']), (2, 2))
+        self.assertEqual(
+            sorted(employee.salary for employee in Employee.query.filter_by(full_name='Test Name')),
+            [0, 1, 3, 4, 5]
+        )
+
+    def test_command(self):
+        """
+        Test the import-employees command with a checkpoint file
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'employees.csv')
+            checkpoint = os.path.join(directory, 'employees.checkpoint')
+            with open(path, 'w', encoding='utf-8', newline='') as file:
+                file.write(CSV)
+            with open(checkpoint, 'w', encoding='utf-8') as file:
+                file.write('2')
+            result = self.app.test_cli_runner(mix_stderr=False).invoke(
+                args=['import-employees', path, '--checkpoint', checkpoint, '--chunk-size', '2']
+            )
+            self.assertEqual(result.exit_code, 0, result.output)
+            self.assertIn('Resuming after row 2', result.output)
+            self.assertIn('Imported 1 of 3 rows', result.output)
+            self.assertIn('Row 4:', result.stderr)
+            self.assertFalse(os.path.exists(checkpoint))
+        self.assertEqual(Employee.query.filter_by(full_name='Ada Lovelace').count(), 0)
+        self.assertEqual(Employee.query.filter_by(full_name='Grace Hopper').count(), 1)
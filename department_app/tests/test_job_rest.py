@@ -0,0 +1,45 @@
+# pylint: disable=R0201
+""""Module contains tests for the background job REST API"""
+from department_app.service.jobs import get_job_runner
+from department_app.tests.conftest import BaseTestCase
+
+
+class TestJobApi(BaseTestCase):
+    """
+    This is the class for job api test cases
+    """
+
+    def test_jobs_post(self):
+        """
+        Test submitting a job and following its status resource
+        """
+        response = self.client.post("/api/v1/jobs", json={"kind": "refresh-analytics"})
+        assert response.status_code == 202
+        job_id = response.json["id_"]
+        assert response.headers["Location"].endswith(f"/api/v1/jobs/{job_id}")
+        get_job_runner().wait(job_id, 10)
+        response = self.client.get(f"/api/v1/jobs/{job_id}")
+        assert response.status_code == 200
+        assert response.json["status"] == "failed"
+        assert response.json["error"] == "The analytics snapshot is disabled"
+
+    def test_jobs_post_wrong_data(self):
+        """
+        Test submitting jobs of unknown kinds or with wrong parameters
+        """
+        response = self.client.post("/api/v1/jobs", json={"kind": "reindex"})
+        assert response.status_code == 400
+        assert response.json["message"] == "Unknown job kind: reindex"
+        response = self.client.post("/api/v1/jobs", json={"kind": "delete-department",
+                                                          "params": {"id": 1}})
+        assert response.status_code == 400
+        response = self.client.post("/api/v1/jobs", json=["refresh-analytics"])
+        assert response.status_code == 400
+
+    def test_jobs_get_with_nonexistent_id(self):
+        """
+        Test get request of a missing job
+        """
+        response = self.client.get("/api/v1/jobs/42")
+        assert response.status_code == 404
+        assert response.json["message"] == "Job with id = 42 was not found"
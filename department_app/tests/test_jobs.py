@@ -0,0 +1,104 @@
+# pylint: disable=R0201
+""""Module contains tests for the background job runner"""
+import unittest
+
+from sqlalchemy import event
+
+from config import TestConfig
+from department_app import create_app, db
+from department_app.models import Department, Employee, Job
+from department_app.models.population import populate_bd
+from department_app.service.analytics import get_snapshot, np
+from department_app.service.jobs import get_job, get_job_runner
+from department_app.tests.conftest import BaseTestCase
+
+
+class JobsConfig(TestConfig):
+    """Configuration for testing jobs with small chunks and the analytics snapshot"""
+    JOB_CHUNK_SIZE = 3
+    ANALYTICS_SNAPSHOT = True
+
+
+class TestJobs(BaseTestCase):
+    """
+    This is the class for background job test cases
+    """
+
+    def setUp(self):
+        """
+        Execute before every test case
+        """
+        self.app = create_app(config_class=JobsConfig)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        populate_bd()
+        self.runner = get_job_runner()
+
+    def run_job(self, kind, params=None):
+        """
+        Submit a job and wait for it
+        :return: The finished Job.
+        """
+        job = self.runner.submit(kind, params)
+        self.runner.wait(job.id_, 10)
+        db.session.expire_all()
+        return get_job(job.id_)
+
+    def test_delete_department(self):
+        """
+        Test a department is deleted with a transaction per chunk of employees
+        """
+        commits = []
+
+        def record(connection):
+            commits.append(connection)
+
+        event.listen(db.engine, 'commit', record)
+        job = self.run_job('delete-department', {'dep_id': 2})
+        event.remove(db.engine, 'commit', record)
+        self.assertEqual((job.status, job.result, job.error), ('done', {'deleted': True}, None))
+        self.assertEqual((job.rows_done, job.rows_total), (5, 5))
+        self.assertIsNotNone(job.finished_at)
+        # Job row, status, total, 2 chunks of employees, department, outcome
+        self.assertEqual(len(commits), 7)
+        self.assertIsNone(db.session.get(Department, 2))
+        self.assertEqual(Employee.query.filter_by(department_id=2).count(), 0)
+        self.assertEqual(Employee.query.count(), 6)
+
+    def test_missing_department(self):
+        """
+        Test deleting a missing department finishes without deleting anything
+        """
+        job = self.run_job('delete-department', {'dep_id': 42})
+        self.assertEqual((job.status, job.result), ('done', {'deleted': False}))
+        self.assertEqual(Employee.query.count(), 10)
+
+    def test_failed_job(self):
+        """
+        Test the error of a failed job is recorded
+        """
+        job = self.run_job('delete-department', {'dep_id': 2, 'version': 5})
+        self.assertEqual(job.status, 'failed')
+        self.assertIn('is not at version 5', job.error)
+        self.assertEqual(Employee.query.filter_by(department_id=2).count(), 4)
+
+    def test_wrong_jobs(self):
+        """
+        Test unknown kinds and parameters are refused before creating a job
+        """
+        with self.assertRaises(ValueError):
+            self.runner.submit('reindex')
+        with self.assertRaises(ValueError):
+            self.runner.submit('delete-department', {'department': 2})
+        self.assertEqual(Job.query.count(), 0)
+
+    @unittest.skipIf(np is None, 'numpy is not installed')
+    def test_refresh_analytics(self):
+        """
+        Test the analytics snapshot is reloaded in chunks
+        """
+        job = self.run_job('refresh-analytics')
+        self.assertEqual((job.status, job.result), ('done', {'rows': 10}))
+        self.assertEqual((job.rows_done, job.rows_total), (10, 10))
+        self.assertEqual(sorted(get_snapshot().columns.ids.tolist()), list(range(1, 11)))
@@ -0,0 +1,171 @@
+# pylint: disable=R0201
+""""Module contains tests for the routing of reads to replicas"""
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from config import TestConfig
+from department_app import create_app, db
+from department_app.models.population import populate_bd
+from department_app.models.replicas import READ_YOUR_WRITES_HEADER, ReplicaCopier
+from department_app.service import DepartmentServices
+
+
+class ReplicaConfig(TestConfig):
+    """Configuration for testing with a SQLite primary and a SQLite replica"""
+    ENTITY_CACHE_SIZE = 10000
+
+
+class TestReplicas(unittest.TestCase):
+    """
+    This is the class for read replica test cases
+    """
+
+    def setUp(self):
+        """
+        Execute before every test case
+        """
+        self.paths = []
+        for _ in range(2):
+            handle, path = tempfile.mkstemp(suffix='.db')
+            os.close(handle)
+            self.paths.append(path)
+        ReplicaConfig.SQLALCHEMY_DATABASE_URI = f'sqlite:///{self.paths[0]}'
+        ReplicaConfig.DB_REPLICA_URIS = (f'sqlite:///{self.paths[1]}',)
+        ReplicaConfig.DB_REPLICA_COPY_INTERVAL = 0
+        self.app = None
+        self.app_context = None
+
+    def start(self):
+        """
+        Create the app, the primary database and copy it into the replica
+        """
+        self.app = create_app(config_class=ReplicaConfig)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        populate_bd()
+        db.session.remove()
+        ReplicaCopier(self.paths[0], self.paths[1:], 0).copy()
+        return self.app.test_client()
+
+    def tearDown(self):
+        """
+        Execute after every test case
+        """
+        if self.app_context is not None:
+            copier = self.app.extensions['read_replicas']['copier']
+            if copier is not None:
+                copier.stop()
+            db.session.remove()
+            for bind in (None, 'replica0'):
+                db.get_engine(self.app, bind=bind).dispose()
+            self.app_context.pop()
+        for path in self.paths:
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+
+    def titles(self, client, headers=None):
+        """
+        Get the department titles from the REST API
+        """
+        response = client.get('/api/v1/departments', headers=headers)
+        self.assertEqual(response.status_code, 200)
+        return {department['title'] for department in response.json}
+
+    def test_reads_use_replica(self):
+        """
+        Test lists come from the replica, writes and read-your-writes requests use the primary
+        """
+        client = self.start()
+        response = client.post('/api/v1/departments', json={'title': 'Golang'})
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn('Golang', self.titles(client))
+        self.assertIn('Golang', self.titles(client, {READ_YOUR_WRITES_HEADER: '1'}))
+        ReplicaCopier(self.paths[0], self.paths[1:], 0).copy()
+        self.assertIn('Golang', self.titles(client))
+
+    def test_read_your_writes_not_coalesced(self):
+        """
+        Test a read-your-writes request does not get the body of an identical
+        concurrent request read from the replica
+        """
+        client = self.start()
+        client.post('/api/v1/departments', json={'title': 'Golang'})
+        release, get_all = threading.Event(), DepartmentServices.get_all
+        calls, results = [], {}
+
+        def slow_get_all(*args, **kwargs):
+            calls.append(args)
+            if len(calls) == 1:
+                release.wait(5)
+            return get_all(*args, **kwargs)
+
+        def get(name, headers=None):
+            results[name] = self.titles(self.app.test_client(), headers)
+
+        with mock.patch.object(DepartmentServices, 'get_all', side_effect=slow_get_all):
+            replica = threading.Thread(target=get, args=('replica',))
+            replica.start()
+            time.sleep(0.05)
+            primary = threading.Thread(target=get, args=('primary', {READ_YOUR_WRITES_HEADER: '1'}))
+            primary.start()
+            primary.join(5)
+            release.set()
+            replica.join(5)
+        self.assertEqual(len(calls), 2)
+        self.assertIn('Golang', results['primary'])
+        self.assertNotIn('Golang', results['replica'])
+
+    def test_changes_from_primary(self):
+        """
+        Test the change feed is read from the primary, so a cursor given before
+        the replica caught up does not make clients resync
+        """
+        client = self.start()
+        client.post('/api/v1/departments', json={'title': 'Golang'})
+        feed = client.get('/api/v1/changes?since=13').json
+        self.assertEqual(([change['entity_id'] for change in feed['changes']], feed['next']),
+                         ([4], 14))
+        feed = client.get('/api/v1/changes?since=14').json
+        self.assertEqual((feed['changes'], feed['next'], feed['resync']), ([], 14, False))
+
+    def test_sticky_primary_after_write(self):
+        """
+        Test reads of a session which wrote go to the primary
+        """
+        self.start()
+        department = DepartmentServices.create({'title': 'Golang'})
+        self.assertIn('Golang', {item.title for item in DepartmentServices.get_all()})
+        db.session.remove()
+        self.assertNotIn('Golang', {item.title for item in DepartmentServices.get_all()})
+        self.assertIsNone(DepartmentServices.get_by_id(department.id_))
+        self.assertEqual(DepartmentServices.get_cached(department.id_).title, 'Golang')
+
+    def test_copier(self):
+        """
+        Test the copier thread brings the replica up to date
+        """
+        ReplicaConfig.DB_REPLICA_COPY_INTERVAL = 0.05
+        client = self.start()
+        client.post('/api/v1/departments', json={'title': 'Golang'})
+        deadline = time.monotonic() + 5
+        while 'Golang' not in self.titles(client) and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self.assertIn('Golang', self.titles(client))
+        response = client.get('/api/v1/system/replicas')
+        self.assertEqual(response.json['replicas'], ['replica0'])
+        self.assertGreaterEqual(response.json['copies'], 1)
+
+    def test_copier_requires_sqlite_files(self):
+        """
+        Test the copier is refused for in-memory databases
+        """
+        ReplicaConfig.SQLALCHEMY_DATABASE_URI = 'sqlite://'
+        ReplicaConfig.DB_REPLICA_COPY_INTERVAL = 1
+        with self.assertRaises(ValueError):
+            create_app(config_class=ReplicaConfig)
@@ -0,0 +1,164 @@
+# pylint: disable=R0201
+""""Module contains tests for the JSON representation of the REST API"""
+import json
+import unittest
+from datetime import date, datetime
+
+from department_app.rest import representations
+from department_app.tests.conftest import BaseTestCase
+
+
+class TestRepresentations(BaseTestCase):
+    """
+    This is the class for JSON representation test cases
+    """
+    data = {'as_of': date(2022, 1, 31), 'items': [{'id_': 1, 'title': 'Отдел'}], 'count': 1.5}
+    expected = {'as_of': '2022-01-31', 'items': [{'id_': 1, 'title': 'Отдел'}], 'count': 1.5}
+
+    def test_stdlib_encoder(self):
+        """
+        Test the stdlib encoder gives compact json with dates
+        """
+        self.app.config['REST_JSON_ENCODER'] = 'json'
+        encoded = representations.encode_json(self.data)
+        self.assertTrue(encoded.endswith(b'\n'))
+        self.assertNotIn(b', ', encoded)
+        self.assertIn(b'"\\u041e\\u0442\\u0434\\u0435\\u043b"', encoded)
+        self.assertEqual(json.loads(encoded), self.expected)
+
+    @unittest.skipIf(representations.orjson is None, 'orjson is not installed')
+    def test_orjson_encoder(self):
+        """
+        Test orjson gives the same bytes as the stdlib encoder, in debug mode too
+        """
+        data = {**self.data, 'at': datetime(2022, 1, 1, 10, 30), 'note': 'Café 🚀', 'empty': []}
+        for debug in (False, True):
+            self.assertEqual(representations.ENCODERS['orjson'](data, debug),
+                             representations.ENCODERS['json'](data, debug))
+
+    def test_debug(self):
+        """
+        Test responses are pretty-printed in debug mode
+        """
+        self.app.debug = True
+        for name in representations.ENCODERS:
+            if name == 'orjson' and representations.orjson is None:
+                continue
+            self.app.config['REST_JSON_ENCODER'] = name
+            encoded = representations.encode_json(self.data)
+            self.assertIn(b'\n  ', encoded)
+            self.assertEqual(json.loads(encoded), self.expected)
+
+    def test_unsupported_value(self):
+        """
+        Test values which can't be encoded raise TypeError
+        """
+        self.app.config['REST_JSON_ENCODER'] = 'json'
+        with self.assertRaises(TypeError):
+            representations.encode_json({'value': object()})
+
+    def test_response(self):
+        """
+        Test REST responses are json with the configured encoder
+        """
+        for name in ('auto', 'json'):
+            self.app.config['REST_JSON_ENCODER'] = name
+            response = self.client.get('/api/v1/departments/1?fields=id_,title')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.content_type, 'application/json')
+            self.assertEqual(response.json, {'id_': 1, 'title': 'Python'})
+
+    def test_restful_json_settings(self):
+        """
+        Test the flask-restful "RESTFUL_JSON" settings are honoured
+        """
+        self.app.config['RESTFUL_JSON'] = {'indent': 1}
+        response = self.client.get('/api/v1/departments/1?fields=id_')
+        self.assertEqual(response.data, b'{\n "id_": 1\n}\n')
+
+    def test_table_layout(self):
+        """
+        Test lists of objects are sent as columns and rows with "layout=table"
+        """
+        response = self.client.get('/api/v1/employees?fields=id_,salary&layout=table')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sorted(response.json['columns']), ['id_', 'salary'])
+        self.assertEqual(len(response.json['rows']), 10)
+        response = self.client.get('/api/v1/employees?ids=2,1,99&fields=id_&layout=table')
+        self.assertEqual(response.json, {
+            'items': {'columns': ['id_'], 'rows': [[2], [1]]}, 'missing': [99]
+        })
+        response = self.client.get('/api/v1/employees/99?layout=table')
+        self.assertEqual(response.status_code, 404)
+        self.assertIn('message', response.json)
+
+    def test_to_table(self):
+        """
+        Test keys absent from some objects become None in their rows
+        """
+        self.assertEqual(representations.to_table([{'a': 1}, {'b': 2, 'a': 3}]), {
+            'columns': ['a', 'b'], 'rows': [[1, None], [3, 2]]
+        })
+        self.assertEqual(representations.to_table([]), {'columns': [], 'rows': []})
+        self.assertEqual(representations.to_table({'message': 'x'}), {'message': 'x'})
+
+
+@unittest.skipIf(representations.msgpack is None, 'msgpack is not installed')
+class TestMessagePack(BaseTestCase):
+    """
+    This is the class for MessagePack content negotiation test cases
+    """
+    headers = {'Accept': 'application/msgpack'}
+
+    def unpack(self, response):
+        """
+        Decode a MessagePack response
+        """
+        self.assertEqual(response.content_type, 'application/msgpack')
+        return representations.msgpack.unpackb(response.data)
+
+    def test_get(self):
+        """
+        Test responses are MessagePack when it is accepted
+        """
+        response = self.client.get('/api/v1/employees', headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.unpack(response), self.client.get('/api/v1/employees').json)
+        response = self.client.get('/api/v1/departments/age-stats?as_of=2022-01-01',
+                                   headers=self.headers)
+        self.assertEqual(self.unpack(response)['as_of'], '2022-01-01')
+        response = self.client.get('/api/v1/employees/99', headers=self.headers)
+        self.assertEqual(response.status_code, 404)
+        self.assertIn('message', self.unpack(response))
+
+    def test_table_layout(self):
+        """
+        Test the table layout is applied to MessagePack responses
+        """
+        response = self.client.get('/api/v1/departments?fields=title&layout=table',
+                                   headers=self.headers)
+        self.assertEqual(self.unpack(response), {
+            'columns': ['title'], 'rows': [['Python'], ['C++'], ['Assembler']]
+        })
+
+    def test_post_put(self):
+        """
+        Test MessagePack request bodies are accepted on POST and PUT
+        """
+        headers = {**self.headers, 'Content-Type': 'application/msgpack'}
+        response = self.client.post('/api/v1/departments', headers=headers,
+                                    data=representations.msgpack.packb({'title': 'Golang'}))
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.unpack(response)['title'], 'Golang')
+        response = self.client.put('/api/v1/employees/1', headers=headers,
+                                   data=representations.msgpack.packb({'salary': 1234}))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.unpack(response)['salary'], 1234)
+
+    def test_invalid_body(self):
+        """
+        Test a body which is not MessagePack gives status code 400
+        """
+        response = self.client.post('/api/v1/departments', data=b'\xc1',
+                                    headers={'Content-Type': 'application/msgpack'})
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,115 @@
+# pylint: disable=R0201
+""""Module contains tests for the compiled serializers"""
+import json
+from datetime import date, datetime
+from unittest import mock
+
+from department_app import db
+from department_app.models import Employee
+from department_app.rest import serializers
+from department_app.rest.schemas import DepartmentSchema, EmployeeSchema, sparse_schema
+from department_app.service import DepartmentServices, EmployeeServices
+from department_app.tests.conftest import BaseTestCase
+
+
+class TestSerializers(BaseTestCase):
+    """
+    This is the class for compiled serializer test cases
+    """
+
+    def assert_same_dump(self, schema, data, many=False):
+        """
+        Assert the compiled serializer and marshmallow give the same json
+        """
+        self.assertEqual(
+            json.dumps(schema.dump(data, many=many)),
+            json.dumps(serializers.dump(schema, data, many=many))
+        )
+
+    def test_employees(self):
+        """
+        Test the serialized employees match marshmallow, with nested departments
+        """
+        self.assert_same_dump(EmployeeSchema(), EmployeeServices.get_all(), many=True)
+        self.assert_same_dump(EmployeeSchema(), EmployeeServices.get_by_id(1))
+
+    def test_departments(self):
+        """
+        Test the serialized departments match marshmallow, with employee lists
+        """
+        self.assert_same_dump(DepartmentSchema(), DepartmentServices.get_all(), many=True)
+        self.assert_same_dump(DepartmentSchema(), DepartmentServices.get_by_id(1))
+
+    def test_sparse_schemas(self):
+        """
+        Test the serialized sparse fieldsets match marshmallow
+        """
+        schema = sparse_schema(EmployeeSchema, ('id_', 'salary', 'department'),
+                               (('department', ('title',)),))
+        self.assert_same_dump(schema, EmployeeServices.get_all(), many=True)
+        schema = sparse_schema(DepartmentSchema, ('title', 'employees'),
+                               (('employees', ('full_name',)),))
+        self.assert_same_dump(schema, DepartmentServices.get_all(), many=True)
+
+    def test_fallback_values(self):
+        """
+        Test values of unexpected types and missing values are serialized like marshmallow
+        """
+        employee = Employee(id_=1, full_name='Test Name', salary=None,
+                            date_of_birth=datetime(1990, 5, 17, 10, 30))
+        self.assert_same_dump(EmployeeSchema(), employee)
+        employee = Employee(id_=True, full_name=None, salary=1000.7,
+                            date_of_birth=date(1990, 5, 17))
+        self.assert_same_dump(EmployeeSchema(), employee)
+
+    def test_expired_objects(self):
+        """
+        Test attributes not loaded in the instance are loaded like marshmallow does
+        """
+        employee = EmployeeServices.get_by_id(1)
+        expected = EmployeeSchema().dump(employee)
+        db.session.expire(employee)
+        self.assertEqual(json.dumps(expected),
+                         json.dumps(serializers.dump(EmployeeSchema(), employee)))
+
+    def test_shared_nested_objects(self):
+        """
+        Test a department shared by employees is serialized once per dump and
+        every employee gets its own copy
+        """
+        employees = EmployeeServices.get_all()
+        with mock.patch.object(DepartmentServices, 'get_avg_salary',
+                               wraps=DepartmentServices.get_avg_salary) as get_avg_salary:
+            dumped = serializers.dump(EmployeeSchema(), employees, many=True)
+        self.assertEqual(get_avg_salary.call_count, 3)
+        self.assertEqual(dumped[0]['department'], dumped[1]['department'])
+        dumped[0]['department']['title'] = 'Changed'
+        self.assertEqual(dumped[1]['department']['title'], 'Python')
+
+    def test_temporary_nested_objects(self):
+        """
+        Test nested objects created on access are not mistaken for each other
+        """
+        class Department:  # pylint: disable=R0903
+            """Department making new employee objects on every access"""
+            def __init__(self, id_):
+                self.id_, self.title = id_, f'Department {id_}'
+
+            @property
+            def employees(self):
+                """New employees of the department"""
+                return [Employee(id_=self.id_ * 10 + index, full_name='Test Name', salary=1,
+                                 date_of_birth=date(1990, 5, 17)) for index in range(3)]
+
+        schema = sparse_schema(DepartmentSchema, ('id_', 'title', 'employees'))
+        dumped = serializers.dump(schema, [Department(id_) for id_ in range(1, 20)], many=True)
+        self.assertEqual([employee['id_'] for department in dumped
+                          for employee in department['employees']],
+                         [id_ * 10 + index for id_ in range(1, 20) for index in range(3)])
+
+    def test_disabled(self):
+        """
+        Test marshmallow is used when the compiled serializers are disabled
+        """
+        self.app.config['FAST_SERIALIZER'] = False
+        self.assert_same_dump(EmployeeSchema(), EmployeeServices.get_all(), many=True)
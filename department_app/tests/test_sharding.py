@@ -0,0 +1,255 @@
+# pylint: disable=R0201
+""""Module contains tests for the department sharding of employees"""
+import os
+import random
+import sqlite3
+import tempfile
+import unittest
+from datetime import date
+
+from config import TestConfig
+from department_app import create_app, db
+from department_app.models import Employee
+from department_app.models.population import populate_bd
+from department_app.models.sharding import ShardNotSelected
+from department_app.service import StatsServices
+from department_app.tests.conftest import BaseTestCase
+
+
+class ShardConfig(TestConfig):
+    """Configuration for testing with a SQLite primary and two SQLite shards"""
+    EMPLOYEE_SHARD_ID_BLOCK = 4
+
+
+class TestSharding(unittest.TestCase):
+    """
+    This is the class for employee sharding test cases
+    """
+
+    def setUp(self):
+        """
+        Execute before every test case
+        """
+        self.paths = []
+        for _ in range(3):
+            handle, path = tempfile.mkstemp(suffix='.db')
+            os.close(handle)
+            self.paths.append(path)
+        ShardConfig.SQLALCHEMY_DATABASE_URI = f'sqlite:///{self.paths[0]}'
+        ShardConfig.EMPLOYEE_SHARD_URIS = tuple(f'sqlite:///{path}' for path in self.paths[1:])
+        self.app = create_app(config_class=ShardConfig)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        populate_bd()
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        """
+        Execute after every test case
+        """
+        db.session.remove()
+        for bind in (None, 'shard0', 'shard1'):
+            db.get_engine(self.app, bind=bind).dispose()
+        self.app_context.pop()
+        for path in self.paths:
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+
+    def rows(self, index, table='employees'):
+        """
+        Read the (id_, department_id) rows of the employees table of a database
+        """
+        connection = sqlite3.connect(self.paths[index])
+        try:
+            return connection.execute(
+                f'SELECT id_, department_id FROM {table} ORDER BY id_'
+            ).fetchall()
+        finally:
+            connection.close()
+
+    def test_partitioning(self):
+        """
+        Test employees are stored in the shard of their department with unique ids
+        """
+        self.assertEqual(self.rows(0), [])
+        self.assertEqual({department for _, department in self.rows(1)}, {2})
+        self.assertEqual({department for _, department in self.rows(2)}, {1, 3})
+        ids = [id_ for id_, _ in self.rows(1) + self.rows(2)]
+        self.assertEqual(sorted(ids), list(range(1, 11)))
+
+    def test_get_all(self):
+        """
+        Test the list of employees is merged from all shards in id order
+        """
+        response = self.client.get('/api/v1/employees')
+        self.assertEqual([employee['id_'] for employee in response.json], list(range(1, 11)))
+        self.assertEqual(response.json[0]['department']['title'], 'Python')
+
+    def test_pagination(self):
+        """
+        Test pages of the merged list follow each other
+        """
+        ids, after = [], None
+        while True:
+            url = '/api/v1/employees?limit=3&fields=full_name'
+            response = self.client.get(url if after is None else f'{url}&after={after}')
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.json['items']), 3)
+            ids.append(len(response.json['items']))
+            after = response.json['next']
+            if after is None:
+                break
+        self.assertEqual(ids, [3, 3, 3, 1, 0][:len(ids)])
+        self.assertEqual(sum(ids), 10)
+
+    def test_department_queries(self):
+        """
+        Test queries of one department go to its shard
+        """
+        response = self.client.get('/api/v1/departments/2/employees')
+        self.assertEqual(len(response.json), 4)
+        response = self.client.get('/api/v1/departments/1')
+        self.assertEqual(len(response.json['employees']), 4)
+        self.assertIsNotNone(response.json['avg_salary'])
+        with self.assertRaises(ShardNotSelected):
+            Employee.query.all()
+
+    def test_search(self):
+        """
+        Test a search by date of birth across shards
+        """
+        response = self.client.get(
+            '/api/v1/employees/search?date_of_birth=1980-01-01&date_for_interval=1996-01-01'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([employee['id_'] for employee in response.json],
+                         sorted(employee['id_'] for employee in response.json))
+        self.assertTrue(all(
+            date(1980, 1, 1) <= date.fromisoformat(employee['date_of_birth']) <= date(1996, 1, 1)
+            for employee in response.json
+        ))
+
+    def test_writes(self):
+        """
+        Test creating, moving and deleting employees
+        """
+        response = self.client.post('/api/v1/employees', json={
+            'full_name': 'Ada Lovelace', 'date_of_birth': '1990-12-10',
+            'salary': 3000, 'department_id': 2
+        })
+        self.assertEqual(response.status_code, 201)
+        emp_id = response.json['id_']
+        self.assertIn((emp_id, 2), self.rows(1))
+        response = self.client.put(f'/api/v1/employees/{emp_id}', json={'department_id': 3})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(emp_id, [id_ for id_, _ in self.rows(1)])
+        self.assertIn((emp_id, 3), self.rows(2))
+        self.assertEqual(
+            self.client.get(f'/api/v1/employees/{emp_id}').json['department']['title'], 'Assembler'
+        )
+        self.assertEqual(self.client.delete(f'/api/v1/employees/{emp_id}').status_code, 204)
+        self.assertNotIn(emp_id, [id_ for id_, _ in self.rows(2)])
+        response = self.client.post('/api/v1/employees', json={
+            'full_name': 'Ada Lovelace', 'date_of_birth': '1990-12-10',
+            'salary': 3000, 'department_id': 42
+        })
+        self.assertEqual(response.status_code, 400)
+
+    def test_delete_department(self):
+        """
+        Test deleting a department deletes its employees from its shard
+        """
+        self.assertEqual(self.client.delete('/api/v1/departments/2').status_code, 204)
+        self.assertEqual(self.rows(1), [])
+        self.assertEqual(len(self.rows(2)), 6)
+
+    def test_export(self):
+        """
+        Test the CSV export merges the shards by id with the department titles
+        """
+        lines = self.client.get('/api/v1/employees/export.csv').data.decode().splitlines()
+        self.assertEqual([line.split(',')[0] for line in lines[1:]],
+                         [str(id_) for id_ in range(1, 11)])
+        self.assertEqual(lines[7], '7,Corban Snow,1962-02-02,1000,3,Assembler')
+        lines = self.client.get('/api/v1/departments/2/employees/export.csv').data.decode()
+        self.assertEqual(len(lines.splitlines()), 5)
+
+
+class TestShardedStats(BaseTestCase):
+    """
+    This is the class for test cases comparing statistics of sharded employees
+    with the statistics of the same employees in one database
+    """
+
+    def compute(self):
+        """
+        Compute all statistics of the current app
+        """
+        return (
+            StatsServices.get_salary_stats(percentiles=(10, 50, 90), bucket_width=300),
+            StatsServices.get_salary_stats(edges=[1000, 1800]),
+            StatsServices.get_salary_stats(dep_id=2),
+            StatsServices.get_department_stats(),
+            StatsServices.get_age_stats(date(2022, 1, 1), [20, 30, 40]),
+        )
+
+    def test_same_stats(self):
+        """
+        Test sharded statistics equal the statistics of one database
+        """
+        expected = self.compute()
+        with tempfile.TemporaryDirectory() as directory:
+            ShardConfig.SQLALCHEMY_DATABASE_URI = f'sqlite:///{directory}/primary.db'
+            ShardConfig.EMPLOYEE_SHARD_URIS = tuple(
+                f'sqlite:///{directory}/shard{index}.db' for index in range(3)
+            )
+            app = create_app(config_class=ShardConfig)
+            with app.app_context():
+                db.create_all()
+                populate_bd()
+                self.assertEqual(self.compute(), expected)
+                with self.assertRaises(ValueError):
+                    StatsServices.get_salary_stats(bucket_width=1)
+                db.session.remove()
+                for bind in (None, 'shard0', 'shard1', 'shard2'):
+                    db.get_engine(app, bind=bind).dispose()
+
+    def test_merged_percentiles(self):
+        """
+        Test percentiles selected across shards equal the percentiles of all
+        salaries, with repeated salaries, unevenly filled shards and an empty one
+        """
+        rng = random.Random(7)
+        salaries = [rng.randrange(60) * 100 for _ in range(97)]
+        with tempfile.TemporaryDirectory() as directory:
+            ShardConfig.SQLALCHEMY_DATABASE_URI = f'sqlite:///{directory}/primary.db'
+            ShardConfig.EMPLOYEE_SHARD_URIS = tuple(
+                f'sqlite:///{directory}/shard{index}.db' for index in range(3)
+            )
+            app = create_app(config_class=ShardConfig)
+            with app.app_context():
+                db.create_all()
+                db.session.add_all(
+                    Employee(full_name=f'Employee {index}', date_of_birth=date(1990, 1, 1),
+                             salary=salary, department_id=1 + index % 7 // 5)
+                    for index, salary in enumerate(salaries)
+                )
+                db.session.commit()
+                ordered = sorted(salaries)
+                percentiles = (0, 1, 12.5, 25, 33, 50, 66.6, 75, 90, 99, 100)
+                stats = StatsServices.get_salary_stats(percentiles=percentiles)
+                for percentile in percentiles:
+                    rank = percentile / 100 * (len(ordered) - 1)
+                    lower = int(rank)
+                    expected = ordered[lower]
+                    if rank > lower:
+                        expected += (ordered[lower + 1] - expected) * (rank - lower)
+                    self.assertEqual(stats['percentiles'][f'p{percentile:g}'],
+                                     round(expected, 2))
+                self.assertEqual(stats['count'], len(ordered))
+                self.assertEqual(stats['mean'], round(sum(ordered) / len(ordered), 2))
+                db.session.remove()
+                for bind in (None, 'shard0', 'shard1', 'shard2'):
+                    db.get_engine(app, bind=bind).dispose()
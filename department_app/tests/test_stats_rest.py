@@ -0,0 +1,99 @@
+"""
+Module contains class to test statistics api.
+"""
+from department_app.tests.conftest import BaseTestCase
+
+
+class TestStatsApi(BaseTestCase):
+    """
+    Class for statistics api test cases.
+    """
+
+    def test_salary_stats_get(self):
+        """
+        Test get request for organisation-wide salary stats.
+        """
+        response = self.client.get("/api/v1/salary-stats")
+        assert response.status_code == 200
+        assert response.json["count"] == 10
+        assert response.json["percentiles"] == {"p50": 2000, "p90": 2000}
+        assert len(response.json["histogram"]) == 3
+
+    def test_salary_stats_get_with_dep_id(self):
+        """
+        Test get request for department salary stats with query parameters.
+        """
+        response = self.client.get(
+            "/api/v1/departments/1/salary-stats?percentiles=25,75&buckets=1000,2000"
+        )
+        assert response.status_code == 200
+        assert response.json["department_id"] == 1
+        assert response.json["percentiles"] == {"p25": 1000, "p75": 1625}
+        assert response.json["histogram"] == [
+            {"min": 1000, "max": 2000, "count": 3},
+            {"min": 2000, "max": None, "count": 1},
+        ]
+
+    def test_salary_stats_get_with_nonexistent_id(self):
+        """
+        Test get request with incorrect data (dep_id).
+        """
+        wrong_id = 42
+        response = self.client.get(f"/api/v1/departments/{wrong_id}/salary-stats")
+        assert response.status_code == 404
+        assert f"Department with id = {wrong_id} was not found" in response.json["message"]
+
+    def test_salary_stats_get_wrong_parameters(self):
+        """
+        Test get request with incorrect query parameters.
+        """
+        for query in ("percentiles=abc", "percentiles=101", "bucket_width=0",
+                      "bucket_width=1", "buckets=2000,1000"):
+            response = self.client.get(f"/api/v1/salary-stats?{query}")
+            assert response.status_code == 400
+
+    def test_salary_stats_get_too_many_parameters(self):
+        """
+        Test get requests asking for more percentiles or buckets than allowed.
+        """
+        self.app.config["SALARY_STATS_MAX_PERCENTILES"] = 3
+        self.app.config["SALARY_STATS_MAX_BUCKETS"] = 3
+        response = self.client.get("/api/v1/salary-stats?percentiles=10,50,90&buckets=1000,1500")
+        assert response.status_code == 200
+        for query in ("percentiles=10,25,50,90", "buckets=1000,1500,2000"):
+            response = self.client.get(f"/api/v1/salary-stats?{query}")
+            assert response.status_code == 400
+        response = self.client.get("/api/v1/departments/stats?percentiles=10,25,50,90")
+        assert response.status_code == 400
+
+    def test_department_stats_get(self):
+        """
+        Test get request for per-department statistics.
+        """
+        response = self.client.get("/api/v1/departments/stats?percentiles=50")
+        assert response.status_code == 200
+        assert [dep["department_id"] for dep in response.json] == [1, 2, 3]
+        assert response.json[0]["headcount"] == 4
+        assert response.json[0]["avg_salary"] == 1375
+        assert response.json[0]["percentiles"] == {"p50": 1250}
+
+    def test_age_stats_get(self):
+        """
+        Test get request for department age stats.
+        """
+        response = self.client.get("/api/v1/departments/age-stats?as_of=2022-01-01&bands=30")
+        assert response.status_code == 200
+        assert response.json["as_of"] == "2022-01-01"
+        assert response.json["bands"] == [
+            {"min_age": None, "max_age": 30},
+            {"min_age": 30, "max_age": None},
+        ]
+        assert response.json["departments"][0]["age_bands"] == [3, 1]
+
+    def test_age_stats_get_wrong_parameters(self):
+        """
+        Test get request for department age stats with incorrect query parameters.
+        """
+        for query in ("as_of=2022-13-01", "bands=abc", "bands=30,20", "bands=0"):
+            response = self.client.get(f"/api/v1/departments/age-stats?{query}")
+            assert response.status_code == 400
@@ -0,0 +1,113 @@
+# pylint: disable=R0201
+""""Module contains test for StatsServices class's methods"""
+from datetime import date
+
+from department_app.service import DepartmentServices, StatsServices
+from ..tests.conftest import BaseTestCase
+
+
+class TestStatsService(BaseTestCase):
+    """
+    This is the class for stats service test cases
+    """
+
+    def test_salary_stats_all(self):
+        """
+        Test salary stats operation over all employees.
+        """
+        stats = StatsServices.get_salary_stats(percentiles=(50, 90))
+        assert stats['count'] == 10
+        assert stats['mean'] == 1650
+        assert stats['min'] == 1000
+        assert stats['max'] == 2000
+        assert stats['percentiles'] == {'p50': 2000, 'p90': 2000}
+
+    def test_salary_stats_department(self):
+        """
+        Test salary stats operation for one department with interpolated percentiles.
+        """
+        stats = StatsServices.get_salary_stats(1, percentiles=(0, 50, 100))
+        assert stats['count'] == 4
+        assert stats['mean'] == 1375
+        assert stats['percentiles'] == {'p0': 1000, 'p50': 1250, 'p100': 2000}
+
+    def test_salary_stats_fixed_histogram(self):
+        """
+        Test fixed-width histogram buckets including empty ones in between.
+        """
+        stats = StatsServices.get_salary_stats(bucket_width=500)
+        assert stats['histogram'] == [
+            {'min': 1000, 'max': 1500, 'count': 3},
+            {'min': 1500, 'max': 2000, 'count': 1},
+            {'min': 2000, 'max': 2500, 'count': 6},
+        ]
+        stats = StatsServices.get_salary_stats(3, bucket_width=250)
+        assert [bucket['count'] for bucket in stats['histogram']] == [1, 0, 0, 0, 1]
+
+    def test_salary_stats_too_many_buckets(self):
+        """
+        Test bucket widths making more buckets than allowed are rejected.
+        """
+        with self.assertRaises(ValueError):
+            StatsServices.get_salary_stats(bucket_width=1)
+        assert len(StatsServices.get_salary_stats(bucket_width=2)['histogram']) == 501
+        with self.assertRaises(ValueError):
+            StatsServices.get_salary_stats(bucket_width=2, max_buckets=500)
+
+    def test_salary_stats_custom_histogram(self):
+        """
+        Test custom histogram edges with open-ended buckets.
+        """
+        stats = StatsServices.get_salary_stats(edges=[1200, 1800])
+        assert stats['histogram'] == [
+            {'min': None, 'max': 1200, 'count': 3},
+            {'min': 1200, 'max': 1800, 'count': 1},
+            {'min': 1800, 'max': None, 'count': 6},
+        ]
+        stats = StatsServices.get_salary_stats(edges=[0, 5000])
+        assert stats['histogram'] == [{'min': 0, 'max': 5000, 'count': 10}]
+
+    def test_salary_stats_empty_department(self):
+        """
+        Test salary stats operation for a department without employees.
+        """
+        department = DepartmentServices.create(dict(title="PHP"))
+        stats = StatsServices.get_salary_stats(department.id_, bucket_width=500)
+        assert stats['count'] == 0
+        assert stats['mean'] is None
+        assert stats['percentiles'] == {'p50': None, 'p90': None}
+        assert stats['histogram'] == []
+
+    def test_age_stats(self):
+        """
+        Test age distribution of departments at a given date.
+        """
+        stats = StatsServices.get_age_stats(date(2022, 1, 1), [20, 30, 40, 50])
+        assert [dep['department_id'] for dep in stats] == [1, 2, 3]
+        assert stats[0] == {
+            'department_id': 1, 'headcount': 4, 'age_bands': [1, 2, 0, 1, 0],
+            'average_age': 28.24, 'youngest': 19, 'oldest': 41,
+        }
+        assert stats[1]['age_bands'] == [0, 2, 1, 1, 0]
+        assert stats[2]['age_bands'] == [0, 0, 1, 0, 1]
+
+    def test_age_stats_band_bounds(self):
+        """
+        Test the age band bounds are exact on birthdays.
+        """
+        # an employee of department 1 turns 23 on 2022-04-04
+        stats = StatsServices.get_age_stats(date(2022, 4, 3), [23])
+        assert stats[0]['age_bands'] == [2, 2]
+        stats = StatsServices.get_age_stats(date(2022, 4, 4), [23])
+        assert stats[0]['age_bands'] == [1, 3]
+
+    def test_age_stats_empty_department(self):
+        """
+        Test age distribution of a department without employees.
+        """
+        DepartmentServices.create(dict(title="PHP"))
+        stats = StatsServices.get_age_stats(date(2022, 1, 1), [30])
+        assert stats[3] == {
+            'department_id': 4, 'headcount': 0, 'age_bands': [0, 0],
+            'average_age': None, 'youngest': None, 'oldest': None,
+        }
@@ -6,8 +6,8 @@ with open('README.md') as f:
 setup(
     name='EPAM_Project',
     version='1.0.0.',
-    packages=['department_app', 'department_app.rest', 'department_app.forms',
-              'department_app.tests',
+    packages=['department_app', 'department_app.aio', 'department_app.rest',
+              'department_app.forms', 'department_app.tests',
               'department_app.views', 'department_app.errors', 'department_app.models',
               'department_app.service'],
     url='https://github.com/pofce/EPAM_Project',
@@ -15,5 +15,10 @@ setup(
     author_email=' vladyslav.radchenko.ki.2019@lpnu.ua ',
     description=long_description,
     include_package_data=True,
+    extras_require={
+        'analytics': ['numpy'],
+        'msgpack': ['msgpack'],
+        'asgi': ['aiosqlite', 'aiomysql', 'uvicorn'],
+    },
     zip_safe=False,
 )